@@ -1,9 +1,9 @@
 # 06_gdp_ai_report.py
-# World Bank GDP Data + OpenAI Economic Report
+# World Bank GDP Data + AI Economic Report
 # Pairs with 03_query_ai materials
 
 # This script fetches US GDP data from the World Bank API, computes growth
-# and summary stats, then uses OpenAI to generate a short economic report.
+# and summary stats, then uses OpenAI (or a local Ollama model as the fallback) to generate a short economic report.
 # Students learn end-to-end: API → pandas → prompt → LLM output.
 
 # 0. SETUP ###################################
@@ -13,7 +13,7 @@
 import os
 import requests  # for World Bank API
 import pandas as pd  # for data manipulation
-from openai import OpenAI  # for report generation
+from llm_client import LLMClient, openai_provider, ollama_provider  # for report generation
 
 ## 0.2 Configuration #################################
 
@@ -22,8 +22,11 @@ INDICATOR = "NY.GDP.MKTP.CD"  # GDP (current US$)
 START_YEAR = 2018
 END_YEAR = 2023
 
-# OpenAI client; uses OPENAI_API_KEY from environment
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# LLM client (see llm_client.py): OpenAI first (uses OPENAI_API_KEY from environment).
+# The client only switches to a provider in another place if it is listed in allow_fallback_to;
+# here a local Ollama model is the fallback, and slow requests are hedged to it.
+local_model = ollama_provider("llama3.2:latest")
+client = LLMClient([openai_provider("gpt-4o-mini"), local_model], allow_fallback_to=[local_model])
 
 # 1. QUERY WORLD BANK API ###################################
 
@@ -104,7 +107,7 @@ Lowest Growth Year: {stats['lowest_growth_year']}
 
 # 4. AI REPORT GENERATION ###################################
 
-# Send structured data to OpenAI and return the model's report text
+# Send structured data to the LLM client and return the model's report text
 def generate_ai_report(structured_data):
     prompt = f"""
 You are a senior macroeconomic strategist preparing a briefing for a policy board.
@@ -124,8 +127,7 @@ DATA:
 {structured_data}
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
+    report = client.chat(
         messages=[
             {"role": "system", "content": "You are an expert economic analyst."},
             {"role": "user", "content": prompt}
@@ -133,15 +135,14 @@ DATA:
         temperature=0.3
     )
 
-    return response.choices[0].message.content
+    return report
 
 
 # 5. MAIN EXECUTION ###################################
 
 if __name__ == "__main__":
     if not os.getenv("OPENAI_API_KEY"):
-        print("Error: Set OPENAI_API_KEY in your environment (e.g. export OPENAI_API_KEY=sk-...)")
-        exit(1)
+        print("Note: OPENAI_API_KEY is not set (e.g. export OPENAI_API_KEY=sk-...), so the local Ollama model will be used.")
 
     print("Fetching data from World Bank API...")
     records = fetch_world_bank_data(COUNTRY, INDICATOR, START_YEAR, END_YEAR)
@@ -0,0 +1,398 @@
+# llm_client.py
+# Provider-Agnostic LLM Client
+# Pairs with 06_gdp_ai_report.py and 09_text_analysis/02_ai_quality_control.py
+# Tim Fraser
+
+# This script gives one chat interface over several AI providers (local Ollama, Ollama Cloud, OpenAI).
+# Each provider keeps its own pool of open connections. If a request takes longer than that
+# provider usually does (its 95th percentile), a second "hedge" request goes to another server,
+# and whichever answers first wins. If a provider fails, the next one is tried, and a provider
+# that keeps failing is skipped for a while. Scripts just call client.chat(messages).
+#
+# Hedging and fallback stay among providers in the same place as the first one (e.g. local → local),
+# so prompts never leave your machine and no paid calls are made unless you list the other
+# providers in allow_fallback_to.
+#
+# Example:
+#   from llm_client import LLMClient, ollama_provider, openai_provider
+#   openai = openai_provider("gpt-4o-mini")
+#   client = LLMClient([ollama_provider("llama3.2:latest"), openai], allow_fallback_to=[openai])
+#   text = client.chat([{"role": "user", "content": "Hello!"}])
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import os        # for reading API keys from the environment
+import time      # for timing requests
+import threading  # for keeping provider statistics safe across threads
+from urllib.parse import urlparse  # for telling local servers from remote ones
+from collections import deque  # for keeping recent request times
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED  # for hedged requests
+import numpy as np   # for latency percentiles
+import requests      # for HTTP requests
+from requests.adapters import HTTPAdapter  # for connection pools
+
+# If you haven't already, install these packages...
+# pip install requests numpy
+
+## 0.2 Configuration #################################
+
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_CLOUD_HOST = "https://ollama.com"
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+# Host names of servers on this machine
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+# Hedging: send a second request once the first has taken longer than this percentile
+# of the provider's recent request times. Until a provider has MIN_SAMPLES request times,
+# HEDGE_AFTER_SECONDS is used instead.
+HEDGE_QUANTILE = 0.95
+MIN_SAMPLES = 20
+HEDGE_AFTER_SECONDS = 30.0
+
+# Skip a provider for COOLDOWN_SECONDS after MAX_FAILURES failures in a row
+MAX_FAILURES = 3
+COOLDOWN_SECONDS = 30.0
+
+# 1. PROVIDERS ###################################
+
+class Provider:
+    """
+    One AI provider and model, with its own connection pool and request statistics.
+
+    Parameters:
+    -----------
+    kind : str
+        Request format: "ollama" (/api/chat) or "openai" (/v1/chat/completions)
+    model : str
+        Model name, e.g. "llama3.2:latest" or "gpt-4o-mini"
+    url : str
+        Server address, e.g. "http://localhost:11434" or "https://api.openai.com/v1"
+    api_key : str, optional
+        API key, sent as a Bearer token (default: None)
+    timeout : float
+        Seconds to wait for a response before giving up (default: 120)
+    pool_size : int
+        Maximum open connections kept to this provider (default: 10)
+    keep_alive : str, optional
+        For Ollama, how long to keep the model loaded after each call (default: None, server default)
+    name : str, optional
+        Name used in results and error messages (default: "kind:model")
+    group : str, optional
+        Where requests go; LLMClient only hedges and falls back within one group unless told otherwise
+        (default: "local" for servers on this machine, otherwise the server's host name, e.g. "api.openai.com")
+    """
+
+    def __init__(self, kind, model, url, api_key=None, timeout=120, pool_size=10, keep_alive=None, name=None, group=None):
+        if kind not in ("ollama", "openai"):
+            raise ValueError("Invalid provider kind. Use 'ollama' or 'openai'.")
+        self.kind = kind
+        self.model = model
+        self.url = url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.name = name or f"{kind}:{model}"
+        host = urlparse(self.url).hostname
+        self.group = group or ("local" if host in LOCAL_HOSTS else host)
+
+        # Reuse open connections instead of opening a new one per request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+        self.latencies = deque(maxlen=200)  # seconds, recent successful requests
+        self.failures = 0  # failures in a row
+        self.skip_until = 0.0  # time.time() until which this provider is skipped
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Provider({self.name!r})"
+
+    def available(self):
+        """Is this provider usable right now (not skipped after repeated failures)?"""
+        return time.time() >= self.skip_until
+
+    def hedge_after(self):
+        """Seconds to wait before sending a hedge request: the recent p95 request time."""
+        with self.lock:
+            latencies = list(self.latencies)
+        if len(latencies) < MIN_SAMPLES:
+            return HEDGE_AFTER_SECONDS
+        return float(np.quantile(latencies, HEDGE_QUANTILE))
+
+    def record(self, seconds=None, failed=False):
+        with self.lock:
+            if failed:
+                self.failures += 1
+                if self.failures >= MAX_FAILURES:
+                    self.skip_until = time.time() + COOLDOWN_SECONDS
+            else:
+                self.failures = 0
+                self.latencies.append(seconds)
+
+    def request(self, messages, json_output=False, temperature=None):
+        """
+        Send one chat request to this provider.
+
+        Parameters:
+        -----------
+        messages : list
+            Chat messages, each a dictionary with 'role' and 'content'
+        json_output : bool
+            If True, ask for a JSON object (default: False)
+        temperature : float, optional
+            Sampling temperature (default: None, the provider's default)
+
+        Returns:
+        --------
+        dict
+            text, provider, model, seconds, prompt_tokens and output_tokens
+        """
+
+        if self.kind == "openai":
+            if not self.api_key:
+                raise ValueError("no API key. Set OPENAI_API_KEY in your .env file.")
+            url = f"{self.url}/chat/completions"
+            body = {"model": self.model, "messages": messages}
+            if json_output:
+                body["response_format"] = {"type": "json_object"}
+            if temperature is not None:
+                body["temperature"] = temperature
+        else:
+            url = f"{self.url}/api/chat"
+            body = {"model": self.model, "messages": messages, "stream": False}
+            if json_output:
+                body["format"] = "json"
+            if temperature is not None:
+                body["options"] = {"temperature": temperature}
+            if self.keep_alive is not None:
+                body["keep_alive"] = self.keep_alive
+
+        start = time.perf_counter()
+        try:
+            response = self.session.post(url, json=body, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception:
+            self.record(failed=True)
+            raise
+        seconds = time.perf_counter() - start
+        self.record(seconds)
+
+        if self.kind == "openai":
+            usage = data.get("usage", {})
+            text = data["choices"][0]["message"]["content"]
+            prompt_tokens, output_tokens = usage.get("prompt_tokens"), usage.get("completion_tokens")
+        else:
+            text = data["message"]["content"]
+            prompt_tokens, output_tokens = data.get("prompt_eval_count"), data.get("eval_count")
+
+        return {
+            "text": text,
+            "provider": self.name,
+            "model": self.model,
+            "seconds": round(seconds, 3),
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens
+        }
+
+
+def ollama_provider(model, host=OLLAMA_HOST, api_key=None, **options):
+    """
+    A local Ollama provider (or Ollama Cloud, with host=OLLAMA_CLOUD_HOST and an API key).
+
+    Parameters:
+    -----------
+    model : str
+        Model name, e.g. "llama3.2:latest"
+    host : str
+        Ollama server address (default: OLLAMA_HOST)
+    api_key : str, optional
+        Ollama Cloud API key (default: None)
+    **options
+        Other Provider settings, e.g. timeout, pool_size, keep_alive
+
+    Returns:
+    --------
+    Provider
+    """
+
+    return Provider("ollama", model, host, api_key=api_key, **options)
+
+
+def openai_provider(model="gpt-4o-mini", api_key=None, base_url=OPENAI_BASE_URL, **options):
+    """
+    An OpenAI provider (or any server with the same API, such as the mock server).
+
+    Parameters:
+    -----------
+    model : str
+        Model name (default: "gpt-4o-mini")
+    api_key : str, optional
+        API key (default: None, meaning the OPENAI_API_KEY environment variable)
+    base_url : str
+        API address (default: OPENAI_BASE_URL)
+    **options
+        Other Provider settings, e.g. timeout, pool_size
+
+    Returns:
+    --------
+    Provider
+    """
+
+    return Provider("openai", model, base_url, api_key=api_key or os.getenv("OPENAI_API_KEY"), **options)
+
+
+# 2. CLIENT ###################################
+
+class LLMClient:
+    """
+    One chat interface over several providers, with hedging and fallback.
+
+    Providers are tried in the order given. A request goes to the first available provider.
+    If it fails, the next provider is tried right away (fallback; with a single provider,
+    it is retried once). If it is still running after the provider's usual p95 time,
+    one extra request goes to the next provider on a different server (hedging), and the first
+    answer wins. A second request to the same server would compete with the first for the same
+    hardware, so there is no hedging when every provider is on one server.
+
+    Only providers in the same group as the first one (see Provider) are used, so by default a
+    local model never hands prompts to a cloud API. Providers in other groups are used only if
+    they are listed in allow_fallback_to.
+
+    Parameters:
+    -----------
+    providers : list
+        Provider objects, in order of preference
+    hedge : bool
+        Send a hedge request when the first one is slow (default: True)
+    max_workers : int
+        Maximum requests in flight at the same time across all chats (default: 16)
+    allow_fallback_to : list, optional
+        Providers (or provider names) in other groups that may also be used (default: None, none)
+    """
+
+    def __init__(self, providers, hedge=True, max_workers=16, allow_fallback_to=None):
+        if not providers:
+            raise ValueError("LLMClient needs at least one provider.")
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        allowed = {p if isinstance(p, str) else p.name for p in (allow_fallback_to or [])}
+        # The providers this client may use: the first provider's group, plus any allowed on purpose
+        self.eligible = [p for p in self.providers if p.group == self.providers[0].group or p.name in allowed]
+
+    def chat_result(self, messages, json_output=False, temperature=None):
+        """
+        Send a chat and return the winning response with its details.
+
+        Parameters:
+        -----------
+        messages : list
+            Chat messages, each a dictionary with 'role' and 'content'
+        json_output : bool
+            If True, ask for a JSON object (default: False)
+        temperature : float, optional
+            Sampling temperature (default: None, the provider's default)
+
+        Returns:
+        --------
+        dict
+            text, provider, model, seconds, prompt_tokens, output_tokens,
+            hedged (whether a hedge request was sent) and attempts
+
+        Raises:
+        -------
+        RuntimeError
+            If every provider failed
+        """
+
+        candidates = [p for p in self.eligible if p.available()] or list(self.eligible)
+        # Providers to ask next; with a single provider, it can be asked once more
+        waiting = candidates[1:] or candidates[:1]
+        # Hedge only to a different server; the same server would just get twice the load
+        hedges = [p for p in candidates[1:] if p.url != candidates[0].url]
+        pending = {}  # future -> provider
+        errors = []
+        hedged = False
+        hedge_checked = False  # a request has already run past the hedge time
+        attempts = 0
+
+        def send(provider):
+            nonlocal attempts
+            attempts += 1
+            pending[self.executor.submit(provider.request, messages, json_output, temperature)] = provider
+
+        send(candidates[0])
+        while pending:
+            # Before hedging, wait only as long as the first provider usually takes
+            timeout = None if (hedge_checked or not self.hedge or not hedges) else next(iter(pending.values())).hedge_after()
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Slower than usual: send one hedge request and take whichever answers first
+                hedge_checked = True
+                provider = next((p for p in hedges if p not in pending.values()), None)
+                if provider is not None:
+                    hedged = True
+                    if provider in waiting:
+                        waiting.remove(provider)
+                    send(provider)
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as error:
+                    errors.append(f"{provider.name}: {error}")
+                    # Fall back to the next provider, unless another request is still running
+                    if waiting and not pending:
+                        send(waiting.pop(0))
+                    continue
+                # The slower request keeps running in the background; its answer is ignored
+                return {**result, "hedged": hedged, "attempts": attempts}
+
+        raise RuntimeError("All providers failed:\n" + "\n".join(errors))
+
+    def chat(self, messages, json_output=False, temperature=None):
+        """
+        Send a chat and return the reply text. See chat_result() for the parameters.
+
+        Returns:
+        --------
+        str
+            The reply text
+        """
+
+        return self.chat_result(messages, json_output=json_output, temperature=temperature)["text"]
+
+    def stats(self):
+        """
+        Recent request statistics per provider.
+
+        Returns:
+        --------
+        list
+            One dictionary per provider: name, requests timed, p50 and p95 seconds, failures in a row, available
+        """
+
+        rows = []
+        for provider in self.providers:
+            with provider.lock:
+                latencies = list(provider.latencies)
+            rows.append({
+                "provider": provider.name,
+                "requests": len(latencies),
+                "p50_seconds": round(float(np.quantile(latencies, 0.5)), 3) if latencies else None,
+                "p95_seconds": round(float(np.quantile(latencies, 0.95)), 3) if latencies else None,
+                "failures_in_a_row": provider.failures,
+                "available": provider.available()
+            })
+        return rows
@@ -0,0 +1,516 @@
+# mock_llm_server.py
+# Mock LLM Server
+# Pairs with 06_agents/06_model_benchmark.py
+# Tim Fraser
+
+# This script runs a small stand-in for the Ollama and OpenAI APIs on your own computer.
+# It answers /api/chat, /api/generate, /api/ps (Ollama) and /v1/chat/completions (OpenAI)
+# with deterministic replies and realistic timing, with or without streaming, so workflows,
+# load tests and benchmarks can run offline, in CI, or without a model or API key.
+# JSON requests get quality control scores (a "results" list for batched "[Report n]" prompts),
+# and requests with tools get a tool call for every tool, until the tool results come back.
+# Run it directly to start the server:
+#   python 03_query_ai/mock_llm_server.py --port 11435 --profile cloud
+# or start it from another script with start_mock_server().
+# Point the OpenAI SDK at it with OpenAI(base_url="http://localhost:11435/v1", api_key="mock").
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import argparse  # for command line options
+import json      # for reading requests and writing responses
+import random    # for repeatable random delays and errors
+import math      # for rounding up token counts
+import hashlib   # for deterministic scores
+import re        # for splitting text into sentences
+import threading  # for running the server in the background
+import time      # for simulating model speed
+from datetime import datetime, timezone  # for keep-alive expiry times
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # for the HTTP server
+
+# No packages to install: this script only uses the Python standard library.
+
+## 0.2 Configuration #################################
+
+# Default port (Ollama itself uses 11434, so the mock uses the next one)
+MOCK_PORT = 11435
+
+# Pretend speed and size of each model:
+# prompt_rate / eval_rate = tokens per second when reading the prompt / writing the answer,
+# load_seconds = time to load the model, size_mb = memory it takes once loaded
+MODEL_PROFILES = {
+    "smollm2:135m": {"prompt_rate": 4000, "eval_rate": 250, "load_seconds": 0.5, "size_mb": 270},
+    "smollm2:1.7b": {"prompt_rate": 1200, "eval_rate": 80, "load_seconds": 1.5, "size_mb": 1800},
+    "llama3.2:latest": {"prompt_rate": 800, "eval_rate": 50, "load_seconds": 2.5, "size_mb": 2900},
+    "gemma3:latest": {"prompt_rate": 600, "eval_rate": 35, "load_seconds": 3.5, "size_mb": 4300}
+}
+DEFAULT_PROFILE = {"prompt_rate": 1000, "eval_rate": 60, "load_seconds": 2.0, "size_mb": 2000}
+
+# OpenAI models are never "loaded" on your computer, so they have no load time or memory
+OPENAI_PROFILE = {"prompt_rate": 5000, "eval_rate": 90, "load_seconds": 0.0, "size_mb": 0}
+
+# How the connection and server behave, on top of the model's speed:
+# latency_ms = delay before the model starts, jitter_ms = random extra delay (0 to jitter_ms),
+# slow_fraction / slow_ms = share of requests that get a long extra delay (a slow tail),
+# error_fraction = share of requests that fail with HTTP 503, rate_scale = multiplier for token speed
+LATENCY_PROFILES = {
+    "local": {"latency_ms": 0, "jitter_ms": 0, "slow_fraction": 0.0, "slow_ms": 0, "error_fraction": 0.0, "rate_scale": 1.0},
+    "lan": {"latency_ms": 20, "jitter_ms": 20, "slow_fraction": 0.0, "slow_ms": 0, "error_fraction": 0.0, "rate_scale": 1.0},
+    "cloud": {"latency_ms": 250, "jitter_ms": 150, "slow_fraction": 0.05, "slow_ms": 3000, "error_fraction": 0.01, "rate_scale": 1.5},
+    "overloaded": {"latency_ms": 500, "jitter_ms": 1000, "slow_fraction": 0.2, "slow_ms": 5000, "error_fraction": 0.1, "rate_scale": 0.3}
+}
+
+# Keep models "loaded" this long after each call, unless the request says otherwise (as Ollama does)
+DEFAULT_KEEP_ALIVE_SECONDS = 300
+
+# Longest reply the mock writes, in words
+MAX_REPLY_WORDS = 120
+
+# Batched quality control prompts number their reports like "[Report 1]"
+BATCH_REPORT = re.compile(r"^\[Report (\d+)\]", re.MULTILINE)
+
+# Tool arguments the mock fills in when a schema lists no options, by JSON-schema type
+PLACEHOLDER_ARGUMENTS = {"string": "mock", "integer": 10, "number": 10, "boolean": False, "array": [], "object": {}}
+
+# 1. REPLIES ###################################
+
+def count_tokens(text):
+    """
+    Roughly count tokens in a text (about 4 characters per token).
+
+    Parameters:
+    -----------
+    text : str
+        The text to measure
+
+    Returns:
+    --------
+    int
+        Estimated token count (at least 1)
+    """
+
+    return max(1, math.ceil(len(text) / 4))
+
+
+def mock_scores(digest):
+    """Quality control scores taken from the bytes of a hash, so the same prompt always gets the same scores."""
+    return {
+        "accurate": digest[0] % 4 != 0,
+        "accuracy": 1 + digest[1] % 5,
+        "formality": 1 + digest[2] % 5,
+        "faithfulness": 1 + digest[3] % 5,
+        "clarity": 1 + digest[4] % 5,
+        "succinctness": 1 + digest[5] % 5,
+        "relevance": 1 + digest[6] % 5,
+        "details": "Mock assessment: scores are derived from the prompt, not from a model."
+    }
+
+
+def mock_reply(messages, json_output=False):
+    """
+    Write a deterministic reply to a conversation: the same messages always get the same reply.
+
+    Text replies restate the first sentences of the last user message (or tool result), so facts
+    in the prompt (names, numbers) show up in the reply. JSON replies are quality control scores;
+    for a batched prompt with "[Report 1]", "[Report 2]", ... they are a "results" list with one
+    entry per report.
+
+    Parameters:
+    -----------
+    messages : list
+        Chat messages, each a dictionary with 'role' and 'content'
+    json_output : bool
+        If True, reply with a quality control JSON object (default: False)
+
+    Returns:
+    --------
+    str
+        The reply text
+    """
+
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+
+    if json_output:
+        report_ids = [int(i) for i in BATCH_REPORT.findall(prompt)]
+        if report_ids:
+            results = [{"report_id": i, **mock_scores(hashlib.sha256(f"{prompt}\n{i}".encode("utf-8")).digest())}
+                       for i in report_ids]
+            return json.dumps({"results": results})
+        return json.dumps(mock_scores(digest))
+
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") in ("user", "tool")), prompt)
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", str(user)) if s.strip()]
+    words = " ".join(sentences).split()[:MAX_REPLY_WORDS]
+    return "Summary: " + " ".join(words)
+
+
+def mock_argument(spec, user):
+    """
+    Pick a value for one tool argument: an option named in the user message, or else the first option,
+    when the schema lists options ("enum", or "Options are: ..." in its description); otherwise a placeholder.
+    """
+
+    options = spec.get("enum")
+    if not options:
+        match = re.search(r"Options are:\s*(.+)", spec.get("description", ""))
+        options = [option.strip().rstrip(".") for option in match.group(1).split(",")] if match else []
+    if options:
+        return next((option for option in options if str(option).lower() in user.lower()), options[0])
+    return PLACEHOLDER_ARGUMENTS.get(spec.get("type"), "mock")
+
+
+def mock_tool_calls(messages, tools):
+    """
+    Decide which tools to call, deterministically: every tool offered, once per user message.
+
+    Once there are tool results after the last user message, there is nothing more to call,
+    so the model answers in text instead.
+
+    Parameters:
+    -----------
+    messages : list
+        Chat messages, each a dictionary with 'role' and 'content'
+    tools : list
+        Tool metadata from the request (JSON schemas), or None
+
+    Returns:
+    --------
+    list or None
+        One dictionary per tool call, with 'name' and 'arguments' (only the required ones), or None
+    """
+
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    if not tools or any(m.get("role") == "tool" for m in messages[last_user + 1:]):
+        return None
+    user = str(messages[last_user].get("content", "")) if last_user >= 0 else ""
+
+    calls = []
+    for tool in tools:
+        function = tool.get("function", tool)
+        parameters = function.get("parameters") or {}
+        properties = parameters.get("properties", {})
+        arguments = {name: mock_argument(properties.get(name, {}), user) for name in parameters.get("required", [])}
+        calls.append({"name": function.get("name"), "arguments": arguments})
+    return calls
+
+
+# 2. SERVER ###################################
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Answers Ollama- and OpenAI-style requests. Server settings live on self.server (see MockServer)."""
+
+    def log_message(self, format, *args):
+        # Stay quiet instead of printing one line per request
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, chunks, content_type):
+        # Without a Content-Length, the client reads until the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(chunk.encode("utf-8"))
+            self.wfile.flush()
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/ps":
+            self.send_json({"models": self.server.loaded_models()})
+        elif self.path == "/api/tags":
+            self.send_json({"models": [{"name": name, "model": name} for name in MODEL_PROFILES]})
+        elif self.path == "/v1/models":
+            self.send_json({"object": "list", "data": [{"id": name, "object": "model"} for name in MODEL_PROFILES]})
+        else:
+            self.send_json({"error": f"unknown path {self.path}"}, status=404)
+
+    def do_POST(self):
+        try:
+            body = self.read_json()
+        except json.JSONDecodeError:
+            self.send_json({"error": "invalid JSON"}, status=400)
+            return
+
+        if self.path in ("/api/chat", "/api/generate"):
+            chat = self.path == "/api/chat"
+            if chat:
+                messages = body.get("messages", [])
+            else:
+                messages = [{"role": "user", "content": body["prompt"]}] if body.get("prompt") else []
+            if not messages:
+                self.send_json(self.server.load_only(body, chat))
+                return
+            reply = self.server.plan(body, messages, json_output=body.get("format") is not None, local=True)
+            if reply["error"]:
+                self.send_json({"error": "mock server overloaded"}, status=503)
+            elif body.get("stream", True):
+                # Ollama streams by default: one JSON object per line
+                self.send_stream(self.server.ollama_chunks(reply, chat), "application/x-ndjson")
+            else:
+                self.server.wait(reply)
+                self.send_json(self.server.ollama_result(reply, chat, reply["text"]))
+
+        elif self.path == "/v1/chat/completions":
+            json_output = (body.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+            reply = self.server.plan(body, body.get("messages", []), json_output=json_output, local=False)
+            if reply["error"]:
+                self.send_json({"error": {"message": "mock server overloaded", "type": "server_error"}}, status=503)
+            elif body.get("stream", False):
+                # OpenAI streams server-sent events: "data: {...}" lines, ending with "data: [DONE]"
+                self.send_stream(self.server.openai_chunks(reply), "text/event-stream")
+            else:
+                self.server.wait(reply)
+                self.send_json(self.server.openai_result(reply))
+
+        else:
+            self.send_json({"error": f"unknown path {self.path}"}, status=404)
+
+
+class MockServer(ThreadingHTTPServer):
+    """An HTTP server that plans mock replies and keeps track of which mock models are loaded."""
+
+    daemon_threads = True
+
+    def __init__(self, address, time_scale=1.0, profile="local", seed=42):
+        super().__init__(address, MockHandler)
+        self.time_scale = time_scale
+        self.profile = dict(LATENCY_PROFILES[profile]) if isinstance(profile, str) else dict(profile)
+        self.random = random.Random(seed)  # same seed, same sequence of delays and errors
+        self.loaded = {}  # model -> time it expires (seconds since the epoch)
+        self.lock = threading.Lock()
+        self.url = f"http://{address[0]}:{self.server_address[1]}"
+
+    ## 2.1 Model lifecycle #################################
+
+    def keep_alive_seconds(self, value):
+        # Ollama accepts a number of seconds or a duration like "30m"
+        if value is None:
+            return DEFAULT_KEEP_ALIVE_SECONDS
+        if isinstance(value, (int, float)):
+            return float(value)
+        units = {"s": 1, "m": 60, "h": 3600}
+        match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", str(value).strip())
+        return float(match.group(1)) * units.get(match.group(2) or "s") if match else DEFAULT_KEEP_ALIVE_SECONDS
+
+    def load(self, model, keep_alive):
+        """Mark a model as loaded; return the simulated load time (0 if it was already loaded)."""
+        now = time.time()
+        seconds = self.keep_alive_seconds(keep_alive)
+        with self.lock:
+            was_loaded = self.loaded.get(model, 0) > now
+            if seconds == 0:
+                self.loaded.pop(model, None)
+            else:
+                self.loaded[model] = now + (seconds if seconds > 0 else 10 ** 9)
+        return 0.0 if was_loaded else MODEL_PROFILES.get(model, DEFAULT_PROFILE)["load_seconds"]
+
+    def loaded_models(self):
+        now = time.time()
+        with self.lock:
+            self.loaded = {model: expires for model, expires in self.loaded.items() if expires > now}
+            items = list(self.loaded.items())
+        return [{
+            "name": model,
+            "model": model,
+            "size_vram": MODEL_PROFILES.get(model, DEFAULT_PROFILE)["size_mb"] * 1024 ** 2,
+            "expires_at": datetime.fromtimestamp(expires, tz=timezone.utc).isoformat()
+        } for model, expires in items]
+
+    def load_only(self, body, chat):
+        """A request with no prompt only loads (or, with keep_alive 0, unloads) the model."""
+        model = body.get("model", "mock")
+        unload = self.keep_alive_seconds(body.get("keep_alive")) == 0
+        load_seconds = self.load(model, body.get("keep_alive"))
+        load_seconds = 0.0 if unload else load_seconds
+        time.sleep(load_seconds * self.time_scale)
+        result = {"model": model, "done": True, "done_reason": "unload" if unload else "load",
+                  "load_duration": int(load_seconds * 1e9), "total_duration": int(load_seconds * 1e9)}
+        if chat:
+            result["message"] = {"role": "assistant", "content": ""}
+        else:
+            result["response"] = ""
+        return result
+
+    ## 2.2 Planning a reply #################################
+
+    def plan(self, body, messages, json_output=False, local=True):
+        """
+        Decide the reply text and how long each stage takes, before sending anything.
+
+        Stage times follow the model profile (load, reading the prompt, writing the answer)
+        plus the latency profile (network delay, jitter, slow tail, errors).
+        """
+        model = body.get("model", "mock")
+        profile = MODEL_PROFILES.get(model, DEFAULT_PROFILE if local else OPENAI_PROFILE)
+        load_seconds = self.load(model, body.get("keep_alive")) if local else 0.0
+
+        with self.lock:
+            jitter = self.random.random()
+            slow = self.random.random() < self.profile["slow_fraction"]
+            error = self.random.random() < self.profile["error_fraction"]
+        delay_ms = self.profile["latency_ms"] + jitter * self.profile["jitter_ms"] + (self.profile["slow_ms"] if slow else 0)
+
+        tool_calls = mock_tool_calls(messages, body.get("tools"))
+        text = "" if tool_calls else mock_reply(messages, json_output=json_output)
+        prompt_tokens = count_tokens("\n".join(str(m.get("content", "")) for m in messages))
+        output_tokens = count_tokens(json.dumps(tool_calls) if tool_calls else text)
+        rate_scale = self.profile["rate_scale"]
+        return {
+            "model": model,
+            "text": text,
+            "tool_calls": tool_calls,
+            "pieces": re.findall(r"\S+\s*", text),  # streamed one word at a time
+            "error": error,
+            "delay_seconds": delay_ms / 1000,
+            "load_seconds": load_seconds,
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "prompt_seconds": prompt_tokens / (profile["prompt_rate"] * rate_scale),
+            "eval_seconds": output_tokens / (profile["eval_rate"] * rate_scale)
+        }
+
+    def wait(self, reply, stage="all"):
+        # time_scale shortens the real wait (e.g. 0.01 for quick tests);
+        # the reported durations always follow the profiles, like a real model would report them
+        if stage == "first":
+            seconds = reply["delay_seconds"] + reply["load_seconds"] + reply["prompt_seconds"]
+        else:
+            seconds = reply["delay_seconds"] + reply["load_seconds"] + reply["prompt_seconds"] + reply["eval_seconds"]
+        time.sleep(seconds * self.time_scale)
+
+    ## 2.3 Ollama responses #################################
+
+    def ollama_result(self, reply, chat, content, done=True):
+        result = {"model": reply["model"], "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+        if chat:
+            result["message"] = {"role": "assistant", "content": content}
+            # Ollama sends tool calls with arguments as a dictionary
+            if done and reply["tool_calls"]:
+                result["message"]["tool_calls"] = [{"function": call} for call in reply["tool_calls"]]
+        else:
+            result["response"] = content
+        if done:
+            total = reply["load_seconds"] + reply["prompt_seconds"] + reply["eval_seconds"]
+            result.update({
+                "done_reason": "stop",
+                "total_duration": int(total * 1e9),
+                "load_duration": int(reply["load_seconds"] * 1e9),
+                "prompt_eval_count": reply["prompt_tokens"],
+                "prompt_eval_duration": int(reply["prompt_seconds"] * 1e9),
+                "eval_count": reply["output_tokens"],
+                "eval_duration": int(reply["eval_seconds"] * 1e9)
+            })
+        return result
+
+    def ollama_chunks(self, reply, chat):
+        """Yield a streamed Ollama reply: one JSON line per word, then a final line with the timings."""
+        self.wait(reply, stage="first")
+        seconds_per_token = reply["eval_seconds"] / reply["output_tokens"]
+        for piece in reply["pieces"]:
+            time.sleep(count_tokens(piece) * seconds_per_token * self.time_scale)
+            yield json.dumps(self.ollama_result(reply, chat, piece, done=False)) + "\n"
+        if reply["tool_calls"]:
+            # Tool calls have no words to stream; they arrive with the final line
+            time.sleep(reply["eval_seconds"] * self.time_scale)
+        yield json.dumps(self.ollama_result(reply, chat, "", done=True)) + "\n"
+
+    ## 2.4 OpenAI responses #################################
+
+    def openai_tool_calls(self, reply):
+        # OpenAI sends tool calls with an id, and arguments as a JSON string
+        return [{"id": f"call_mock_{i}", "type": "function",
+                 "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])}}
+                for i, call in enumerate(reply["tool_calls"])]
+
+    def openai_result(self, reply):
+        if reply["tool_calls"]:
+            message = {"role": "assistant", "content": None, "tool_calls": self.openai_tool_calls(reply)}
+        else:
+            message = {"role": "assistant", "content": reply["text"]}
+        return {
+            "id": f"chatcmpl-mock-{hashlib.sha256(reply['text'].encode('utf-8')).hexdigest()[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": reply["model"],
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if reply["tool_calls"] else "stop"}],
+            "usage": {
+                "prompt_tokens": reply["prompt_tokens"],
+                "completion_tokens": reply["output_tokens"],
+                "total_tokens": reply["prompt_tokens"] + reply["output_tokens"]
+            }
+        }
+
+    def openai_chunks(self, reply):
+        """Yield a streamed OpenAI reply as server-sent events, one word per event."""
+        self.wait(reply, stage="first")
+        seconds_per_token = reply["eval_seconds"] / reply["output_tokens"]
+        base = {"id": "chatcmpl-mock-stream", "object": "chat.completion.chunk", "created": int(time.time()), "model": reply["model"]}
+        for i, piece in enumerate(reply["pieces"]):
+            time.sleep(count_tokens(piece) * seconds_per_token * self.time_scale)
+            delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+            yield "data: " + json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}) + "\n\n"
+        if reply["tool_calls"]:
+            time.sleep(reply["eval_seconds"] * self.time_scale)
+            calls = [{"index": i, **call} for i, call in enumerate(self.openai_tool_calls(reply))]
+            delta = {"role": "assistant", "content": None, "tool_calls": calls}
+            yield "data: " + json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}) + "\n\n"
+        finish = "tool_calls" if reply["tool_calls"] else "stop"
+        yield "data: " + json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish}]}) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+
+def start_mock_server(port=0, time_scale=1.0, profile="local", seed=42):
+    """
+    Start the mock server in a background thread.
+
+    Parameters:
+    -----------
+    port : int
+        Port to listen on (default: 0, meaning any free port)
+    time_scale : float
+        Multiplier for how long replies really take (default: 1.0; use e.g. 0.01 for quick runs)
+    profile : str or dict
+        Latency profile: a name from LATENCY_PROFILES, or a dictionary with the same keys (default: "local")
+    seed : int
+        Seed for the random delays and errors, so runs are repeatable (default: 42)
+
+    Returns:
+    --------
+    MockServer
+        The running server; its address is server.url. Stop it with server.shutdown().
+    """
+
+    server = MockServer(("127.0.0.1", port), time_scale=time_scale, profile=profile, seed=seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# 3. RUN AS A SCRIPT ###################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock Ollama/OpenAI server.")
+    parser.add_argument("--port", type=int, default=MOCK_PORT, help=f"port to listen on (default: {MOCK_PORT})")
+    parser.add_argument("--profile", choices=sorted(LATENCY_PROFILES), default="local", help="latency profile (default: local)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiplier for real waiting time (default: 1.0)")
+    parser.add_argument("--seed", type=int, default=42, help="seed for random delays and errors (default: 42)")
+    args = parser.parse_args()
+
+    server = MockServer(("127.0.0.1", args.port), time_scale=args.time_scale, profile=args.profile, seed=args.seed)
+    print(f"🧪 Mock LLM server running at {server.url} with the '{args.profile}' profile (Ctrl+C to stop)")
+    print(f"   Ollama: {server.url}/api/chat   OpenAI: {server.url}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
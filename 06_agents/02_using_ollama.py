@@ -75,6 +75,13 @@ resp = response_data["message"]["content"]
 # Calculate elapsed time
 elapsed_time = time.time() - start_time
 
+# Ollama also reports where the time went (in nanoseconds), and how many tokens it processed
+load_seconds = response_data.get("load_duration", 0) / 1e9           # loading the model into memory
+prompt_seconds = response_data.get("prompt_eval_duration", 0) / 1e9  # reading the prompt
+eval_seconds = response_data.get("eval_duration", 0) / 1e9           # writing the answer
+prompt_tokens = response_data.get("prompt_eval_count", 0)
+output_tokens = response_data.get("eval_count", 0)
+
 # 4. APPEND TO CHAT HISTORY ###################################
 
 # Append the assistant's response to the message history
@@ -98,3 +105,8 @@ for msg in messages:
 
 # View timing information
 print(f"⏱️  Request took {elapsed_time:.2f} seconds")
+print(f"   Loading model:  {load_seconds:.2f} s")
+print(f"   Reading prompt: {prompt_seconds:.2f} s ({prompt_tokens} tokens)")
+print(f"   Writing answer: {eval_seconds:.2f} s ({output_tokens} tokens, "
+      f"{output_tokens / eval_seconds if eval_seconds else 0:.1f} tokens/sec)")
+print(f"   Time to first token: about {load_seconds + prompt_seconds:.2f} s")
@@ -19,7 +19,7 @@ import requests      # for HTTP requests
 ## 0.2 Load Functions #################################
 
 # Load helper functions for agent orchestration
-from functions import agent_run, get_shortages, df_as_text
+from functions import agent_run, agent_map_reduce, get_shortages, latest_by_group, timing_report
 
 # 1. CONFIGURATION ###################################
 
@@ -50,19 +50,18 @@ data = get_shortages(category=input_category["category"], limit=500)
 
 # Process the data into some summary table
 # Filter for items that are currently unavailable
-stat = (data
-        .groupby("generic_name")
-        .apply(lambda x: x.loc[x["update_date"].idxmax()])
-        .reset_index(drop=True)
+# latest_by_group() keeps the most recent update per drug without a slow per-group apply()
+stat = (latest_by_group(data, group="generic_name", date="update_date")
         .query("availability == 'Unavailable'"))
 
-# Convert the data to a text string
-task2 = df_as_text(stat)
-
 # Task 2 - Analyst Agent -------------------------
 # This agent analyzes the data and returns a markdown table
+# agent_map_reduce() converts the data to compact CSV text with df_as_text(). If that text is
+# longer than CHUNK_TOKENS, it splits the rows into chunks, has the agent analyze the chunks
+# at the same time, and combines the partial tables into one answer of at most ANSWER_TOKENS.
 role2 = "I analyze medicine shortage data provide by the user in a table, and return a markdown table of currently ongoing shortages."
-result2 = agent_run(role=role2, task=task2, model=MODEL, output="text")
+result2 = agent_map_reduce(stat, role=role2, model=MODEL, label="analyst",
+                           columns=["generic_name", "update_type", "update_date", "availability"])
 
 # Task 3 - Press Release Agent -------------------------
 # This agent takes the analysis and writes a press release
@@ -74,3 +73,8 @@ result3 = agent_run(role=role3, task=result2, model=MODEL, output="text")
 # View press release
 print("📰 Press Release:")
 print(result3)
+print()
+
+# View how long each agent took, with its token counts and tokens per second
+print("⏱️ Model Timings by Agent:")
+print(timing_report(by="agent"))
@@ -11,7 +11,6 @@
 ## 0.1 Load Packages #################################
 
 import pandas as pd  # for data manipulation
-import yaml          # for reading YAML files
 import requests      # for HTTP requests
 
 # If you haven't already, install these packages...
@@ -20,13 +19,18 @@ import requests      # for HTTP requests
 ## 0.2 Load Functions #################################
 
 # Load helper functions for agent orchestration
-from functions import agent_run, get_shortages, df_as_text
+from functions import agent_run, get_shortages, df_as_text, latest_by_group, preload_models, timing_report
+from functions import load_rules, role_with_rules
 
 # 1. CONFIGURATION ###################################
 
 # Select model of interest
 MODEL = "smollm2:135m"
 
+# Load the model before the workflow starts (and keep it loaded between calls),
+# so the first agent call isn't slowed down by loading the model
+preload_models([MODEL])
+
 # 2. LOAD RULES FROM YAML ###################################
 
 # Rules are structured guidance that can be incorporated into agent prompts
@@ -35,32 +39,27 @@ MODEL = "smollm2:135m"
 
 # Learn more about standard AI rules formatting here: https://aicodingrules.org/
 
-# Load in rules
-with open("04_rules.yaml", "r") as f:
-    rules = yaml.safe_load(f)
-
-# Extract rules as dictionaries for easy access
-rules_data_analysis = rules["rules"]["data_analysis"][0]
-rules_press_release = rules["rules"]["press_release"][0]
-
-# 3. HELPER FUNCTION: FORMAT RULES FOR PROMPT ###################################
-
-def format_rules_for_prompt(ruleset):
-    """
-    Format a ruleset into a string that can be included in the agent's role.
-    
-    Parameters:
-    -----------
-    ruleset : dict
-        A ruleset dictionary with 'name', 'description', and 'guidance' keys
-    
-    Returns:
-    --------
-    str
-        Formatted rules string
-    """
-    
-    return f"{ruleset['name']}\n{ruleset['description']}\n\n{ruleset['guidance']}"
+# Load in rules, formatted for prompts
+# load_rules() parses and formats the file once, and reuses the result until the file changes
+rules = load_rules("04_rules.yaml")
+
+# Extract the formatted rules for each agent
+rules_data_analysis = rules["data_analysis"]
+rules_press_release = rules["press_release"]
+
+# 3. BUILD ROLES WITH RULES ###################################
+
+# Each role is built once and reused for every call.
+# Calls that start with the same system prompt share a prompt prefix, so Ollama
+# (with the model kept loaded) only has to read the new data in each call.
+
+# Base role for the analyst agent
+role2_base = "Analyze medicine shortage data provide by the user in a table, and return a markdown table of currently ongoing shortages."
+role2_with_rules = role_with_rules(role2_base, rules_data_analysis)
+
+# Base role for the press release agent
+role3_base = "Write a 1-page press release on the currently ongoing shortages, using the information provided by the user."
+role3_with_rules = role_with_rules(role3_base, rules_press_release)
 
 # 4. AGENTIC WORKFLOW WITH RULES ###################################
 
@@ -86,32 +85,18 @@ data = get_shortages(category=input_category["category"], limit=500)
 
 # Process the data into some summary table
 # Filter for items that are currently unavailable
-stat = (data
-        .groupby("generic_name")
-        .apply(lambda x: x.loc[x["update_date"].idxmax()])
-        .reset_index(drop=True)
+# latest_by_group() keeps the most recent update per drug without a slow per-group apply()
+stat = (latest_by_group(data, group="generic_name", date="update_date")
         .query("availability == 'Unavailable'"))
 
-# Convert the data to a text string
-result1 = df_as_text(stat)
+# Convert the data to a compact text string (plain CSV, fewer tokens than a markdown table)
+result1 = df_as_text(stat, columns=["generic_name", "update_type", "update_date", "availability"])
 
 # Task 2 - Analyst Agent with Rules -------------------------
-# Base role for the analyst agent
-role2_base = "Analyze medicine shortage data provide by the user in a table, and return a markdown table of currently ongoing shortages."
-
-# Add rules to the role
-role2_with_rules = f"{role2_base}\n\n{format_rules_for_prompt(rules_data_analysis)}"
-
 # Run the agent with rules
 result2 = agent_run(role=role2_with_rules, task=result1, model=MODEL, output="text")
 
 # Task 3 - Press Release Agent with Rules -------------------------
-# Base role for the press release agent
-role3_base = "Write a 1-page press release on the currently ongoing shortages, using the information provided by the user."
-
-# Add rules to the role
-role3_with_rules = f"{role3_base}\n\n{format_rules_for_prompt(rules_press_release)}"
-
 # Run the agent with rules
 result3 = agent_run(role=role3_with_rules, task=result2, model=MODEL, output="text")
 
@@ -136,3 +121,36 @@ print()
 
 print("=== Agent 3 Result (Press Release with Rules) ===")
 print(result3)
+
+# 7. MANY CATEGORIES (Optional) ###################################
+
+# To run the workflow for several categories, group the calls by agent:
+# first the analyst for every category, then the press release writer for every category.
+# Back-to-back calls then start with the same system prompt (role + rules), so its
+# prefill cost is paid about once per agent instead of once per call.
+# This fetches 3 more categories and makes 6 more model calls; uncomment to try it.
+
+# CATEGORIES_TO_RUN = ["Psychiatry", "Oncology", "Neurology"]
+#
+# tables = {}
+# for category in CATEGORIES_TO_RUN:
+#     latest = latest_by_group(get_shortages(category=category, limit=500)).query("availability == 'Unavailable'")
+#     tables[category] = df_as_text(latest, columns=["generic_name", "update_type", "update_date", "availability"])
+#
+# analyses = {category: agent_run(role=role2_with_rules, task=tables[category], model=MODEL, output="text")
+#             for category in CATEGORIES_TO_RUN}
+# releases = {category: agent_run(role=role3_with_rules, task=analyses[category], model=MODEL, output="text")
+#             for category in CATEGORIES_TO_RUN}
+#
+# for category in CATEGORIES_TO_RUN:
+#     print(f"=== Press Release: {category} ===")
+#     print(releases[category])
+#     print()
+
+# 8. MODEL TIMINGS ###################################
+
+# Where did the time go? Each agent call is recorded with its tokens and timings.
+# Grouping by agent shows which agent in the chain dominates latency.
+# (To also save every call to a file, run start_workflow("04_rules", path="telemetry.jsonl") first.)
+print("=== Model Timings by Agent ===")
+print(timing_report(by="agent"))
@@ -0,0 +1,88 @@
+# 05_latest_record_benchmark.py
+# Benchmark: Latest Record per Drug
+# Pairs with 03_agents.py and 04_rules.py
+# Tim Fraser
+
+# This script compares three ways of keeping the most recent update for each drug:
+# the per-group groupby().apply() pattern, a sort + drop_duplicates() pattern,
+# and the vectorized latest_by_group() helper (idxmax() on the grouped date column).
+# It uses 100,000 synthetic shortage records, so it runs without the FDA API.
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import time          # for timing each approach
+import numpy as np   # for generating synthetic data
+import pandas as pd  # for data manipulation
+
+# If you haven't already, install these packages...
+# pip install pandas numpy
+
+## 0.2 Load Functions #################################
+
+from functions import latest_by_group
+
+# 1. CONFIGURATION ###################################
+
+N_ROWS = 100_000   # number of shortage records
+N_DRUGS = 5_000    # number of distinct drugs
+N_REPEATS = 3      # timing repeats; we report the fastest
+
+# 2. SYNTHETIC DATA ###################################
+
+rng = np.random.default_rng(seed=42)
+
+data = pd.DataFrame({
+    "generic_name": pd.Series([f"drug_{i:05d}" for i in rng.integers(0, N_DRUGS, N_ROWS)]),
+    "update_type": rng.choice(["New", "Revised", "Reverified"], N_ROWS),
+    "update_date": pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, N_ROWS), unit="D"),
+    "availability": rng.choice(["Available", "Limited Availability", "Unavailable"], N_ROWS),
+})
+
+# 3. APPROACHES ###################################
+
+def latest_with_apply(df):
+    """The original pattern: one Python call per drug."""
+    return (df
+            .groupby("generic_name")
+            .apply(lambda x: x.loc[x["update_date"].idxmax()])
+            .reset_index(drop=True))
+
+def latest_with_sort(df):
+    """Vectorized alternative: sort newest first, then keep the first row per drug."""
+    return (df
+            .sort_values("update_date", ascending=False, kind="stable")
+            .drop_duplicates(subset="generic_name", keep="first")
+            .sort_values("generic_name")
+            .reset_index(drop=True))
+
+def time_it(fn, df, repeats=N_REPEATS):
+    """Return (fastest seconds, result) over several runs."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+# 4. BENCHMARK ###################################
+
+t_apply, out_apply = time_it(latest_with_apply, data)
+t_sort, out_sort = time_it(latest_with_sort, data)
+t_helper, out_helper = time_it(latest_by_group, data)
+
+# All approaches must pick the same update for every drug.
+# (Recent pandas versions drop the grouping column from apply() output, so compare the other columns.)
+compare = ["update_type", "update_date", "availability"]
+assert out_helper[compare].equals(out_apply[compare]), "latest_by_group() differs from groupby().apply()"
+assert out_helper.equals(out_sort), "latest_by_group() differs from sort + drop_duplicates()"
+
+results = pd.DataFrame({
+    "approach": ["groupby().apply()", "sort + drop_duplicates()", "latest_by_group()"],
+    "seconds": [t_apply, t_sort, t_helper],
+})
+results["speedup"] = t_apply / results["seconds"]
+
+print(f"📊 {N_ROWS:,} records, {out_helper.shape[0]:,} drugs (fastest of {N_REPEATS} runs)\n")
+print(results.to_string(index=False, formatters={"seconds": "{:.4f}".format, "speedup": "{:.1f}x".format}))
@@ -0,0 +1,235 @@
+# 06_model_benchmark.py
+# Benchmark: Comparing Models on Agent Workflows
+# Pairs with 03_agents.py, 04_rules.py, 07_rag/02_txt.py and 09_text_analysis/02_ai_quality_control.py
+# Tim Fraser
+
+# This script replays three fixed workflows from this course on several models,
+# and compares their speed (latency, tokens per second, time to first token),
+# memory, and a simple quality check, so you can pick a model based on measurements.
+#   1. press_release: analyst agent + press release agent on a small drug shortage table
+#   2. rag_summary: answer a question from retrieved text (07_rag/data/sample.txt)
+#   3. qc_scoring: score reports as JSON (09_text_analysis/data/sample_reports.txt)
+# It can run against your local Ollama, or against the mock server in
+# 03_query_ai/mock_llm_server.py, which needs no models and gives the same results every run.
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import sys           # for finding modules in other folders
+import time          # for timing each run
+import importlib.util  # for loading 09_text_analysis/functions.py under its own name
+from pathlib import Path  # for file paths
+import pandas as pd  # for data manipulation
+import requests      # for HTTP requests
+
+# If you haven't already, install these packages...
+# pip install pandas requests pyyaml
+
+## 0.2 Load Functions #################################
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+# Agent, timing and model lifecycle helpers
+from functions import (agent_run, df_as_text, set_ollama_host, preload_models, unload_models,
+                       loaded_models, record_timings, start_workflow, MODEL_TIMINGS)
+import functions
+
+# Mock Ollama server
+sys.path.append(str(ROOT_DIR / "03_query_ai"))
+from mock_llm_server import start_mock_server
+
+# Quality control parsing from 09_text_analysis (loaded by path, since it is also called functions.py)
+spec = importlib.util.spec_from_file_location("qc_functions", ROOT_DIR / "09_text_analysis" / "functions.py")
+qc = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(qc)
+
+# 1. CONFIGURATION ###################################
+
+# Models to compare
+MODELS = ["smollm2:135m", "smollm2:1.7b", "llama3.2:latest", "gemma3:latest"]
+
+# "mock" runs against the mock server (no models needed); "ollama" runs against your local Ollama
+BACKEND = "mock"
+OLLAMA_HOST = "http://localhost:11434"
+
+# For the mock server: how long replies really take, as a fraction of the simulated time,
+# and its latency profile ("local", "lan", "cloud" or "overloaded"; see mock_llm_server.py).
+# The report scales the mock's simulated durations by the same fraction, so all its times are real seconds.
+MOCK_TIME_SCALE = 0.02
+MOCK_PROFILE = "local"
+
+# How many times to repeat each workflow per model
+REPEATS = 3
+
+# Where to save the comparison report (None to skip saving)
+REPORT_PATH = ROOT_DIR / "06_agents" / "model_benchmark.csv"
+
+# 2. FIXED WORKFLOW INPUTS ###################################
+
+# A small, fixed drug shortage table, so every model sees exactly the same data
+SHORTAGES = pd.DataFrame({
+    "generic_name": ["Amphetamine Aspartate", "Lisdexamfetamine", "Methylphenidate",
+                     "Sertraline", "Quetiapine", "Lorazepam"],
+    "update_type": ["Revised", "Reverified", "Revised", "New", "Reverified", "Revised"],
+    "update_date": ["2025-01-14", "2025-01-10", "2024-12-20", "2025-01-03", "2024-11-30", "2025-01-08"],
+    "availability": ["Unavailable", "Limited Availability", "Unavailable",
+                     "Unavailable", "Limited Availability", "Unavailable"]
+})
+UNAVAILABLE = SHORTAGES.query("availability == 'Unavailable'")["generic_name"].tolist()
+
+ROLE_ANALYST = "Analyze medicine shortage data provided by the user in a table, and return a markdown table of currently ongoing shortages."
+ROLE_WRITER = "Write a 1-page press release on the currently ongoing shortages, using the information provided by the user."
+
+# Retrieved content for the RAG summary, and terms a good answer should mention
+RAG_QUESTION = "What kinds of machine learning are there?"
+RAG_CONTEXT = (ROOT_DIR / "07_rag" / "data" / "sample.txt").read_text(encoding="utf-8")[:1500]
+RAG_TERMS = ["supervised", "unsupervised", "reinforcement"]
+ROLE_RAG = "Answer the user's question using only the retrieved content. Format as markdown with a title and a short paragraph."
+
+# Reports to score, with the source data they describe
+QC_REPORTS = [report for _, report in zip(range(3), qc.read_reports(str(ROOT_DIR / "09_text_analysis" / "data" / "sample_reports.txt")))]
+QC_SOURCE = """White County, IL | 2015 | PM10 | Time Driven | hours
+type,label_value,label_percent
+Light Truck,2.7 M,51.8%
+Car/ Bike,1.9 M,36.1%
+Combo Truck,381.3 k,7.3%
+Heavy Truck,220.7 k,4.2%
+Bus,30.6 k,0.6%"""
+
+def qc_prompt(report):
+    """Quality control prompt, in the same format as 09_text_analysis/02_ai_quality_control.py."""
+    return (
+        "You are a quality control validator for AI-generated reports. Evaluate the following report text "
+        "on multiple criteria and return your assessment as valid JSON.\n\n"
+        f"Source Data:\n{QC_SOURCE}\n\nReport Text to Validate:\n{report}\n\n"
+        "Return JSON with: accurate (true/false), accuracy, formality, faithfulness, clarity, "
+        "succinctness, relevance (each 1-5), and details (0-50 words)."
+    )
+
+# 3. WORKFLOWS ###################################
+
+# Each workflow runs once on one model and returns a quality score from 0 to 1.
+
+def run_press_release(model):
+    """Analyst + press release agents; quality = share of unavailable drugs named in the press release."""
+    analysis = agent_run(role=ROLE_ANALYST, task=df_as_text(SHORTAGES), model=model, label="analyst")
+    release = agent_run(role=ROLE_WRITER, task=analysis, model=model, label="writer")
+    return sum(name.lower() in release.lower() for name in UNAVAILABLE) / len(UNAVAILABLE)
+
+def run_rag_summary(model):
+    """RAG answer; quality = share of the expected terms the answer mentions."""
+    task = f"Question: {RAG_QUESTION}\n\nRetrieved content:\n{RAG_CONTEXT}"
+    answer = agent_run(role=ROLE_RAG, task=task, model=model, label="rag")
+    return sum(term in answer.lower() for term in RAG_TERMS) / len(RAG_TERMS)
+
+def run_qc_scoring(model):
+    """Score each report as JSON; quality = share of responses that are valid quality control JSON."""
+    valid = 0
+    for report in QC_REPORTS:
+        body = {
+            "model": model,
+            "messages": [{"role": "user", "content": qc_prompt(report)}],
+            "format": "json",
+            "stream": False,
+            "keep_alive": functions.KEEP_ALIVE
+        }
+        start = time.perf_counter()
+        response = requests.post(functions.CHAT_URL, json=body)
+        response.raise_for_status()
+        result = response.json()
+        record_timings(result, model, agent="qc", wall_seconds=time.perf_counter() - start)
+        try:
+            qc.validate_quality_control(qc.decode_json_object(result["message"]["content"]))
+            valid += 1
+        except ValueError:
+            pass
+    return valid / len(QC_REPORTS)
+
+WORKFLOWS = {
+    "press_release": run_press_release,
+    "rag_summary": run_rag_summary,
+    "qc_scoring": run_qc_scoring
+}
+
+# 4. RUN THE BENCHMARK ###################################
+
+if BACKEND == "mock":
+    server = start_mock_server(time_scale=MOCK_TIME_SCALE, profile=MOCK_PROFILE)
+    set_ollama_host(server.url)
+else:
+    set_ollama_host(OLLAMA_HOST)
+
+runs = []
+for model in MODELS:
+    print(f"⏳ {model}")
+    # Load the model first, so load time is measured once and not mixed into the workflows
+    load = preload_models([model])
+    memory = loaded_models().query("model == @model")["size_vram"].sum() / 1024 ** 2
+
+    for workflow, run in WORKFLOWS.items():
+        for repeat in range(REPEATS):
+            start_workflow(f"{model}|{workflow}|{repeat}")
+            start = time.perf_counter()
+            quality = run(model)
+            runs.append({
+                "model": model,
+                "workflow": workflow,
+                "repeat": repeat,
+                "seconds": time.perf_counter() - start,
+                "quality": quality,
+                "load_seconds": load["load_seconds"].iloc[0],
+                "memory_mb": memory
+            })
+
+    # Unload the model, so the next one is measured on its own
+    unload_models([model])
+
+if BACKEND == "mock":
+    server.shutdown()
+
+# 5. COMPARISON REPORT ###################################
+
+runs = pd.DataFrame(runs)
+
+# The mock server only waits MOCK_TIME_SCALE of the durations it reports,
+# so scale those durations too, to compare them with the measured seconds
+time_scale = MOCK_TIME_SCALE if BACKEND == "mock" else 1.0
+runs["load_seconds"] = runs["load_seconds"] * time_scale
+
+# Token counts and model-reported timings for every call, labeled by model|workflow|repeat
+calls = pd.DataFrame(list(MODEL_TIMINGS))
+calls = calls[calls["agent"] != "preload"]
+calls[["model", "workflow", "repeat"]] = calls["workflow"].str.split("|", expand=True)
+calls[["eval_seconds", "ttft_seconds"]] = calls[["eval_seconds", "ttft_seconds"]] * time_scale
+tokens = (calls
+          .groupby(["model", "workflow"], as_index=False)
+          .agg(output_tokens=("output_tokens", "sum"),
+               eval_seconds=("eval_seconds", "sum"),
+               ttft_seconds=("ttft_seconds", "mean")))
+tokens["tokens_per_second"] = tokens["output_tokens"] / tokens["eval_seconds"].where(tokens["eval_seconds"] > 0)
+
+report = (runs
+          .groupby(["model", "workflow"], as_index=False)
+          .agg(mean_seconds=("seconds", "mean"),
+               max_seconds=("seconds", "max"),
+               quality=("quality", "mean"),
+               load_seconds=("load_seconds", "first"),
+               memory_mb=("memory_mb", "first"))
+          .merge(tokens[["model", "workflow", "tokens_per_second", "ttft_seconds"]], on=["model", "workflow"])
+          .sort_values(["workflow", "mean_seconds"])
+          .round(4)
+          .reset_index(drop=True))
+
+# The mock's replies are canned text, so its quality scores say nothing about the models
+if BACKEND == "mock":
+    report = report.rename(columns={"quality": "quality_mock_not_meaningful"})
+
+print(f"\n📊 Model comparison ({BACKEND}, {REPEATS} runs per workflow)\n")
+print(report.to_string(index=False))
+if BACKEND == "mock":
+    print("\n⚠️ Mock run: quality comes from canned replies, not from the models, so don't pick a model by it.")
+
+if REPORT_PATH is not None:
+    report.to_csv(REPORT_PATH, index=False)
+    print(f"\n💾 Saved to {REPORT_PATH}")
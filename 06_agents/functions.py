@@ -11,11 +11,18 @@
 
 import requests  # for HTTP requests
 import json      # for working with JSON
+import math      # for rounding up token estimates
+import hashlib   # for hashing rules files
+import yaml      # for reading rules files
 import pandas as pd  # for data manipulation
 from datetime import datetime  # for date parsing
+import time      # for cache timestamps
+from concurrent.futures import ThreadPoolExecutor  # for fetching pages in parallel
+from collections import deque  # for keeping recent model timings
+import threading  # for writing timings safely from several threads
 
 # If you haven't already, install these packages...
-# pip install requests pandas
+# pip install requests pandas pyyaml
 
 ## 0.2 Configuration #################################
 
@@ -25,9 +32,36 @@ PORT = 11434
 OLLAMA_HOST = f"http://localhost:{PORT}"
 CHAT_URL = f"{OLLAMA_HOST}/api/chat"
 
+# How long Ollama keeps a model loaded after each call (Ollama's default is 5 minutes).
+# Keeping it loaded means later calls don't wait for the model to load again.
+KEEP_ALIVE = "30m"
+
 # 1. AGENT FUNCTION ###################################
 
-def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
+# Tools the agent can run, by name: name -> function (see register_tool())
+TOOL_REGISTRY = {}
+
+def register_tool(func):
+    """
+    Register a function so agent() can call it as a tool.
+    (08_function_calling/functions.py has a fuller version that also checks arguments.)
+    
+    Parameters:
+    -----------
+    func : callable
+        The function to run when the model calls the tool
+    
+    Returns:
+    --------
+    callable
+        The same function, so register_tool can also be used as a decorator
+    """
+    
+    TOOL_REGISTRY[func.__name__] = func
+    return func
+
+
+def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False, keep_alive=KEEP_ALIVE, label=None, options=None):
     """
     Agent wrapper function that runs a single agent, with or without tools.
     
@@ -44,6 +78,12 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
         List of tool metadata dictionaries for function calling
     all : bool
         If True, return all responses. If False, return only the last response.
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after this call (default: KEEP_ALIVE)
+    label : str, optional
+        Name for this agent in the recorded timings (see timing_report())
+    options : dict, optional
+        Ollama model options, e.g. {"num_predict": 400} to cap the reply length
     
     Returns:
     --------
@@ -56,12 +96,17 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
         body = {
             "model": model,
             "messages": messages,
-            "stream": False
+            "stream": False,
+            "keep_alive": keep_alive
         }
+        if options:
+            body["options"] = options
         
+        start = time.perf_counter()
         response = requests.post(CHAT_URL, json=body)
         response.raise_for_status()
         result = response.json()
+        record_timings(result, model, agent=label, wall_seconds=time.perf_counter() - start)
         
         return result["message"]["content"]
     else:
@@ -70,27 +115,31 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             "model": model,
             "messages": messages,
             "tools": tools,
-            "stream": False
+            "stream": False,
+            "keep_alive": keep_alive
         }
+        if options:
+            body["options"] = options
         
+        start = time.perf_counter()
         response = requests.post(CHAT_URL, json=body)
         response.raise_for_status()
         result = response.json()
+        record_timings(result, model, agent=label, wall_seconds=time.perf_counter() - start)
         
         # For any given tool call, execute the tool call
+        # Tools are found by name in TOOL_REGISTRY, so tools registered in any script can run
         if "tool_calls" in result.get("message", {}):
             tool_calls = result["message"]["tool_calls"]
             for tool_call in tool_calls:
-                # Execute the tool function
-                # Note: Tool functions must be defined in the global scope
                 func_name = tool_call["function"]["name"]
-                func_args = json.loads(tool_call["function"]["arguments"])
-                
-                # Get the function from globals and execute it
-                func = globals().get(func_name)
-                if func:
-                    output = func(**func_args)
-                    tool_call["output"] = output
+                if func_name not in TOOL_REGISTRY:
+                    raise ValueError(f"Unknown tool '{func_name}'. Register it with register_tool().")
+                # Ollama sends arguments as a dictionary; OpenAI-style servers send a JSON string
+                func_args = tool_call["function"].get("arguments") or {}
+                if isinstance(func_args, str):
+                    func_args = json.loads(func_args) if func_args.strip() else {}
+                tool_call["output"] = TOOL_REGISTRY[func_name](**func_args)
         
         if all:
             return result
@@ -101,7 +150,7 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             return result["message"]["content"]
 
 
-def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
+def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL, keep_alive=KEEP_ALIVE, label=None, options=None):
     """
     Run an agent with a specific role and task.
     
@@ -117,6 +166,12 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
         Output format (default: "text")
     model : str
         Model to use (default: DEFAULT_MODEL)
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after this call (default: KEEP_ALIVE)
+    label : str, optional
+        Name for this agent in the recorded timings (default: the start of its role)
+    options : dict, optional
+        Ollama model options, e.g. {"num_predict": 400} to cap the reply length
     
     Returns:
     --------
@@ -125,42 +180,220 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
     """
     
     # Define the messages to be sent to the agent
+    # The system message (role) comes first and the changing data (task) last, so calls with the
+    # same role share the same prompt prefix, which Ollama can reuse instead of reading it again.
     messages = [
         {"role": "system", "content": role},
         {"role": "user", "content": task}
     ]
     
     # Run the agent
-    resp = agent(messages=messages, model=model, output=output, tools=tools)
+    resp = agent(messages=messages, model=model, output=output, tools=tools, keep_alive=keep_alive,
+                 label=label or role[:40], options=options)
     return resp
 
 
 # 2. DATA CONVERSION FUNCTION ###################################
 
-def df_as_text(df):
+def estimate_tokens(text):
     """
-    Convert a pandas DataFrame to a markdown table string.
+    Roughly estimate how many tokens a model will count in a text (about 4 characters per token).
+    
+    Parameters:
+    -----------
+    text : str
+        The text to measure
+    
+    Returns:
+    --------
+    int
+        Estimated token count
+    """
+    
+    return math.ceil(len(text) / 4)
+
+
+def df_as_text(df, format="csv", columns=None, max_rows=None, sample="head", count_by=None, prune=True):
+    """
+    Convert a pandas DataFrame to a compact text table for an LLM prompt.
+    
+    Every character we send costs tokens, so the default is plain CSV, which has no
+    padding spaces or border characters (unlike a markdown table, which pads every cell
+    to its column width). Options let you drop columns, cap rows, or summarize rows.
     
     Parameters:
     -----------
     df : pandas.DataFrame
         The DataFrame to convert to text
+    format : str
+        "csv" (default), "tsv", "json" (one compact record per row), or "markdown"
+    columns : list, optional
+        Keep only these columns
+    max_rows : int, optional
+        Keep at most this many rows; a note says how many rows were left out
+    sample : str
+        Which rows to keep when max_rows applies: "head" (first rows, default) or "random"
+    count_by : str or list, optional
+        Instead of raw rows, send the number of rows in each group of these column(s)
+    prune : bool
+        If True (default), drop empty columns, and state columns with a single value
+        once in a note instead of repeating the value on every row
     
     Returns:
     --------
     str
-        A markdown-formatted table string
+        The table as text
     """
     
-    # Convert DataFrame to markdown table
-    # pandas to_markdown() method creates markdown tables
-    tab = df.to_markdown(index=False)
+    notes = []
+    
+    # Keep only the columns we need
+    if columns is not None:
+        df = df[columns]
+    
+    # Summarize: one row per group, with a count
+    if count_by is not None:
+        df = (df
+              .groupby(count_by, dropna=False)
+              .size()
+              .reset_index(name="n")
+              .sort_values("n", ascending=False))
+    
+    # Drop empty columns, and move single-value columns into a note
+    if prune and len(df) > 1:
+        values = df.replace("", pd.NA)
+        empty = [c for c in df.columns if values[c].isna().all()]
+        constant = [c for c in df.columns if c not in empty and values[c].nunique(dropna=False) == 1]
+        notes += [f"{c}={df[c].iloc[0]}" for c in constant]
+        df = df.drop(columns=empty + constant)
+    
+    # Cap the number of rows
+    if max_rows is not None and len(df) > max_rows:
+        notes.append(f"showing {max_rows} of {len(df)} rows")
+        df = df.sample(n=max_rows, random_state=1) if sample == "random" else df.head(max_rows)
+    
+    # Write the table in the chosen format
+    if format == "csv":
+        tab = df.to_csv(index=False).strip()
+    elif format == "tsv":
+        tab = df.to_csv(index=False, sep="\t").strip()
+    elif format == "json":
+        tab = df.to_json(orient="records", lines=True, date_format="iso").strip()
+    elif format == "markdown":
+        # pandas to_markdown() method creates markdown tables (requires: pip install tabulate)
+        tab = df.to_markdown(index=False)
+    else:
+        raise ValueError("Invalid format. Use 'csv', 'tsv', 'json', or 'markdown'.")
+    
+    # Put any notes first, as comment lines
+    if notes:
+        tab = "\n".join(f"# {note}" for note in notes) + "\n" + tab
     return tab
 
 
+def df_token_report(df, **options):
+    """
+    Compare how many tokens each text format would use for the same DataFrame.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame to measure
+    **options
+        Any other df_as_text() options (e.g. columns, max_rows)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Characters and estimated tokens per format, smallest first
+    """
+    
+    rows = []
+    for format in ["csv", "tsv", "json", "markdown"]:
+        try:
+            text = df_as_text(df, format=format, **options)
+        except ImportError:
+            continue  # markdown needs the tabulate package
+        rows.append({"format": format, "characters": len(text), "tokens": estimate_tokens(text)})
+    return pd.DataFrame(rows).sort_values("tokens").reset_index(drop=True)
+
+
 # 3. API FUNCTION ###################################
 
-def get_shortages(category="Psychiatry", limit=500):
+# FDA Drug Shortages API endpoint
+# https://open.fda.gov/apis/drug/drugshortages/
+FDA_SHORTAGES_URL = "https://api.fda.gov/drug/shortages.json"
+
+# openFDA returns at most 1000 records per request, so larger requests are split into pages
+FDA_PAGE_SIZE = 1000
+
+# How long (in seconds) to reuse a cached API response before asking the API again
+FDA_CACHE_TTL = 3600
+
+# Fields we keep from each shortage record
+SHORTAGE_FIELDS = ["generic_name", "update_type", "update_date", "availability", "related_info"]
+
+# All therapeutic categories in the FDA Drug Shortages data
+SHORTAGE_CATEGORIES = [
+    "Analgesia/Addiction", "Anesthesia", "Anti-Infective", "Antiviral",
+    "Cardiovascular", "Dental", "Dermatology", "Endocrinology/Metabolism",
+    "Gastroenterology", "Hematology", "Inborn Errors", "Medical Imaging",
+    "Musculoskeletal", "Neurology", "Oncology", "Ophthalmology", "Other",
+    "Pediatric", "Psychiatry", "Pulmonary/Allergy", "Renal", "Reproductive",
+    "Rheumatology", "Total Parenteral Nutrition", "Transplant", "Urology"
+]
+
+# One shared session reuses open connections to the API, instead of opening a new one per request
+fda_session = requests.Session()
+fda_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Cached API responses: (search, sort, skip, limit) -> (time fetched, response JSON)
+fda_cache = {}
+
+
+def get_fda_page(search, sort, skip, limit, ttl=FDA_CACHE_TTL):
+    """
+    Get one page of results from the FDA Drug Shortages API, reusing a cached copy if it is fresh.
+    
+    Parameters:
+    -----------
+    search : str
+        openFDA search expression
+    sort : str
+        openFDA sort expression
+    skip : int
+        Number of records to skip (where this page starts)
+    limit : int
+        Number of records on this page (at most FDA_PAGE_SIZE)
+    ttl : int
+        Seconds a cached response stays fresh (default: FDA_CACHE_TTL)
+    
+    Returns:
+    --------
+    dict
+        The API response as JSON (with an empty results list if nothing matched)
+    """
+    
+    key = (search, sort, skip, limit)
+    cached = fda_cache.get(key)
+    if cached is not None and time.time() - cached[0] < ttl:
+        return cached[1]
+    
+    params = {"search": search, "sort": sort, "skip": skip, "limit": limit}
+    response = fda_session.get(FDA_SHORTAGES_URL, params=params, headers={"Accept": "application/json"}, timeout=30)
+    
+    # openFDA answers 404 when no records match the search
+    if response.status_code == 404:
+        data = {"meta": {"results": {"total": 0}}, "results": []}
+    else:
+        response.raise_for_status()
+        data = response.json()
+    
+    fda_cache[key] = (time.time(), data)
+    return data
+
+
+def get_shortages(category="Psychiatry", limit=500, max_workers=8, ttl=FDA_CACHE_TTL):
     """
     Get data on drug shortages from the FDA Drug Shortages API.
     
@@ -169,7 +402,12 @@ def get_shortages(category="Psychiatry", limit=500):
     category : str
         The therapeutic category of the drug (default: "Psychiatry")
     limit : int
-        The maximum number of results to return (default: 500)
+        The maximum number of results to return (default: 500); None returns every match.
+        Requests over 1000 results are fetched as several pages at the same time.
+    max_workers : int
+        Maximum number of pages fetched at the same time (default: 8)
+    ttl : int
+        Seconds a cached response stays fresh (default: FDA_CACHE_TTL)
     
     Returns:
     --------
@@ -177,42 +415,528 @@ def get_shortages(category="Psychiatry", limit=500):
         A DataFrame of drug shortages
     """
     
-    # FDA Drug Shortages API endpoint
-    url = "https://api.fda.gov/drug/shortages.json"
-    
     # Build query parameters
-    params = {
-        "sort": "initial_posting_date:desc",
-        "search": f'dosage_form:"Capsule"+status:"Current"+therapeutic_category:"{category}"',
-        "limit": limit
-    }
-    
-    # Perform the request
-    response = requests.get(url, params=params, headers={"Accept": "application/json"})
-    response.raise_for_status()
-    
-    # Parse the response as JSON
-    data = response.json()
+    search = f'dosage_form:"Capsule"+status:"Current"+therapeutic_category:"{category}"'
+    sort = "initial_posting_date:desc"
     
-    # Process the data into a pandas DataFrame
-    results = data.get("results", [])
+    # Fetch the first page; it also tells us how many records match in total
+    first_size = FDA_PAGE_SIZE if limit is None else min(limit, FDA_PAGE_SIZE)
+    first = get_fda_page(search, sort, 0, first_size, ttl=ttl)
+    total = first.get("meta", {}).get("results", {}).get("total", len(first.get("results", [])))
+    wanted = total if limit is None else min(limit, total)
     
-    # Extract relevant fields
-    processed_data = []
-    for item in results:
-        processed_data.append({
-            "generic_name": item.get("generic_name", ""),
-            "update_type": item.get("update_type", ""),
-            "update_date": item.get("update_date", ""),
-            "availability": item.get("availability", ""),
-            "related_info": item.get("related_info", "")
-        })
+    # Fetch any remaining pages at the same time, using skip to step through the results
+    # (executor.map returns pages in order, so the records stay sorted)
+    skips = range(first_size, wanted, FDA_PAGE_SIZE)
+    pages = [first]
+    if len(skips) > 0:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages += list(executor.map(
+                lambda skip: get_fda_page(search, sort, skip, min(FDA_PAGE_SIZE, wanted - skip), ttl=ttl),
+                skips
+            ))
+    results = [item for page in pages for item in page.get("results", [])][:wanted]
     
-    # Convert to DataFrame
-    df = pd.DataFrame(processed_data)
+    # Build the DataFrame column by column, rather than from one dictionary per record
+    df = pd.DataFrame({
+        field: [item.get(field, "") for item in results]
+        for field in SHORTAGE_FIELDS
+    })
     
     # Parse dates (FDA API uses M/D/YYYY format)
     if not df.empty and "update_date" in df.columns:
         df["update_date"] = pd.to_datetime(df["update_date"], format="%m/%d/%Y", errors="coerce")
     
     return df
+
+
+def get_all_shortages(categories=SHORTAGE_CATEGORIES, limit=None, max_workers=8, ttl=FDA_CACHE_TTL):
+    """
+    Get drug shortages for many therapeutic categories at once, fetching categories in parallel.
+    
+    Parameters:
+    -----------
+    categories : list
+        Therapeutic categories to fetch (default: all of SHORTAGE_CATEGORIES)
+    limit : int, optional
+        Maximum results per category (default: None, meaning all)
+    max_workers : int
+        Maximum number of categories fetched at the same time (default: 8)
+    ttl : int
+        Seconds a cached response stays fresh (default: FDA_CACHE_TTL)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        A DataFrame of drug shortages, with a category column
+    """
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(
+            lambda category: get_shortages(category, limit=limit, max_workers=2, ttl=ttl).assign(category=category),
+            categories
+        ))
+    return pd.concat(frames, ignore_index=True)
+
+
+# Tools provided by this module
+register_tool(get_shortages)
+
+
+# 4. DATA SUMMARY FUNCTIONS ###################################
+
+def latest_by_group(df, group="generic_name", date="update_date"):
+    """
+    Keep only the most recent record for each group (e.g. the latest update per drug).
+    
+    This gives the same rows as
+    df.groupby(group).apply(lambda x: x.loc[x[date].idxmax()]),
+    but finds the latest row of every group in one vectorized idxmax() call
+    instead of one Python function call per group, so it stays fast on large tables
+    and keeps the group column.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The data, with one row per record
+    group : str
+        Column identifying each group (default: "generic_name")
+    date : str
+        Column used to pick the latest record (default: "update_date")
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per group, sorted by group, with a fresh index
+    """
+    
+    # Rows without a group or a date can never be the latest record; a fresh index makes row labels unique
+    df = df[df[group].notna() & df[date].notna()].reset_index(drop=True)
+    # Row label of the latest date in each group (ties go to the first row, like idxmax() per group)
+    rows = df.groupby(group)[date].idxmax()
+    return df.loc[rows.values].reset_index(drop=True)
+
+
+# 5. MODEL LIFECYCLE ###################################
+
+# Ollama endpoints for loading models and listing loaded models
+GENERATE_URL = f"{OLLAMA_HOST}/api/generate"
+PS_URL = f"{OLLAMA_HOST}/api/ps"
+
+def set_ollama_host(host):
+    """
+    Point every function in this file at a different Ollama server,
+    e.g. a remote machine or the mock server in 03_query_ai/mock_llm_server.py.
+    
+    Parameters:
+    -----------
+    host : str
+        Server address, e.g. "http://localhost:11435"
+    """
+    
+    global OLLAMA_HOST, CHAT_URL, GENERATE_URL, PS_URL
+    OLLAMA_HOST = host.rstrip("/")
+    CHAT_URL = f"{OLLAMA_HOST}/api/chat"
+    GENERATE_URL = f"{OLLAMA_HOST}/api/generate"
+    PS_URL = f"{OLLAMA_HOST}/api/ps"
+
+
+# Timings of recent model calls, oldest first (see timing_report())
+MODEL_TIMINGS = deque(maxlen=1000)
+
+# Workflow name for the calls that follow, and an optional JSONL file to log them to (see start_workflow())
+TELEMETRY = {"workflow": "default", "path": None}
+TELEMETRY_LOCK = threading.Lock()
+
+# OpenAI gpt-4o-mini prices in US dollars per 1 million (input, output) tokens,
+# to estimate what each call would cost there; prices change, see https://openai.com/api/pricing/
+OPENAI_PRICE = (0.15, 0.60)
+
+
+def start_workflow(name, path=None):
+    """
+    Label the model calls that follow as one workflow, and optionally log them to a JSONL file
+    (read it back with pd.read_json(path, lines=True)).
+    
+    Parameters:
+    -----------
+    name : str
+        Workflow name, e.g. "press_release"
+    path : str, optional
+        JSONL file to append one line per model call to (default: None, no file)
+    """
+    
+    TELEMETRY.update(workflow=name, path=path)
+
+
+def call_timings(result, model=None):
+    """
+    Read the timings Ollama reports with each response (nanoseconds) as seconds.
+    
+    Without streaming, the first token arrives once the model is loaded and the prompt is read,
+    so load + prompt time is the time to first token.
+    
+    Parameters:
+    -----------
+    result : dict
+        The JSON response from Ollama
+    model : str, optional
+        Model name to use if the response doesn't include one
+    
+    Returns:
+    --------
+    dict
+        load_seconds (loading the model into memory), prompt_seconds (reading the prompt),
+        eval_seconds (writing the answer), total_seconds, token counts, time to first token,
+        tokens per second, and the estimated OpenAI cost
+    """
+    
+    seconds = lambda key: round(result.get(key, 0) / 1e9, 3)
+    row = {
+        "model": result.get("model", model),
+        "load_seconds": seconds("load_duration"),
+        "prompt_seconds": seconds("prompt_eval_duration"),
+        "eval_seconds": seconds("eval_duration"),
+        "total_seconds": seconds("total_duration"),
+        "prompt_tokens": result.get("prompt_eval_count", 0),
+        "output_tokens": result.get("eval_count", 0)
+    }
+    row["ttft_seconds"] = round(row["load_seconds"] + row["prompt_seconds"], 3)
+    row["tokens_per_second"] = round(row["output_tokens"] / row["eval_seconds"], 1) if row["eval_seconds"] else None
+    row["openai_cost_usd"] = round((row["prompt_tokens"] * OPENAI_PRICE[0] + row["output_tokens"] * OPENAI_PRICE[1]) / 1e6, 6)
+    return row
+
+
+def record_timings(result, model=None, agent=None, wall_seconds=None):
+    """
+    Save the timings of one model call to MODEL_TIMINGS, and to the JSONL file if start_workflow() set one.
+    
+    Parameters:
+    -----------
+    result : dict
+        The JSON response from Ollama
+    model : str, optional
+        Model name to use if the response doesn't include one
+    agent : str, optional
+        Which agent made the call (e.g. the start of its role)
+    wall_seconds : float, optional
+        Time the call took as measured by the caller, including network time
+    
+    Returns:
+    --------
+    dict
+        The recorded timings
+    """
+    
+    row = {"time": datetime.now().isoformat(timespec="seconds"), "workflow": TELEMETRY["workflow"],
+           "agent": agent, **call_timings(result, model),
+           "wall_seconds": None if wall_seconds is None else round(wall_seconds, 3)}
+    MODEL_TIMINGS.append(row)
+    if TELEMETRY["path"]:
+        # Several agents may finish at once, so write one whole line at a time
+        with TELEMETRY_LOCK, open(TELEMETRY["path"], "a") as f:
+            f.write(json.dumps(row) + "\n")
+    return row
+
+
+def preload_models(models, keep_alive=KEEP_ALIVE):
+    """
+    Load models into memory before a workflow starts, and keep them loaded.
+    
+    Without this, the first call to each model also waits for the model to load,
+    which shows up as a random multi-second delay.
+    
+    Parameters:
+    -----------
+    models : list
+        Names of the models the workflow uses
+    keep_alive : str or int
+        How long Ollama keeps each model loaded after its last call (default: KEEP_ALIVE)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per model, with how long loading took
+    """
+    
+    rows = []
+    for model in models:
+        # A request with no prompt only loads the model
+        start = time.perf_counter()
+        response = requests.post(GENERATE_URL, json={"model": model, "keep_alive": keep_alive})
+        response.raise_for_status()
+        row = record_timings(response.json(), model, agent="preload", wall_seconds=time.perf_counter() - start)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def loaded_models():
+    """
+    List the models Ollama currently has in memory.
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per loaded model, with its name, memory size, and when it will be unloaded
+    """
+    
+    response = requests.get(PS_URL)
+    response.raise_for_status()
+    models = response.json().get("models", [])
+    return pd.DataFrame({
+        "model": [m.get("name") for m in models],
+        "size_vram": [m.get("size_vram") for m in models],
+        "expires_at": [m.get("expires_at") for m in models]
+    })
+
+
+def unload_models(models):
+    """
+    Unload models from memory right away (keep_alive = 0), to free memory after a workflow.
+    
+    Parameters:
+    -----------
+    models : list
+        Names of the models to unload
+    """
+    
+    for model in models:
+        response = requests.post(GENERATE_URL, json={"model": model, "keep_alive": 0})
+        response.raise_for_status()
+
+
+def timing_report(records=None, by="model"):
+    """
+    Summarize the recorded model calls: how much time went to loading vs. answering,
+    and which agent or model dominates latency.
+    
+    Parameters:
+    -----------
+    records : pandas.DataFrame or list, optional
+        Recorded timings, e.g. read from a JSONL file (default: MODEL_TIMINGS)
+    by : str or list
+        Column(s) to group by, e.g. "model", "agent", or ["workflow", "agent"] (default: "model")
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per group, slowest first: number of calls, tokens, total load, prompt, eval, and overall seconds,
+        mean time to first token, tokens per second, share of total time, and estimated OpenAI cost
+    """
+    
+    timings = pd.DataFrame(list(MODEL_TIMINGS) if records is None else records)
+    if timings.empty:
+        return timings
+    report = (timings
+              .groupby(by, as_index=False, dropna=False)
+              .agg(calls=("total_seconds", "size"),
+                   prompt_tokens=("prompt_tokens", "sum"),
+                   output_tokens=("output_tokens", "sum"),
+                   load_seconds=("load_seconds", "sum"),
+                   prompt_seconds=("prompt_seconds", "sum"),
+                   eval_seconds=("eval_seconds", "sum"),
+                   total_seconds=("total_seconds", "sum"),
+                   ttft_seconds=("ttft_seconds", "mean"),
+                   openai_cost_usd=("openai_cost_usd", "sum")))
+    report["tokens_per_second"] = report["output_tokens"] / report["eval_seconds"].where(report["eval_seconds"] > 0)
+    report["share_of_time"] = report["total_seconds"] / report["total_seconds"].sum()
+    # Costs are fractions of a cent, so they keep more decimal places
+    report = report.round({column: 3 for column in report.columns if column != "openai_cost_usd"})
+    return report.sort_values("total_seconds", ascending=False).reset_index(drop=True)
+
+
+# 6. RULES FOR AGENT ROLES ###################################
+
+# Formatted rules, by the SHA-256 hash of the rules file's contents: hash -> {rule type: text}
+# Editing the file changes its hash, so edited rules are always reloaded.
+RULES_CACHE = {}
+
+
+def format_rules_for_prompt(ruleset):
+    """
+    Format a ruleset into a string that can be included in the agent's role.
+    
+    Parameters:
+    -----------
+    ruleset : dict
+        A ruleset dictionary with 'name', 'description', and 'guidance' keys
+    
+    Returns:
+    --------
+    str
+        Formatted rules string
+    """
+    
+    return f"{ruleset['name']}\n{ruleset['description']}\n\n{ruleset['guidance']}"
+
+
+def load_rules(path):
+    """
+    Load a YAML rules file and format every ruleset for prompts, reusing earlier results.
+    
+    The file is parsed and formatted only the first time its contents are seen,
+    so the rule text is identical (character for character) on every call.
+    
+    Parameters:
+    -----------
+    path : str
+        Path to a YAML file with a top-level 'rules' key, e.g. "04_rules.yaml"
+    
+    Returns:
+    --------
+    dict
+        Rule type (e.g. "data_analysis") -> formatted rules string
+    """
+    
+    with open(path, "rb") as f:
+        raw = f.read()
+    key = hashlib.sha256(raw).hexdigest()
+    
+    if key not in RULES_CACHE:
+        rules = yaml.safe_load(raw)
+        RULES_CACHE[key] = {
+            rule_type: "\n\n".join(format_rules_for_prompt(ruleset) for ruleset in rulesets)
+            for rule_type, rulesets in rules["rules"].items()
+        }
+    return RULES_CACHE[key]
+
+
+def role_with_rules(role, rules):
+    """
+    Build a system prompt from a base role and formatted rules.
+    
+    This only joins the two strings; it does no caching itself. Build each role once and reuse it
+    (as 04_rules.py does): when consecutive calls start with the same system prompt,
+    Ollama (with the model kept loaded) reuses the work it already did reading that prefix,
+    so only the new user message has to be processed.
+    
+    Parameters:
+    -----------
+    role : str
+        The base role, e.g. "Analyze medicine shortage data..."
+    rules : str
+        Formatted rules, e.g. load_rules("04_rules.yaml")["data_analysis"]
+    
+    Returns:
+    --------
+    str
+        The role followed by the rules
+    """
+    
+    return f"{role}\n\n{rules}"
+
+
+# 7. MAP-REDUCE SUMMARIES ###################################
+
+# A large table can be longer than a small model's context window, and one long prompt
+# takes longer the more rows it has. agent_map_reduce() instead splits the table into
+# row chunks, has the agent summarize each chunk at the same time (map), then combines
+# those partial answers into one (reduce). Ollama answers several requests at once
+# (see the OLLAMA_NUM_PARALLEL setting), so wall time grows with the number of rounds,
+# not the number of rows.
+
+# Token budgets: the most tokens of table text per chunk, and the most tokens per answer
+CHUNK_TOKENS = 1500
+ANSWER_TOKENS = 400
+
+MAP_INSTRUCTIONS = ("You are given one part of a larger table. Answer using only the rows in this part, "
+                    "keeping names, dates and counts exact, in at most {words} words.")
+REDUCE_INSTRUCTIONS = ("You are given partial answers, each written from one part of a larger table. "
+                       "Combine them into one answer, without repeating items, in at most {words} words.")
+
+def df_chunks(df, chunk_tokens=CHUNK_TOKENS, **options):
+    """
+    Split a DataFrame into row chunks whose text stays within a token budget.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame to split
+    chunk_tokens : int
+        Most estimated tokens of text per chunk (default: CHUNK_TOKENS)
+    **options
+        Any other df_as_text() options (e.g. columns, format)
+    
+    Returns:
+    --------
+    list
+        DataFrames, one per chunk, in row order
+    """
+    
+    # Estimate tokens per row from the whole table, then size the chunks to fit the budget
+    tokens_per_row = max(estimate_tokens(df_as_text(df, **options)) / max(len(df), 1), 1)
+    rows_per_chunk = max(int(chunk_tokens // tokens_per_row), 1)
+    return [df.iloc[start:start + rows_per_chunk] for start in range(0, len(df), rows_per_chunk)]
+
+
+def agent_map_reduce(df, role, task="", model=DEFAULT_MODEL, chunk_tokens=CHUNK_TOKENS,
+                     answer_tokens=ANSWER_TOKENS, max_workers=4, keep_alive=KEEP_ALIVE,
+                     label="map_reduce", **options):
+    """
+    Run an agent over a large DataFrame by summarizing row chunks at the same time, then combining them.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The data for the agent
+    role : str
+        The system prompt defining the agent's role
+    task : str
+        Extra instructions sent with every chunk (default: "")
+    model : str
+        Model to use (default: DEFAULT_MODEL)
+    chunk_tokens : int
+        Most estimated tokens of table text (or partial answers) per call (default: CHUNK_TOKENS)
+    answer_tokens : int
+        Most tokens in each partial answer and in the final answer (default: ANSWER_TOKENS)
+    max_workers : int
+        Most calls sent to Ollama at the same time (default: 4)
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after each call (default: KEEP_ALIVE)
+    label : str
+        Name for these calls in the recorded timings; map and reduce calls get ":map" and ":reduce" (default: "map_reduce")
+    **options
+        Any other df_as_text() options (e.g. columns, format)
+    
+    Returns:
+    --------
+    str
+        The agent's combined answer
+    """
+    
+    limits = {"num_predict": answer_tokens}
+    words = answer_tokens * 3 // 4  # about 0.75 words per token
+    
+    # A table that fits in one chunk needs only one call
+    chunks = df_chunks(df, chunk_tokens=chunk_tokens, **options)
+    if len(chunks) <= 1:
+        text = df_as_text(df, **options)
+        return agent_run(role=role, task=f"{task}\n\n{text}".strip(), model=model,
+                         keep_alive=keep_alive, label=label, options=limits)
+    
+    # The role and instructions stay the same for every chunk, so Ollama can reuse that prompt prefix
+    map_role = f"{role}\n\n{MAP_INSTRUCTIONS.format(words=words)}"
+    reduce_role = f"{role}\n\n{REDUCE_INSTRUCTIONS.format(words=words)}"
+    
+    def map_chunk(numbered):
+        number, chunk = numbered
+        text = f"{task}\n\nPart {number} of {len(chunks)}:\n{df_as_text(chunk, **options)}".strip()
+        return agent_run(role=map_role, task=text, model=model, keep_alive=keep_alive,
+                         label=f"{label}:map", options=limits)
+    
+    def reduce_group(group):
+        text = "\n\n".join(f"Partial answer {number}:\n{answer}" for number, answer in enumerate(group, start=1))
+        return agent_run(role=reduce_role, task=f"{task}\n\n{text}".strip(), model=model,
+                         keep_alive=keep_alive, label=f"{label}:reduce", options=limits)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Map: one partial answer per chunk, all at the same time
+        answers = list(pool.map(map_chunk, enumerate(chunks, start=1)))
+        
+        # Reduce: combine as many partial answers per call as fit the budget, and repeat until one is left
+        per_call = max(chunk_tokens // answer_tokens, 2)
+        while len(answers) > 1:
+            groups = [answers[start:start + per_call] for start in range(0, len(answers), per_call)]
+            answers = list(pool.map(reduce_group, groups))
+    
+    return answers[0]
@@ -9,6 +9,8 @@ source .bashrc
 MODEL="smollm2:135m"  # small model, no function calling (< 200 MB)
 # Pull model of interest
 # ollama pull $MODEL
+# Pull the embedding model used by 05_vectors.py
+# ollama pull nomic-embed-text
 
 
 # Configuration
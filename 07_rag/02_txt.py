@@ -10,7 +10,6 @@
 ## 0.1 Load Packages #################################
 
 import requests  # for HTTP requests
-import json      # for working with JSON
 import os        # for file path operations
 
 # If you haven't already, install the requests package...
@@ -18,8 +17,8 @@ import os        # for file path operations
 
 ## 0.2 Load Functions #################################
 
-# Load helper functions for agent orchestration
-from functions import agent_run
+# Load helper functions for agent orchestration and indexed text search
+from functions import agent_run, get_text_retriever, pack_context, preload_models, timing_report
 
 ## 0.3 Configuration #################################
 
@@ -28,10 +27,11 @@ MODEL = "smollm2:135m"  # use this small model (no function calling, < 200 MB)
 PORT = 11434  # use this default port
 OLLAMA_HOST = f"http://localhost:{PORT}"  # use this default host
 DOCUMENT = "06_rag/data/sample.txt"  # path to the text document to search
+TOKEN_BUDGET = 500  # maximum (estimated) tokens of retrieved content to send to the model
 
 # 1. SEARCH FUNCTION ###################################
 
-def search_text(query, document_path):
+def search_text(query, document_path, k=None):
     """
     Search a text file for lines containing the query.
     
@@ -41,6 +41,9 @@ def search_text(query, document_path):
         The search term to look for
     document_path : str
         Path to the text file to search
+    k : int, optional
+        If given, return only the k best-matching lines, ranked by BM25 score.
+        If None (default), return every line containing the query, in file order.
     
     Returns:
     --------
@@ -48,15 +51,18 @@ def search_text(query, document_path):
         Dictionary with query, document name, matching content, and line count
     """
     
-    # Read the text file
-    with open(document_path, 'r', encoding='utf-8') as f:
-        text_content = f.readlines()
+    # Get the retriever for this document
+    # The file is read and indexed once; later searches reuse the index,
+    # and the index is rebuilt automatically if the file changes.
+    retriever = get_text_retriever(document_path)
     
     # Find lines containing the query (case-insensitive)
-    matching_lines = [line for line in text_content if query.lower() in line.lower()]
-    
-    if len(matching_lines) == 0:
-        matching_lines = []
+    # With k, rank lines by relevance and keep only the top k,
+    # so the prompt stays small and focused no matter how large the document is.
+    if k is None:
+        matching_lines = retriever.search(query)
+    else:
+        matching_lines = retriever.search_ranked(query, k=k)
     
     # Combine matching lines into a single text
     result_text = "\n".join(matching_lines)
@@ -81,14 +87,23 @@ print()
 
 # 3. RAG WORKFLOW ###################################
 
+# Load the model now (and keep it loaded), so the answer below isn't slowed down by loading it
+preload_models([MODEL])
+
 # Example: Search for content about a specific topic
 input_data = {"topic": "supervised learning"}
 
-# Task 1: Data Retrieval - Search the text document for relevant content
-result1 = search_text(input_data["topic"], DOCUMENT)
+# Task 1: Data Retrieval - Search the text document for the 5 most relevant lines
+result1 = search_text(input_data["topic"], DOCUMENT, k=5)
 
-# Convert results to JSON for the LLM
-result1_json = json.dumps(result1, indent=2)
+# Pack the matching lines into a compact context for the LLM
+# Each line becomes "[n] source: text", which uses far fewer tokens than indented JSON,
+# and pack_context() stops adding lines once the token budget is full.
+context = pack_context(
+    [(result1["document"], line) for line in result1["matching_content"].split("\n") if line],
+    token_budget=TOKEN_BUDGET
+)
+result1_context = f"Topic: {input_data['topic']}\n\nRetrieved content:\n{context}"
 
 # Task 2: Generation augmented with the retrieved data
 # Generate an explanation based on the retrieved content
@@ -97,7 +112,7 @@ role = "Output a clear explanation of the topic based on the retrieved content.
 # Using our custom agent_run function, which wraps requests.post
 result2 = agent_run(
     role=role,
-    task=result1_json,
+    task=result1_context,
     model=MODEL,
     output="text"
 )
@@ -107,6 +122,10 @@ print("📝 Generated Explanation:")
 print(result2)
 print()
 
+# Where did the time go? Loading the model vs. reading the prompt vs. writing the answer
+print(timing_report())
+print()
+
 # 4. ALTERNATIVE: MANUAL CHAT APPROACH ###################################
 
 # Alternative: Manual chat approach, using requests.post directly
@@ -114,7 +133,7 @@ CHAT_URL = f"{OLLAMA_HOST}/api/chat"
 
 messages = [
     {"role": "system", "content": role},
-    {"role": "user", "content": result1_json}
+    {"role": "user", "content": result1_context}
 ]
 
 body = {
@@ -11,15 +11,14 @@
 
 import pandas as pd  # for reading CSV files and data manipulation
 import requests      # for HTTP requests
-import json          # for working with JSON
 
 # If you haven't already, install these packages...
 # pip install pandas requests
 
 ## 0.2 Load Functions #################################
 
-# Load helper functions for agent orchestration
-from functions import agent_run
+# Load helper functions for agent orchestration and cached CSV lookups
+from functions import agent_run, get_csv_retriever, df_as_text, preload_models, timing_report
 
 ## 0.3 Configuration #################################
 
@@ -31,7 +30,7 @@ DOCUMENT = "06_rag/data/pokemon.csv"  # path to the document to search
 
 # 1. SEARCH FUNCTION ###################################
 
-def search(query, document):
+def search(query, document, mode="contains"):
     """
     Search a CSV file for rows matching the query in the Name column.
     
@@ -41,26 +40,28 @@ def search(query, document):
         The search term to look for
     document : str
         Path to the CSV file to search
+    mode : str
+        "exact", "prefix", or "contains" match on the Name column (default: "contains")
     
     Returns:
     --------
     str
-        JSON string of matching rows
+        Matching rows as compact CSV text
     """
     
-    # Read the CSV file
-    df = pd.read_csv(document)
+    # Get the retriever for this CSV file
+    # The file is parsed once and cached; later searches skip parsing entirely,
+    # and the cache is refreshed automatically if the file changes.
+    retriever = get_csv_retriever(document, column="Name")
     
-    # Filter rows where Name contains the query (case-insensitive)
-    filtered_df = df[df["Name"].str.contains(query, case=False, na=False)]
+    # Filter rows where Name matches the query (case-insensitive)
+    filtered_df = retriever.search(query, mode=mode)
     
-    # Convert to dictionary and then to JSON
-    result_dict = filtered_df.to_dict(orient="records")
+    # Convert to compact CSV text for the LLM
+    # (no indentation or repeated key names, unlike json.dumps(..., indent=2))
+    result_text = df_as_text(filtered_df, prune=False)
     
-    # Convert to JSON string (auto-unbox equivalent: ensure single-item lists become values)
-    result_json = json.dumps(result_dict, indent=2)
-    
-    return result_json
+    return result_text
 
 # 2. TEST SEARCH FUNCTION ###################################
 
@@ -73,11 +74,14 @@ print()
 
 # 3. RAG WORKFLOW ###################################
 
+# Load the model now (and keep it loaded), so the answer below isn't slowed down by loading it
+preload_models([MODEL])
+
 # Suppose the user supplies a specific item to search
 input_data = {"pokemon": "Pikachu"}
 
-# Task 1: Data Retrieval - Search the document for the item
-result1 = search(input_data["pokemon"], DOCUMENT)
+# Task 1: Data Retrieval - Search the document for the item (exact name match)
+result1 = search(input_data["pokemon"], DOCUMENT, mode="exact")
 
 # Task 2: Generation augmented with the data retrieved
 # Generate a profile description of the Pokemon
@@ -91,6 +95,10 @@ print("📝 Generated Pokemon Profile:")
 print(result2)
 print()
 
+# Where did the time go? Loading the model vs. reading the prompt vs. writing the answer
+print(timing_report())
+print()
+
 # 4. ALTERNATIVE: MANUAL CHAT APPROACH ###################################
 
 # Alternative: Manual chat approach, using requests.post directly
@@ -12,15 +12,14 @@
 import sqlite3  # for SQLite database operations (built-in)
 import pandas as pd  # for data manipulation
 import requests  # for HTTP requests
-import json      # for working with JSON
 
 # If you haven't already, install these packages...
 # pip install pandas requests
 
 ## 0.2 Load Functions #################################
 
-# Load helper functions for agent orchestration
-from functions import agent_run
+# Load helper functions for agent orchestration and ranked retrieval
+from functions import agent_run, BM25Index, tokenize, build_context, preload_models, timing_report
 
 ## 0.3 Configuration #################################
 
@@ -29,17 +28,106 @@ MODEL = "smollm2:135m"  # use this small model (no function calling, < 200 MB)
 PORT = 11434  # use this default port
 OLLAMA_HOST = f"http://localhost:{PORT}"  # use this default host
 DB_PATH = "06_rag/data/papers.db"  # path to the SQLite database
+TOKEN_BUDGET = 600  # maximum (estimated) tokens of retrieved content to send to the model
 
 # 1. DATABASE CONNECTION ###################################
 
 # Connect to database
 conn = sqlite3.connect(DB_PATH)
 
+## 1.1 Full-Text Search Index #################################
+
+# A LIKE '%query%' search has to read every row of the table, every time.
+# SQLite's FTS5 extension builds a full-text index (word -> documents), like the index of a book,
+# so searches stay fast even with hundreds of thousands of papers.
+# Triggers keep the index in sync whenever the documents table changes.
+
+# The index table and its three triggers; all four must exist for the index to stay in sync
+FTS_OBJECTS = ["documents_fts", "documents_fts_insert", "documents_fts_delete", "documents_fts_update"]
+
+FTS_SETUP = [
+    # External-content FTS5 table: it indexes the documents table without copying the text
+    """
+    CREATE VIRTUAL TABLE documents_fts USING fts5(
+        title, content, tags,
+        content = 'documents', content_rowid = 'id'
+    )
+    """,
+    # Triggers keep the index in sync on insert, delete, and update
+    """
+    CREATE TRIGGER documents_fts_insert AFTER INSERT ON documents BEGIN
+        INSERT INTO documents_fts(rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, new.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER documents_fts_delete AFTER DELETE ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, old.tags);
+    END
+    """,
+    """
+    CREATE TRIGGER documents_fts_update AFTER UPDATE ON documents BEGIN
+        INSERT INTO documents_fts(documents_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, old.content, old.tags);
+        INSERT INTO documents_fts(rowid, title, content, tags)
+        VALUES (new.id, new.title, new.content, new.tags);
+    END
+    """,
+    # Index the documents that are already in the table
+    "INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')"
+]
+
+def create_fts_index(db_connection):
+    """
+    Create (once) an FTS5 full-text index over the title, content, and tags of the documents table.
+    
+    Parameters:
+    -----------
+    db_connection : sqlite3.Connection
+        Database connection object
+    
+    Returns:
+    --------
+    bool
+        True if the index is available, False if this SQLite build does not support FTS5
+    """
+    
+    # Check whether the index table and all of its triggers already exist
+    found = {name for (name,) in db_connection.execute(
+        f"SELECT name FROM sqlite_master WHERE name IN ({','.join('?' * len(FTS_OBJECTS))})",
+        FTS_OBJECTS
+    )}
+    if found == set(FTS_OBJECTS):
+        return True
+    
+    # Create everything in one explicit transaction, so an interrupted run leaves either
+    # the complete index or nothing. (executescript() would commit partway through.)
+    # If an earlier run left only part of it, drop that part and start again.
+    db_connection.commit()
+    try:
+        db_connection.execute("BEGIN")
+        for name in FTS_OBJECTS[1:]:
+            db_connection.execute(f"DROP TRIGGER IF EXISTS {name}")
+        db_connection.execute("DROP TABLE IF EXISTS documents_fts")
+        for statement in FTS_SETUP:
+            db_connection.execute(statement)
+        db_connection.commit()
+    except sqlite3.OperationalError as e:
+        db_connection.rollback()
+        print(f"⚠️ Full-text search unavailable ({e}); falling back to in-memory BM25 search.")
+        return False
+    
+    return True
+
+# Build the index (only does work the first time the database is used)
+HAS_FTS = create_fts_index(conn)
+
 # 2. SEARCH FUNCTION ###################################
 
 def search_documents(query, db_connection, limit=5):
     """
-    Search the database for documents matching the query.
+    Search the database for documents matching the query, best matches first.
     
     Parameters:
     -----------
@@ -53,30 +141,96 @@ def search_documents(query, db_connection, limit=5):
     Returns:
     --------
     pandas.DataFrame
-        DataFrame with matching documents
+        DataFrame with matching documents, including a short snippet of the
+        matching content and a relevance score
     """
     
-    # Search in title, content, and tags
+    # Without FTS5, use the in-memory BM25 search instead (see 2.1)
+    if not HAS_FTS:
+        return search_documents_ranked(query, db_connection, k=limit)
+    
+    # Quote each word so that punctuation in the query can't break the FTS5 syntax.
+    # Documents must contain every word of the query.
+    words = tokenize(query)
+    if not words:
+        return pd.DataFrame(columns=["id", "title", "snippet", "category", "author", "tags", "score"])
+    match = " ".join(f'"{word}"' for word in words)
+    
+    # Search in title, content, and tags using the full-text index
+    # bm25() ranks matches by relevance (lower is better), weighting title matches most.
+    # snippet() pulls out ~16 words of content around the match, instead of the whole text.
     sql_query = """
-        SELECT id, title, content, category, author, tags
-        FROM documents
-        WHERE title LIKE ? 
-           OR content LIKE ?
-           OR tags LIKE ?
+        SELECT d.id, d.title,
+               snippet(documents_fts, 1, '', '', '...', 16) AS snippet,
+               d.category, d.author, d.tags,
+               -bm25(documents_fts, 3.0, 1.0, 2.0) AS score
+        FROM documents_fts
+        JOIN documents AS d ON d.id = documents_fts.rowid
+        WHERE documents_fts MATCH ?
+        ORDER BY bm25(documents_fts, 3.0, 1.0, 2.0)
         LIMIT ?
     """
     
-    search_pattern = f"%{query}%"
-    
     # Execute query with parameters
-    results = pd.read_sql_query(
-        sql_query,
-        db_connection,
-        params=(search_pattern, search_pattern, search_pattern, limit)
-    )
+    results = pd.read_sql_query(sql_query, db_connection, params=(match, limit))
     
     return results
 
+## 2.1 Ranked Search Function #################################
+
+# If your SQLite build does not include FTS5, we can rank documents ourselves instead.
+# Here we rank every document by BM25 relevance in Python and keep only the top k,
+# using the same BM25Index that 02_txt.py uses for text files.
+
+# BM25 index for each database connection, built once and reused across queries.
+# The dictionary is keyed by the connection object itself (not id(), which Python reuses
+# after a connection is garbage collected). sqlite3 connections can't be weakly referenced,
+# so the cache keeps each connection it has seen alive until the script ends.
+document_indexes = {}
+
+def documents_version(db_connection):
+    """Signals that change whenever the documents table may have changed, without scanning the table."""
+    # data_version changes when another connection commits; total_changes counts this connection's edits
+    data_version = db_connection.execute("PRAGMA data_version").fetchone()[0]
+    return (data_version, db_connection.total_changes)
+
+def search_documents_ranked(query, db_connection, k=5):
+    """
+    Search the database for the k documents that best match the query, ranked by BM25 score.
+    
+    Parameters:
+    -----------
+    query : str
+        The search terms to look for
+    db_connection : sqlite3.Connection
+        Database connection object
+    k : int
+        Number of results to return (default: 5)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        DataFrame with the top k documents, best match first, plus a score column
+    """
+    
+    # Build the index the first time this database is searched
+    # (or again if the documents table has changed since)
+    version = documents_version(db_connection)
+    cached = document_indexes.get(db_connection)
+    if cached is None or cached["version"] != version:
+        docs = pd.read_sql_query("SELECT id, title, content, category, author, tags FROM documents", db_connection)
+        docs = docs.fillna({column: "" for column in ["title", "content", "category", "author", "tags"]})
+        text = docs["title"] + " " + docs["content"] + " " + docs["tags"]
+        cached = {"version": version, "docs": docs, "index": BM25Index(text.tolist())}
+        document_indexes[db_connection] = cached
+    
+    # Score documents and keep the top k
+    hits = cached["index"].search(query, k=k)
+    results = cached["docs"].iloc[[doc_id for doc_id, score in hits]].copy()
+    results["score"] = [round(score, 3) for doc_id, score in hits]
+    
+    return results.reset_index(drop=True)
+
 # 3. TEST SEARCH FUNCTION ###################################
 
 # Test search function
@@ -86,18 +240,42 @@ print(f"Found {len(test_result)} matching documents")
 print(test_result[["title", "category"]].head() if len(test_result) > 0 else "No results")
 print()
 
+# Test ranked search function
+print("Testing ranked search function...")
+test_ranked = search_documents_ranked("machine learning", conn, k=3)
+print(test_ranked[["title", "score"]] if len(test_ranked) > 0 else "No results")
+print()
+
 # 4. RAG WORKFLOW ###################################
 
+# Load the model now (and keep it loaded), so the answer below isn't slowed down by loading it
+preload_models([MODEL])
+
 # Example: Search for documents about a specific topic
 input_data = {"topic": "database"}
 
-# Task 1: Data Retrieval - Search the database for relevant documents; limit to 3 results
+# Task 1: Data Retrieval - Search the database for the 3 most relevant documents
 result1 = search_documents(input_data["topic"], conn, limit=3)
 
-# Convert results to JSON for the LLM
-# Convert DataFrame to dictionary, then to JSON
-result1_dict = result1.to_dict(orient="records")
-result1_json = json.dumps(result1_dict, indent=2)
+# Build a compact context for the LLM
+# Rather than sending every full content field as indented JSON, we fetch the full text of the
+# top documents, split it into chunks, drop duplicate chunks, and keep the chunks most relevant
+# to the topic until the token budget is full.
+# (If the search found nothing, there is nothing to fetch: "IN ()" is not valid SQL.)
+if len(result1) > 0:
+    full_docs = pd.read_sql_query(
+        f"SELECT id, title, content FROM documents WHERE id IN ({','.join('?' * len(result1))})",
+        conn,
+        params=[int(i) for i in result1["id"]]
+    )
+    context = build_context(
+        input_data["topic"],
+        list(zip(full_docs["title"], full_docs["content"])),
+        token_budget=TOKEN_BUDGET
+    )
+else:
+    context = "(no matching documents found)"
+result1_context = f"Topic: {input_data['topic']}\n\nRetrieved documents:\n{context}"
 
 # Task 2: Generation augmented with the retrieved data
 # Generate a summary of the retrieved documents
@@ -106,7 +284,7 @@ role = "Output a concise summary of the retrieved documents, highlighting key co
 # Using our custom agent_run function, which wraps requests.post
 result2 = agent_run(
     role=role,
-    task=result1_json,
+    task=result1_context,
     model=MODEL,
     output="text"
 )
@@ -116,6 +294,10 @@ print("📝 Generated Summary:")
 print(result2)
 print()
 
+# Where did the time go? Loading the model vs. reading the prompt vs. writing the answer
+print(timing_report())
+print()
+
 # 5. ALTERNATIVE: MANUAL CHAT APPROACH ###################################
 
 # Alternative: Manual chat approach, using requests.post directly
@@ -123,7 +305,7 @@ CHAT_URL = f"{OLLAMA_HOST}/api/chat"
 
 messages = [
     {"role": "system", "content": role},
-    {"role": "user", "content": result1_json}
+    {"role": "user", "content": result1_context}
 ]
 
 body = {
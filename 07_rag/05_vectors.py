@@ -0,0 +1,94 @@
+# 05_vectors.py
+# Example RAG workflow using embeddings (semantic search)
+# Tim Fraser
+
+# This script demonstrates how to perform Retrieval-Augmented Generation (RAG) with embeddings.
+# Students learn how to turn text into vectors, store them in a reusable on-disk index,
+# and retrieve the chunks closest in meaning to a question, without an external vector database.
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import time      # for timing searches
+
+# If you haven't already, install these packages...
+# pip install requests pandas numpy
+
+## 0.2 Load Functions #################################
+
+# Load helper functions for agent orchestration and vector retrieval
+from functions import agent_run, VectorIndex, embed_ollama, embed_hashing, pack_context, preload_models, timing_report
+
+## 0.3 Configuration #################################
+
+# Select model of interest
+MODEL = "smollm2:135m"  # use this small model (no function calling, < 200 MB)
+DOCUMENT = "07_rag/data/sample.txt"  # path to the text document to search
+INDEX_PATH = "07_rag/data/vectors/sample"  # where to save the vector index
+TOKEN_BUDGET = 500  # maximum (estimated) tokens of retrieved content to send to the model
+
+# Choose how to embed text:
+# "ollama" uses a local embedding model (first run: ollama pull nomic-embed-text)
+# "offline" uses a simple built-in stand-in, so you can try this script without Ollama
+EMBEDDINGS = "ollama"
+embed = embed_ollama if EMBEDDINGS == "ollama" else embed_hashing
+
+# 1. CHUNK THE DOCUMENT ###################################
+
+# Split the document into chunks; here, each non-empty line is one chunk.
+# Each chunk gets an id, so we can tell which chunks are new or changed next time.
+with open(DOCUMENT, "r", encoding="utf-8") as f:
+    lines = [line.strip() for line in f]
+
+chunks = {f"sample.txt:{i}": line for i, line in enumerate(lines) if line}
+
+# 2. BUILD THE VECTOR INDEX ###################################
+
+# Open the index (or create a new one) and add our chunks.
+# Only new or changed chunks are embedded, so re-running this script is nearly free.
+# If you switch EMBEDDINGS, delete the 07_rag/data/vectors folder first.
+index = VectorIndex(INDEX_PATH, embed=embed)
+n_embedded = index.add(list(chunks.keys()), list(chunks.values()))
+print(f"Embedded {n_embedded} new or changed chunks ({len(index.ids)} in index)")
+print()
+
+# 3. TEST SEARCH ###################################
+
+# Find the chunks closest in meaning to a question
+start_time = time.time()
+hits = index.search("How do computers learn from labeled data?", k=3)
+elapsed_ms = (time.time() - start_time) * 1000
+
+print(f"Top matches ({elapsed_ms:.1f} ms):")
+for chunk_id, score in hits:
+    print(f"  {score:.3f}  {chunks[chunk_id]}")
+print()
+
+# 4. RAG WORKFLOW ###################################
+
+# Load the model now (and keep it loaded), so the answer below isn't slowed down by loading it
+preload_models([MODEL])
+
+# Example: a question about a topic
+input_data = {"question": "What kinds of machine learning are there?"}
+
+# Task 1: Data Retrieval - Find the 3 chunks most similar in meaning to the question
+hits = index.search(input_data["question"], k=3)
+
+# Pack the retrieved chunks into a compact context, within our token budget
+context = pack_context([(chunk_id, chunks[chunk_id]) for chunk_id, score in hits], token_budget=TOKEN_BUDGET)
+result1_context = f"Question: {input_data['question']}\n\nRetrieved content:\n{context}"
+
+# Task 2: Generation augmented with the retrieved data
+role = "Answer the user's question using only the retrieved content. Format as markdown with a title and a short paragraph. If the content is incomplete, note that in your response."
+
+result2 = agent_run(role=role, task=result1_context, model=MODEL, output="text")
+
+# View result
+print("📝 Generated Answer:")
+print(result2)
+
+# Where did the time go? Loading the model vs. reading the prompt vs. writing the answer
+print(timing_report())
+print()
@@ -0,0 +1,112 @@
+# 06_ann_benchmark.py
+# Approximate Nearest Neighbor Search: Recall vs. Latency
+# Pairs with 05_vectors.py
+# Tim Fraser
+
+# This script compares exact vector search with an approximate (IVF) index.
+# Students learn why exact search slows down as a corpus grows, how clustering vectors
+# speeds search up, and how to measure the accuracy (recall) we give up in exchange.
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import time          # for timing searches
+import tempfile      # for a scratch folder to save the index
+import shutil        # for deleting the scratch folder afterwards
+import os            # for file paths
+import numpy as np   # for vector math
+import pandas as pd  # for the results table
+
+# If you haven't already, install these packages...
+# pip install numpy pandas requests
+
+## 0.2 Load Functions #################################
+
+# Load helper functions for vector retrieval
+from functions import IVFIndex, normalize_rows
+
+## 0.3 Configuration #################################
+
+N_VECTORS = 200000   # number of chunks in our pretend corpus (try 1,000,000+ if you have the memory)
+DIM = 128            # embedding size
+N_QUERIES = 100      # number of test queries
+K = 10               # results per query
+N_PROBES = [1, 2, 4, 8, 16, 32]  # how many clusters to search
+
+# 1. MAKE TEST DATA ###################################
+
+# Real embeddings form clusters (texts about similar topics sit close together),
+# so we simulate clustered vectors: random topic centers plus noise.
+rng = np.random.default_rng(42)
+topics = rng.normal(size=(500, DIM)).astype(np.float32)
+vectors = normalize_rows(topics[rng.integers(0, 500, N_VECTORS)] + 1.5 * rng.normal(size=(N_VECTORS, DIM)).astype(np.float32))
+queries = normalize_rows(topics[rng.integers(0, 500, N_QUERIES)] + 1.5 * rng.normal(size=(N_QUERIES, DIM)).astype(np.float32))
+
+# 2. EXACT SEARCH (BASELINE) ###################################
+
+# Compare each query with every vector, and keep the top K
+def exact_search(query, k=K):
+    scores = vectors @ query
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+start_time = time.perf_counter()
+exact_results = [set(exact_search(q)) for q in queries]
+exact_ms = (time.perf_counter() - start_time) * 1000 / N_QUERIES
+
+# 3. BUILD, SAVE, AND RELOAD THE APPROXIMATE INDEX ###################################
+
+folder = tempfile.mkdtemp()
+path = os.path.join(folder, "benchmark_ivf")
+
+start_time = time.perf_counter()
+IVFIndex.build(path, vectors)
+build_s = time.perf_counter() - start_time
+
+# Reopen from disk: the vectors are memory-mapped, not read into memory
+ivf = IVFIndex(path)
+print(f"Built IVF index over {N_VECTORS:,} vectors with {len(ivf.centroids)} clusters in {build_s:.1f} s")
+print()
+
+# 4. RECALL VS. LATENCY ###################################
+
+# Recall@K: what share of the true top K results did the approximate search find?
+rows = []
+for n_probe in N_PROBES:
+    start_time = time.perf_counter()
+    approx_results = [ivf.search(q, k=K, n_probe=n_probe) for q in queries]
+    approx_ms = (time.perf_counter() - start_time) * 1000 / N_QUERIES
+    recall = np.mean([
+        len(exact & {row_id for row_id, score in approx}) / K
+        for exact, approx in zip(exact_results, approx_results)
+    ])
+    rows.append({"n_probe": n_probe, "recall_at_k": round(recall, 3), "ms_per_query": round(approx_ms, 2), "speedup": round(exact_ms / approx_ms, 1)})
+
+results = pd.DataFrame(rows)
+
+print(f"Exact search: {exact_ms:.2f} ms per query")
+print("Approximate (IVF) search:")
+print(results)
+print()
+
+# 5. INCREMENTAL INSERTS ###################################
+
+# New chunks can be added without rebuilding: they go into a small delta segment
+# that is searched alongside the main index. compact() later merges them in.
+new_vectors = normalize_rows(rng.normal(size=(1000, DIM)).astype(np.float32))
+ivf.insert(new_vectors, row_ids=np.arange(N_VECTORS, N_VECTORS + 1000))
+
+hits = ivf.search(new_vectors[0], k=1, n_probe=8)
+print(f"Inserted 1,000 vectors; searching for the first one finds row {hits[0][0]} (expected {N_VECTORS})")
+
+ivf.compact()
+print(f"After compact(): {len(ivf.row_ids):,} vectors in the main index")
+
+# Clean up the scratch folder
+del ivf
+shutil.rmtree(folder)
+
+# Learning Check:
+# How does recall change as n_probe grows? Which n_probe would you choose,
+# and how would that choice change if your corpus were 10 times larger?
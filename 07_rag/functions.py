@@ -11,6 +11,17 @@
 
 import requests  # for HTTP requests
 import json      # for working with JSON
+import os        # for checking file modification times
+import re        # for splitting text into word tokens
+import math      # for logarithms in BM25 scoring
+import heapq     # for picking the top-k results without sorting everything
+import bisect    # for prefix lookups in a sorted list
+import hashlib   # for fingerprinting text chunks
+import time      # for timing model calls
+from datetime import datetime  # for timestamps of recorded timings
+from collections import deque  # for keeping recent model timings
+import threading  # for writing timings safely from several threads
+import numpy as np   # for vector math
 import pandas as pd  # for data manipulation
 
 # If you haven't already, install these packages...
@@ -24,9 +35,40 @@ PORT = 11434
 OLLAMA_HOST = f"http://localhost:{PORT}"
 CHAT_URL = f"{OLLAMA_HOST}/api/chat"
 
+# How long Ollama keeps a model loaded after each call (Ollama's default is 5 minutes).
+# Keeping it loaded means later calls don't wait for the model to load again.
+KEEP_ALIVE = "30m"
+EMBED_URL = f"{OLLAMA_HOST}/api/embed"
+
+# Default embedding model (pull it first: ollama pull nomic-embed-text)
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+
 # 1. AGENT FUNCTION ###################################
 
-def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
+# Tools the agent can run, by name: name -> function (see register_tool())
+TOOL_REGISTRY = {}
+
+def register_tool(func):
+    """
+    Register a function so agent() can call it as a tool.
+    (08_function_calling/functions.py has a fuller version that also checks arguments.)
+    
+    Parameters:
+    -----------
+    func : callable
+        The function to run when the model calls the tool
+    
+    Returns:
+    --------
+    callable
+        The same function, so register_tool can also be used as a decorator
+    """
+    
+    TOOL_REGISTRY[func.__name__] = func
+    return func
+
+
+def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False, keep_alive=KEEP_ALIVE, label=None):
     """
     Agent wrapper function that runs a single agent, with or without tools.
     
@@ -43,6 +85,10 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
         List of tool metadata dictionaries for function calling
     all : bool
         If True, return all responses. If False, return only the last response.
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after this call (default: KEEP_ALIVE)
+    label : str, optional
+        Name for this agent in the recorded timings (see timing_report())
     
     Returns:
     --------
@@ -55,12 +101,15 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
         body = {
             "model": model,
             "messages": messages,
-            "stream": False
+            "stream": False,
+            "keep_alive": keep_alive
         }
         
+        start = time.perf_counter()
         response = requests.post(CHAT_URL, json=body)
         response.raise_for_status()
         result = response.json()
+        record_timings(result, model, agent=label, wall_seconds=time.perf_counter() - start)
         
         return result["message"]["content"]
     else:
@@ -69,27 +118,29 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             "model": model,
             "messages": messages,
             "tools": tools,
-            "stream": False
+            "stream": False,
+            "keep_alive": keep_alive
         }
         
+        start = time.perf_counter()
         response = requests.post(CHAT_URL, json=body)
         response.raise_for_status()
         result = response.json()
+        record_timings(result, model, agent=label, wall_seconds=time.perf_counter() - start)
         
         # For any given tool call, execute the tool call
+        # Tools are found by name in TOOL_REGISTRY, so tools registered in any script can run
         if "tool_calls" in result.get("message", {}):
             tool_calls = result["message"]["tool_calls"]
             for tool_call in tool_calls:
-                # Execute the tool function
-                # Note: Tool functions must be defined in the global scope
                 func_name = tool_call["function"]["name"]
-                func_args = json.loads(tool_call["function"]["arguments"])
-                
-                # Get the function from globals and execute it
-                func = globals().get(func_name)
-                if func:
-                    output = func(**func_args)
-                    tool_call["output"] = output
+                if func_name not in TOOL_REGISTRY:
+                    raise ValueError(f"Unknown tool '{func_name}'. Register it with register_tool().")
+                # Ollama sends arguments as a dictionary; OpenAI-style servers send a JSON string
+                func_args = tool_call["function"].get("arguments") or {}
+                if isinstance(func_args, str):
+                    func_args = json.loads(func_args) if func_args.strip() else {}
+                tool_call["output"] = TOOL_REGISTRY[func_name](**func_args)
         
         if all:
             return result
@@ -100,7 +151,7 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             return result["message"]["content"]
 
 
-def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
+def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL, keep_alive=KEEP_ALIVE, label=None):
     """
     Run an agent with a specific role and task.
     
@@ -116,6 +167,10 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
         Output format (default: "text")
     model : str
         Model to use (default: DEFAULT_MODEL)
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after this call (default: KEEP_ALIVE)
+    label : str, optional
+        Name for this agent in the recorded timings (default: the start of its role)
     
     Returns:
     --------
@@ -130,28 +185,1303 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
     ]
     
     # Run the agent
-    resp = agent(messages=messages, model=model, output=output, tools=tools)
+    resp = agent(messages=messages, model=model, output=output, tools=tools, keep_alive=keep_alive,
+                 label=label or role[:40])
     return resp
 
 
 # 2. DATA CONVERSION FUNCTION ###################################
 
-def df_as_text(df):
+def estimate_tokens(text):
     """
-    Convert a pandas DataFrame to a markdown table string.
+    Roughly estimate how many tokens a model will count in a text (about 4 characters per token).
+    
+    Parameters:
+    -----------
+    text : str
+        The text to measure
+    
+    Returns:
+    --------
+    int
+        Estimated token count
+    """
+    
+    return math.ceil(len(text) / 4)
+
+
+def df_as_text(df, format="csv", columns=None, max_rows=None, sample="head", count_by=None, prune=True):
+    """
+    Convert a pandas DataFrame to a compact text table for an LLM prompt.
+    
+    Every character we send costs tokens, so the default is plain CSV, which has no
+    padding spaces or border characters (unlike a markdown table, which pads every cell
+    to its column width). Options let you drop columns, cap rows, or summarize rows.
     
     Parameters:
     -----------
     df : pandas.DataFrame
         The DataFrame to convert to text
+    format : str
+        "csv" (default), "tsv", "json" (one compact record per row), or "markdown"
+    columns : list, optional
+        Keep only these columns
+    max_rows : int, optional
+        Keep at most this many rows; a note says how many rows were left out
+    sample : str
+        Which rows to keep when max_rows applies: "head" (first rows, default) or "random"
+    count_by : str or list, optional
+        Instead of raw rows, send the number of rows in each group of these column(s)
+    prune : bool
+        If True (default), drop empty columns, and state columns with a single value
+        once in a note instead of repeating the value on every row
     
     Returns:
     --------
     str
-        A markdown-formatted table string
+        The table as text
     """
     
-    # Convert DataFrame to markdown table
-    # pandas to_markdown() method creates markdown tables
-    tab = df.to_markdown(index=False)
+    notes = []
+    
+    # Keep only the columns we need
+    if columns is not None:
+        df = df[columns]
+    
+    # Summarize: one row per group, with a count
+    if count_by is not None:
+        df = (df
+              .groupby(count_by, dropna=False)
+              .size()
+              .reset_index(name="n")
+              .sort_values("n", ascending=False))
+    
+    # Drop empty columns, and move single-value columns into a note
+    if prune and len(df) > 1:
+        values = df.replace("", pd.NA)
+        empty = [c for c in df.columns if values[c].isna().all()]
+        constant = [c for c in df.columns if c not in empty and values[c].nunique(dropna=False) == 1]
+        notes += [f"{c}={df[c].iloc[0]}" for c in constant]
+        df = df.drop(columns=empty + constant)
+    
+    # Cap the number of rows
+    if max_rows is not None and len(df) > max_rows:
+        notes.append(f"showing {max_rows} of {len(df)} rows")
+        df = df.sample(n=max_rows, random_state=1) if sample == "random" else df.head(max_rows)
+    
+    # Write the table in the chosen format
+    if format == "csv":
+        tab = df.to_csv(index=False).strip()
+    elif format == "tsv":
+        tab = df.to_csv(index=False, sep="\t").strip()
+    elif format == "json":
+        tab = df.to_json(orient="records", lines=True, date_format="iso").strip()
+    elif format == "markdown":
+        # pandas to_markdown() method creates markdown tables (requires: pip install tabulate)
+        tab = df.to_markdown(index=False)
+    else:
+        raise ValueError("Invalid format. Use 'csv', 'tsv', 'json', or 'markdown'.")
+    
+    # Put any notes first, as comment lines
+    if notes:
+        tab = "\n".join(f"# {note}" for note in notes) + "\n" + tab
     return tab
+
+
+def df_token_report(df, **options):
+    """
+    Compare how many tokens each text format would use for the same DataFrame.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame to measure
+    **options
+        Any other df_as_text() options (e.g. columns, max_rows)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Characters and estimated tokens per format, smallest first
+    """
+    
+    rows = []
+    for format in ["csv", "tsv", "json", "markdown"]:
+        try:
+            text = df_as_text(df, format=format, **options)
+        except ImportError:
+            continue  # markdown needs the tabulate package
+        rows.append({"format": format, "characters": len(text), "tokens": estimate_tokens(text)})
+    return pd.DataFrame(rows).sort_values("tokens").reset_index(drop=True)
+
+
+# 3. INDEXED TEXT RETRIEVER ###################################
+
+# Words are runs of letters, digits, and underscores
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    """
+    Split text into lowercase word tokens, e.g. "Supervised Learning:" -> ["supervised", "learning"].
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+# Substring searches are narrowed down with character n-grams (3-letter pieces of each line)
+NGRAM = 3
+
+def ngrams(text, n=NGRAM):
+    """
+    Split text into its overlapping n-letter pieces, e.g. "learn" -> {"lea", "ear", "arn"}.
+    """
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def file_stamp(path):
+    """
+    Get a file's modification time and size; if either changes, the file has been edited.
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class TextRetriever:
+    """
+    Load a text document once and answer substring searches from an inverted index.
+
+    An inverted index maps each lowercase 3-letter piece of text (see ngrams()) to the ids of
+    the lines that contain it, like the index at the back of a book. A line containing the query
+    contains every piece of it, so a query only checks the lines listed under all of its pieces,
+    instead of scanning every line of the document again.
+    The document is reloaded automatically if the file changes on disk.
+
+    Parameters:
+    -----------
+    document_path : str
+        Path to the text file to search
+    """
+
+    def __init__(self, document_path):
+        self.document_path = document_path
+        self.file_stamp = None
+        self.lines = []
+        self.lower_lines = []
+        self.index = {}
+        self.load()
+
+    def load(self):
+        """
+        Read the document and build the inverted index (lowercase n-gram -> list of line ids).
+        """
+        stamp = file_stamp(self.document_path)
+        with open(self.document_path, "r", encoding="utf-8") as f:
+            self.lines = [line.rstrip("\n") for line in f]
+        self.lower_lines = [line.lower() for line in self.lines]
+
+        # Line ids are added in order, so each list of line ids is already sorted
+        index = {}
+        for line_id, line in enumerate(self.lower_lines):
+            for gram in ngrams(line):
+                index.setdefault(gram, []).append(line_id)
+        self.index = index
+        self.bm25 = None  # built on first ranked search (see search_ranked)
+        self.file_stamp = stamp
+
+    def refresh(self):
+        """
+        Reload the document if the file has been modified since it was last loaded.
+        """
+        if file_stamp(self.document_path) != self.file_stamp:
+            self.load()
+
+    def search(self, query):
+        """
+        Find lines containing the query (case-insensitive), in document order.
+
+        Parameters:
+        -----------
+        query : str
+            The search term to look for; it can be part of a word, e.g. "learn" matches "learning"
+
+        Returns:
+        --------
+        list
+            Matching lines
+        """
+        self.refresh()
+        needle = query.lower()
+        grams = ngrams(needle)
+
+        if grams:
+            # Intersect the line ids of every piece of the query, starting with the rarest piece
+            postings = sorted((self.index.get(gram, []) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for line_ids in postings[1:]:
+                candidates.intersection_update(line_ids)
+                if not candidates:
+                    return []
+            candidates = sorted(candidates)
+        else:
+            # Queries shorter than NGRAM letters have no pieces to look up, so check every line
+            candidates = range(len(self.lines))
+
+        # Lines with every piece of the query don't always contain the query itself, so check
+        return [self.lines[i] for i in candidates if needle in self.lower_lines[i]]
+
+    def search_ranked(self, query, k=5):
+        """
+        Find the k lines that best match any of the query words, ranked by BM25 score.
+
+        Parameters:
+        -----------
+        query : str
+            The search terms
+        k : int
+            Number of lines to return (default: 5)
+
+        Returns:
+        --------
+        list
+            Matching lines, best match first
+        """
+        self.refresh()
+        if self.bm25 is None:
+            self.bm25 = BM25Index(self.lines)
+        return [self.lines[i] for i, score in self.bm25.search(query, k=k)]
+
+
+# Retrievers that have already been built, by file path
+TEXT_RETRIEVERS = {}
+
+def get_text_retriever(document_path):
+    """
+    Get the TextRetriever for a document, building it only the first time the document is searched.
+    """
+    key = os.path.abspath(document_path)
+    if key not in TEXT_RETRIEVERS:
+        TEXT_RETRIEVERS[key] = TextRetriever(document_path)
+    return TEXT_RETRIEVERS[key]
+
+
+# 4. BM25 RANKED RETRIEVAL ###################################
+
+class BM25Index:
+    """
+    Rank documents against a keyword query with BM25 scoring, and return only the top k.
+
+    BM25 is the classic search engine formula: a document scores higher when it contains
+    the query words more often, when those words are rare across the whole collection,
+    and (slightly) when the document is short. All word statistics are computed once here,
+    so each query only adds up precomputed weights for the documents that contain its words.
+
+    Parameters:
+    -----------
+    documents : list
+        List of document strings (e.g. lines of a text file, or rows of a database table)
+    k1 : float
+        How quickly repeated words stop adding to the score (default: 1.5)
+    b : float
+        How much to favor shorter documents, from 0 (not at all) to 1 (fully) (default: 0.75)
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_documents = len(documents)
+
+        # Count words in each document
+        term_counts = []
+        doc_lengths = []
+        for doc in documents:
+            counts = {}
+            tokens = tokenize(doc)
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            term_counts.append(counts)
+            doc_lengths.append(len(tokens))
+        avg_length = sum(doc_lengths) / max(self.n_documents, 1)
+
+        # Number of documents containing each word
+        doc_freq = {}
+        for counts in term_counts:
+            for token in counts:
+                doc_freq[token] = doc_freq.get(token, 0) + 1
+
+        # Precompute each word's BM25 weight in each document that contains it
+        # postings: word -> list of (document id, weight)
+        self.postings = {}
+        for doc_id, counts in enumerate(term_counts):
+            length_norm = k1 * (1 - b + b * doc_lengths[doc_id] / max(avg_length, 1e-9))
+            for token, tf in counts.items():
+                idf = math.log(1 + (self.n_documents - doc_freq[token] + 0.5) / (doc_freq[token] + 0.5))
+                weight = idf * tf * (k1 + 1) / (tf + length_norm)
+                self.postings.setdefault(token, []).append((doc_id, weight))
+
+    def search(self, query, k=5):
+        """
+        Find the k documents that best match the query.
+
+        Parameters:
+        -----------
+        query : str
+            The search terms
+        k : int
+            Number of results to return (default: 5)
+
+        Returns:
+        --------
+        list
+            List of (document id, score) tuples, best match first
+        """
+        scores = {}
+        for token in set(tokenize(query)):
+            for doc_id, weight in self.postings.get(token, []):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+
+# 5. CACHED CSV RETRIEVER ###################################
+
+class CsvRetriever:
+    """
+    Load a CSV file once and answer lookups on one column from an in-memory index.
+
+    The file is parsed into a DataFrame only once (and again only if the file changes on disk).
+    A dictionary of lowercase keys gives instant exact lookups, and a sorted list of
+    lowercase keys gives fast prefix lookups (e.g. "pika" -> "Pikachu").
+
+    Parameters:
+    -----------
+    document : str
+        Path to the CSV file
+    column : str
+        The column to search (default: "Name")
+    """
+
+    def __init__(self, document, column="Name"):
+        self.document = document
+        self.column = column
+        self.file_stamp = None
+        self.load()
+
+    def load(self):
+        """
+        Parse the CSV file and build the lookup indexes.
+        """
+        stamp = file_stamp(self.document)
+        self.df = pd.read_csv(self.document)
+
+        # Lowercase keys, computed once instead of on every query
+        self.keys = self.df[self.column].fillna("").astype(str).str.lower()
+
+        # Exact lookups: lowercase key -> row positions
+        self.exact = {}
+        for position, key in enumerate(self.keys):
+            self.exact.setdefault(key, []).append(position)
+
+        # Prefix lookups: (lowercase key, row position) pairs, sorted by key
+        self.sorted_keys = sorted(zip(self.keys, range(len(self.keys))))
+        self.file_stamp = stamp
+
+    def refresh(self):
+        """
+        Reload the CSV file if it has been modified since it was last loaded.
+        """
+        if file_stamp(self.document) != self.file_stamp:
+            self.load()
+
+    def search(self, query, mode="contains"):
+        """
+        Find rows whose column value matches the query (case-insensitive).
+
+        Parameters:
+        -----------
+        query : str
+            The search term
+        mode : str
+            "exact" (whole value equals the query), "prefix" (value starts with the query),
+            or "contains" (value contains the query anywhere) (default: "contains")
+
+        Returns:
+        --------
+        pandas.DataFrame
+            Matching rows, in file order
+        """
+        self.refresh()
+        q = query.lower()
+
+        if mode == "exact":
+            positions = self.exact.get(q, [])
+        elif mode == "prefix":
+            # Binary search for the first key >= q, then walk forward while keys start with q
+            i = bisect.bisect_left(self.sorted_keys, (q, -1))
+            positions = []
+            while i < len(self.sorted_keys) and self.sorted_keys[i][0].startswith(q):
+                positions.append(self.sorted_keys[i][1])
+                i += 1
+            positions.sort()
+        elif mode == "contains":
+            # No index can help here, but we still skip re-reading and re-lowercasing the file
+            positions = self.keys.str.contains(q, regex=False).to_numpy().nonzero()[0]
+        else:
+            raise ValueError("Invalid mode. Use 'exact', 'prefix', or 'contains'.")
+
+        return self.df.iloc[positions]
+
+
+# Retrievers that have already been built, by file path and column
+CSV_RETRIEVERS = {}
+
+def get_csv_retriever(document, column="Name"):
+    """
+    Get the CsvRetriever for a CSV file, parsing the file only the first time it is searched.
+    """
+    key = (os.path.abspath(document), column)
+    if key not in CSV_RETRIEVERS:
+        CSV_RETRIEVERS[key] = CsvRetriever(document, column=column)
+    return CSV_RETRIEVERS[key]
+
+
+# 6. EMBEDDINGS AND VECTOR RETRIEVAL ###################################
+
+# Keyword search only finds documents that share words with the query.
+# Embeddings turn text into vectors of numbers, where texts with similar meaning
+# get similar vectors. Comparing vectors lets us find relevant text even when
+# it uses different words (semantic search).
+
+## 6.1 Embedding Functions #################################
+
+def embed_ollama(texts, model=DEFAULT_EMBED_MODEL, batch_size=64, keep_alive=KEEP_ALIVE):
+    """
+    Embed texts with a local Ollama embedding model.
+
+    Parameters:
+    -----------
+    texts : list
+        List of strings to embed
+    model : str
+        Ollama embedding model (default: "nomic-embed-text")
+    batch_size : int
+        Number of texts sent per request (default: 64)
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after each request (default: KEEP_ALIVE)
+
+    Returns:
+    --------
+    numpy.ndarray
+        Matrix of float32 embeddings, one row per text
+    """
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        body = {"model": model, "input": texts[start:start + batch_size], "keep_alive": keep_alive}
+        response = requests.post(EMBED_URL, json=body)
+        response.raise_for_status()
+        vectors.extend(response.json()["embeddings"])
+    return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+
+def embed_hashing(texts, dim=256):
+    """
+    Offline stand-in for an embedding model, for testing without Ollama.
+
+    Each word is hashed to one of `dim` slots, so texts sharing words get similar vectors.
+    It captures word overlap rather than meaning, but it is fast and always gives the same result.
+
+    Parameters:
+    -----------
+    texts : list
+        List of strings to embed
+    dim : int
+        Length of each vector (default: 256)
+
+    Returns:
+    --------
+    numpy.ndarray
+        Matrix of float32 embeddings, one row per text
+    """
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in tokenize(text):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            slot = int.from_bytes(digest[:4], "little") % dim
+            sign = 1.0 if digest[4] % 2 == 0 else -1.0
+            vectors[row, slot] += sign
+    return vectors
+
+
+def normalize_rows(vectors):
+    """
+    Scale each row to length 1, so a dot product between rows equals their cosine similarity.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def text_fingerprint(text):
+    """
+    Short fingerprint of a text chunk; if the text changes, so does the fingerprint.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+## 6.2 Persistent Vector Index #################################
+
+class VectorIndex:
+    """
+    Store chunk embeddings on disk and answer semantic searches with cosine similarity.
+
+    Embeddings are saved as a raw float32 matrix (`<path>.f32`), with a JSON sidecar
+    (`<path>.json`) listing each row's chunk id and text fingerprint. The matrix is opened
+    with a memory map, so the operating system pages it in on demand instead of loading it all.
+    Adding chunks is incremental: only new or changed chunks are embedded.
+
+    Parameters:
+    -----------
+    path : str
+        Path prefix for the index files (e.g. "07_rag/data/vectors/sample")
+    embed : function
+        Function that turns a list of texts into a matrix of embeddings
+        (default: embed_ollama; use embed_hashing to work offline)
+    """
+
+    def __init__(self, path, embed=embed_ollama):
+        self.path = path
+        self.embed = embed
+        self.matrix_path = f"{path}.f32"
+        self.sidecar_path = f"{path}.json"
+        self.ids = []
+        self.fingerprints = []
+        self.row_of = {}  # chunk id -> row number in the matrix
+        self.dim = None
+        self.matrix = None
+        self.load()
+
+    def load(self):
+        """
+        Open an existing index from disk (if there is one).
+        """
+        if not os.path.exists(self.sidecar_path):
+            return
+        with open(self.sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.ids = sidecar["ids"]
+        self.fingerprints = sidecar["fingerprints"]
+        self.dim = sidecar["dim"]
+        self.row_of = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        self.matrix = None
+        if self.ids:
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.dim))
+
+    def save_sidecar(self):
+        """
+        Write the chunk ids and fingerprints next to the matrix.
+        """
+        folder = os.path.dirname(self.sidecar_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.sidecar_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "ids": self.ids, "fingerprints": self.fingerprints}, f)
+
+    def add(self, ids, texts):
+        """
+        Add or update chunks. Chunks whose text hasn't changed are skipped.
+
+        Parameters:
+        -----------
+        ids : list
+            A unique id for each chunk (e.g. "sample.txt:3"); if an id appears twice, its last text is used
+        texts : list
+            The text of each chunk
+
+        Returns:
+        --------
+        int
+            Number of chunks that were embedded
+        """
+        # Work out which chunks are new or changed (one entry per chunk id; the last text wins)
+        latest = dict(zip(ids, texts))
+        todo = []
+        for chunk_id, text in latest.items():
+            fingerprint = text_fingerprint(text)
+            row = self.row_of.get(chunk_id)
+            if row is None or self.fingerprints[row] != fingerprint:
+                todo.append((chunk_id, text, fingerprint))
+        if not todo:
+            return 0
+
+        # Embed only those chunks, normalized so that dot product = cosine similarity
+        vectors = normalize_rows(self.embed([text for _, text, _ in todo]).astype(np.float32))
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding size {vectors.shape[1]} does not match index size {self.dim}.")
+
+        # Changed chunks overwrite their row in place; new chunks are appended to the end of the file
+        self.matrix = None  # release the read-only memory map before writing
+        folder = os.path.dirname(self.matrix_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        updates = [(self.row_of[c], v) for (c, _, _), v in zip(todo, vectors) if c in self.row_of]
+        if updates:
+            matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(len(self.ids), self.dim))
+            for row, vector in updates:
+                matrix[row] = vector
+            matrix.flush()
+            del matrix
+        with open(self.matrix_path, "ab") as f:
+            # Drop any rows an interrupted update appended without saving the sidecar,
+            # so new rows land right after the rows the sidecar knows about
+            f.truncate(len(self.ids) * self.dim * 4)
+            for (chunk_id, _, fingerprint), vector in zip(todo, vectors):
+                if chunk_id in self.row_of:
+                    self.fingerprints[self.row_of[chunk_id]] = fingerprint
+                    continue
+                f.write(vector.tobytes())
+                self.row_of[chunk_id] = len(self.ids)
+                self.ids.append(chunk_id)
+                self.fingerprints.append(fingerprint)
+
+        # Save the sidecar last, so an interrupted update never points at missing rows
+        self.save_sidecar()
+        self.load()
+        return len(todo)
+
+    def search_batch(self, queries, k=5):
+        """
+        Find the k most similar chunks for each of several queries at once.
+
+        Parameters:
+        -----------
+        queries : list
+            List of query strings
+        k : int
+            Number of results per query (default: 5)
+
+        Returns:
+        --------
+        list
+            One list per query of (chunk id, cosine similarity) tuples, best match first
+        """
+        if self.matrix is None:
+            return [[] for _ in queries]
+        query_vectors = normalize_rows(self.embed(list(queries)).astype(np.float32))
+
+        # One matrix multiplication scores every chunk against every query
+        scores = query_vectors @ np.asarray(self.matrix).T
+        k = min(k, scores.shape[1])
+
+        results = []
+        for row in scores:
+            # argpartition finds the top k without fully sorting all scores
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([(self.ids[i], float(row[i])) for i in top])
+        return results
+
+    def search(self, query, k=5):
+        """
+        Find the k chunks most similar in meaning to the query.
+
+        Returns:
+        --------
+        list
+            List of (chunk id, cosine similarity) tuples, best match first
+        """
+        return self.search_batch([query], k=k)[0]
+
+    def search_approximate(self, ivf, query, k=5, n_probe=8):
+        """
+        Find chunks similar to the query using an approximate IVFIndex built from this index's matrix
+        (e.g. IVFIndex.build(path, index.matrix)). Much faster than search() on very large indexes.
+
+        Returns:
+        --------
+        list
+            List of (chunk id, cosine similarity) tuples, best match first
+        """
+        query_vector = self.embed([query])[0]
+        return [(self.ids[row], score) for row, score in ivf.search(query_vector, k=k, n_probe=n_probe)]
+
+
+# 7. APPROXIMATE NEAREST NEIGHBOR (IVF) INDEX ###################################
+
+# Exact search compares the query with every chunk, which gets slow past a few million chunks.
+# An inverted file (IVF) index first groups vectors into clusters (with k-means).
+# A query is compared with the cluster centers, and then only with the vectors in the
+# few closest clusters. This trades a little recall (we might miss a match that sits in
+# another cluster) for a large speedup. Searching more clusters (n_probe) gives back recall.
+
+def kmeans(vectors, n_clusters, n_iter=10, seed=1234):
+    """
+    Group normalized vectors into n_clusters clusters using (spherical) k-means.
+
+    Parameters:
+    -----------
+    vectors : numpy.ndarray
+        Matrix of normalized vectors, one per row
+    n_clusters : int
+        Number of clusters
+    n_iter : int
+        Number of refinement rounds (default: 10)
+    seed : int
+        Random seed, so results are repeatable (default: 1234)
+
+    Returns:
+    --------
+    numpy.ndarray
+        Matrix of normalized cluster centers, one per row
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        # Assign each vector to its most similar center
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        # Move each center to the average of its vectors (empty clusters keep their old center)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        filled = counts > 0
+        centroids[filled] = normalize_rows(sums[filled])
+    return centroids
+
+
+class IVFIndex:
+    """
+    Approximate nearest neighbor index (inverted file) over normalized float32 vectors.
+
+    Vectors are stored grouped by cluster, so the vectors of one cluster sit next to each other
+    on disk and can be read straight from a memory map. New vectors are appended to a small
+    "delta" segment that is searched alongside the main index, until compact() merges it in.
+
+    Files written under the path prefix:
+    `.centroids.npy`, `.vectors.npy`, `.row_ids.npy`, `.offsets.npy` (main index), and
+    `.delta.f32`, `.delta_ids.i64`, `.delta_lists.i32` (recent inserts).
+
+    Parameters:
+    -----------
+    path : str
+        Path prefix for the index files (e.g. "07_rag/data/vectors/sample_ivf")
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.load()
+
+    @classmethod
+    def build(cls, path, vectors, row_ids=None, n_lists=None, train_size=50000):
+        """
+        Build a new index from a matrix of vectors and save it to disk.
+
+        Parameters:
+        -----------
+        path : str
+            Path prefix for the index files
+        vectors : numpy.ndarray
+            Matrix of vectors, one per row (e.g. VectorIndex.matrix)
+        row_ids : numpy.ndarray, optional
+            Integer id for each vector (default: its row number)
+        n_lists : int, optional
+            Number of clusters (default: about the square root of the number of vectors)
+        train_size : int
+            Number of vectors sampled to learn the clusters (default: 50000)
+
+        Returns:
+        --------
+        IVFIndex
+            The new index, opened from disk
+        """
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        row_ids = np.arange(len(vectors), dtype=np.int64) if row_ids is None else np.asarray(row_ids, dtype=np.int64)
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+
+        # Learn cluster centers from a sample of the vectors
+        rng = np.random.default_rng(1234)
+        sample = vectors[rng.choice(len(vectors), min(train_size, len(vectors)), replace=False)]
+        centroids = kmeans(sample, min(n_lists, len(sample)))
+
+        # Write the main index, with vectors grouped by cluster
+        cls.write_lists(path, centroids, vectors, row_ids, cls.assign(centroids, vectors))
+
+        # Start with an empty delta segment
+        for suffix in (".delta.f32", ".delta_ids.i64", ".delta_lists.i32"):
+            open(f"{path}{suffix}", "wb").close()
+        return cls(path)
+
+    @staticmethod
+    def assign(centroids, vectors, batch_size=65536):
+        """
+        Find the closest cluster for each vector (in batches, to limit memory use).
+        """
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            block = vectors[start:start + batch_size]
+            assignment[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+
+    @staticmethod
+    def write_lists(path, centroids, vectors, row_ids, assignment):
+        """
+        Save cluster centers plus vectors sorted by cluster, with offsets marking where each cluster starts.
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=len(centroids)))
+        np.save(f"{path}.centroids.npy", centroids.astype(np.float32))
+        np.save(f"{path}.vectors.npy", vectors[order])
+        np.save(f"{path}.row_ids.npy", row_ids[order])
+        np.save(f"{path}.offsets.npy", offsets)
+
+    def load(self):
+        """
+        Open the index files; the big vector file is memory-mapped rather than read into memory.
+        """
+        self.centroids = np.load(f"{self.path}.centroids.npy")
+        self.vectors = np.load(f"{self.path}.vectors.npy", mmap_mode="r")
+        self.row_ids = np.load(f"{self.path}.row_ids.npy", mmap_mode="r")
+        self.offsets = np.load(f"{self.path}.offsets.npy")
+        dim = self.centroids.shape[1]
+        vectors = np.fromfile(f"{self.path}.delta.f32", dtype=np.float32)
+        ids = np.fromfile(f"{self.path}.delta_ids.i64", dtype=np.int64)
+        lists = np.fromfile(f"{self.path}.delta_lists.i32", dtype=np.int32)
+        # An interrupted insert() can leave the three delta files with different lengths;
+        # only rows written to all three count (insert() trims the rest before appending)
+        n = min(len(vectors) // dim, len(ids), len(lists))
+        self.delta_vectors = vectors[:n * dim].reshape(n, dim)
+        self.delta_ids = ids[:n]
+        self.delta_lists = lists[:n]
+
+    def insert(self, vectors, row_ids):
+        """
+        Add new vectors without rebuilding the index. They go into the delta segment.
+
+        Parameters:
+        -----------
+        vectors : numpy.ndarray
+            Matrix of new vectors, one per row
+        row_ids : sequence
+            Integer id for each new vector
+        """
+        dim = self.centroids.shape[1]
+        vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, dim))
+        lists = self.assign(self.centroids, vectors)
+        n = len(self.delta_ids)  # rows present in all three delta files
+        for suffix, data, row_bytes in ((".delta.f32", vectors, dim * 4),
+                                        (".delta_ids.i64", np.asarray(row_ids, dtype=np.int64), 8),
+                                        (".delta_lists.i32", lists, 4)):
+            with open(f"{self.path}{suffix}", "ab") as f:
+                # Drop any partial rows left by an interrupted insert, so the files stay aligned
+                f.truncate(n * row_bytes)
+                f.write(data.tobytes())
+        self.delta_vectors = np.vstack([self.delta_vectors, vectors])
+        self.delta_ids = np.concatenate([self.delta_ids, np.asarray(row_ids, dtype=np.int64)])
+        self.delta_lists = np.concatenate([self.delta_lists, lists])
+
+    def compact(self):
+        """
+        Merge the delta segment into the main index (keeps the existing cluster centers).
+        """
+        if len(self.delta_ids) == 0:
+            return
+        lists = np.repeat(np.arange(len(self.centroids), dtype=np.int32), np.diff(self.offsets))
+        vectors = np.vstack([np.asarray(self.vectors), self.delta_vectors])
+        row_ids = np.concatenate([np.asarray(self.row_ids), self.delta_ids])
+        assignment = np.concatenate([lists, self.delta_lists])
+        self.vectors = self.row_ids = None  # release the memory maps before overwriting the files
+        self.write_lists(self.path, self.centroids, vectors, row_ids, assignment)
+        for suffix in (".delta.f32", ".delta_ids.i64", ".delta_lists.i32"):
+            open(f"{self.path}{suffix}", "wb").close()
+        self.load()
+
+    def search(self, query_vector, k=5, n_probe=8):
+        """
+        Find (approximately) the k vectors most similar to a query vector.
+
+        Parameters:
+        -----------
+        query_vector : numpy.ndarray
+            The query embedding
+        k : int
+            Number of results (default: 5)
+        n_probe : int
+            Number of closest clusters to search; higher is slower but more accurate (default: 8)
+
+        Returns:
+        --------
+        list
+            List of (row id, cosine similarity) tuples, best match first
+        """
+        q = normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+
+        # Pick the n_probe clusters whose centers are most similar to the query
+        n_probe = min(n_probe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ q), n_probe - 1)[:n_probe]
+
+        # Gather candidate vectors from those clusters, plus matching recent inserts
+        blocks = [(self.vectors[self.offsets[c]:self.offsets[c + 1]], self.row_ids[self.offsets[c]:self.offsets[c + 1]]) for c in probes]
+        if len(self.delta_ids):
+            in_probes = np.isin(self.delta_lists, probes)
+            blocks.append((self.delta_vectors[in_probes], self.delta_ids[in_probes]))
+        candidates = np.concatenate([b[0] for b in blocks])
+        candidate_ids = np.concatenate([b[1] for b in blocks])
+        if len(candidate_ids) == 0:
+            return []
+
+        # Score only the candidates, and keep the top k
+        scores = candidates @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidate_ids[i]), float(scores[i])) for i in top]
+
+
+# 8. CONTEXT BUILDER ###################################
+
+# Sending whole documents (or pretty-printed JSON) to the model wastes tokens:
+# the model reads every token, and more tokens mean slower, costlier answers.
+# The context builder splits documents into small chunks, drops duplicate chunks,
+# keeps the chunks most relevant to the query, and stops once a token budget is full.
+
+def chunk_text(text, max_words=120, overlap=20):
+    """
+    Split text into chunks of up to max_words words. Neighboring chunks share `overlap` words,
+    so a sentence cut at a chunk boundary still appears whole in one of the chunks.
+
+    Parameters:
+    -----------
+    text : str
+        The text to split
+    max_words : int
+        Maximum words per chunk (default: 120)
+    overlap : int
+        Words shared by neighboring chunks (default: 20)
+
+    Returns:
+    --------
+    list
+        List of chunk strings
+    """
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)] if words else []
+    step = max(max_words - overlap, 1)
+    return [" ".join(words[start:start + max_words]) for start in range(0, len(words) - overlap, step)]
+
+
+def dedupe_chunks(chunks, threshold=0.8):
+    """
+    Drop chunks that repeat an earlier chunk (keeping the first one seen).
+
+    Two chunks count as duplicates when most of their words are shared
+    (word-set overlap, or Jaccard similarity, at or above `threshold`).
+
+    Parameters:
+    -----------
+    chunks : list
+        List of (source, text) tuples, best first
+    threshold : float
+        Share of words two chunks must have in common to count as duplicates (default: 0.8)
+
+    Returns:
+    --------
+    list
+        List of (source, text) tuples without duplicates, in the same order
+    """
+    kept = []
+    kept_words = []
+    for source, text in chunks:
+        words = set(tokenize(text))
+        if not words:
+            continue
+        is_duplicate = any(
+            len(words & other) / len(words | other) >= threshold
+            for other in kept_words
+        )
+        if not is_duplicate:
+            kept.append((source, text))
+            kept_words.append(words)
+    return kept
+
+
+def pack_context(chunks, token_budget=800):
+    """
+    Pack ranked chunks into one compact block of text, stopping when the token budget is full.
+
+    Each chunk becomes one line, "[n] source: text", which costs far fewer tokens than
+    indented JSON. Chunks that would overflow the budget are skipped.
+
+    Parameters:
+    -----------
+    chunks : list
+        List of (source, text) tuples, best first
+    token_budget : int
+        Maximum estimated tokens for the whole context (default: 800)
+
+    Returns:
+    --------
+    str
+        The packed context
+    """
+    lines = []
+    used = 0
+    for source, text in dedupe_chunks(chunks):
+        line = f"[{len(lines) + 1}] {source}: {' '.join(text.split())}"
+        cost = estimate_tokens(line) + 1  # +1 for the line break
+        if used + cost > token_budget:
+            continue
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
+
+
+def build_context(query, documents, token_budget=800, max_words=120, overlap=20):
+    """
+    Build a compact, relevant context for a query from whole documents.
+
+    Steps: split each document into overlapping chunks, drop duplicate chunks,
+    rank chunks against the query with BM25, and pack the best ones into the token budget.
+
+    Parameters:
+    -----------
+    query : str
+        The user's query
+    documents : list
+        List of (source, text) tuples, e.g. [("Database Normalization", "Full text...")]
+    token_budget : int
+        Maximum estimated tokens for the context (default: 800)
+    max_words : int
+        Maximum words per chunk (default: 120)
+    overlap : int
+        Words shared by neighboring chunks (default: 20)
+
+    Returns:
+    --------
+    str
+        The packed context
+    """
+    chunks = [
+        (source, chunk)
+        for source, text in documents
+        for chunk in chunk_text(text, max_words=max_words, overlap=overlap)
+    ]
+    chunks = dedupe_chunks(chunks)
+    if not chunks:
+        return ""
+
+    # Rank chunks by relevance to the query, dropping chunks that share no words with it
+    # (if no chunk shares a word with the query, keep the documents' original order)
+    hits = BM25Index([text for source, text in chunks]).search(query, k=len(chunks))
+    if hits:
+        chunks = [chunks[i] for i, score in hits]
+    return pack_context(chunks, token_budget=token_budget)
+
+
+# 9. MODEL LIFECYCLE ###################################
+
+# Ollama endpoints for loading models and listing loaded models
+GENERATE_URL = f"{OLLAMA_HOST}/api/generate"
+PS_URL = f"{OLLAMA_HOST}/api/ps"
+
+# Timings of recent model calls, oldest first (see timing_report())
+MODEL_TIMINGS = deque(maxlen=1000)
+
+# Workflow name for the calls that follow, and an optional JSONL file to log them to (see start_workflow())
+TELEMETRY = {"workflow": "default", "path": None}
+TELEMETRY_LOCK = threading.Lock()
+
+# OpenAI gpt-4o-mini prices in US dollars per 1 million (input, output) tokens,
+# to estimate what each call would cost there; prices change, see https://openai.com/api/pricing/
+OPENAI_PRICE = (0.15, 0.60)
+
+
+def start_workflow(name, path=None):
+    """
+    Label the model calls that follow as one workflow, and optionally log them to a JSONL file
+    (read it back with pd.read_json(path, lines=True)).
+    
+    Parameters:
+    -----------
+    name : str
+        Workflow name, e.g. "press_release"
+    path : str, optional
+        JSONL file to append one line per model call to (default: None, no file)
+    """
+    
+    TELEMETRY.update(workflow=name, path=path)
+
+
+def call_timings(result, model=None):
+    """
+    Read the timings Ollama reports with each response (nanoseconds) as seconds.
+    
+    Without streaming, the first token arrives once the model is loaded and the prompt is read,
+    so load + prompt time is the time to first token.
+    
+    Parameters:
+    -----------
+    result : dict
+        The JSON response from Ollama
+    model : str, optional
+        Model name to use if the response doesn't include one
+    
+    Returns:
+    --------
+    dict
+        load_seconds (loading the model into memory), prompt_seconds (reading the prompt),
+        eval_seconds (writing the answer), total_seconds, token counts, time to first token,
+        tokens per second, and the estimated OpenAI cost
+    """
+    
+    seconds = lambda key: round(result.get(key, 0) / 1e9, 3)
+    row = {
+        "model": result.get("model", model),
+        "load_seconds": seconds("load_duration"),
+        "prompt_seconds": seconds("prompt_eval_duration"),
+        "eval_seconds": seconds("eval_duration"),
+        "total_seconds": seconds("total_duration"),
+        "prompt_tokens": result.get("prompt_eval_count", 0),
+        "output_tokens": result.get("eval_count", 0)
+    }
+    row["ttft_seconds"] = round(row["load_seconds"] + row["prompt_seconds"], 3)
+    row["tokens_per_second"] = round(row["output_tokens"] / row["eval_seconds"], 1) if row["eval_seconds"] else None
+    row["openai_cost_usd"] = round((row["prompt_tokens"] * OPENAI_PRICE[0] + row["output_tokens"] * OPENAI_PRICE[1]) / 1e6, 6)
+    return row
+
+
+def record_timings(result, model=None, agent=None, wall_seconds=None):
+    """
+    Save the timings of one model call to MODEL_TIMINGS, and to the JSONL file if start_workflow() set one.
+    
+    Parameters:
+    -----------
+    result : dict
+        The JSON response from Ollama
+    model : str, optional
+        Model name to use if the response doesn't include one
+    agent : str, optional
+        Which agent made the call (e.g. the start of its role)
+    wall_seconds : float, optional
+        Time the call took as measured by the caller, including network time
+    
+    Returns:
+    --------
+    dict
+        The recorded timings
+    """
+    
+    row = {"time": datetime.now().isoformat(timespec="seconds"), "workflow": TELEMETRY["workflow"],
+           "agent": agent, **call_timings(result, model),
+           "wall_seconds": None if wall_seconds is None else round(wall_seconds, 3)}
+    MODEL_TIMINGS.append(row)
+    if TELEMETRY["path"]:
+        # Several agents may finish at once, so write one whole line at a time
+        with TELEMETRY_LOCK, open(TELEMETRY["path"], "a") as f:
+            f.write(json.dumps(row) + "\n")
+    return row
+
+
+def preload_models(models, keep_alive=KEEP_ALIVE):
+    """
+    Load models into memory before a workflow starts, and keep them loaded.
+    
+    Without this, the first call to each model also waits for the model to load,
+    which shows up as a random multi-second delay.
+    
+    Parameters:
+    -----------
+    models : list
+        Names of the models the workflow uses
+    keep_alive : str or int
+        How long Ollama keeps each model loaded after its last call (default: KEEP_ALIVE)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per model, with how long loading took
+    """
+    
+    rows = []
+    for model in models:
+        # A request with no prompt only loads the model
+        start = time.perf_counter()
+        response = requests.post(GENERATE_URL, json={"model": model, "keep_alive": keep_alive})
+        response.raise_for_status()
+        row = record_timings(response.json(), model, agent="preload", wall_seconds=time.perf_counter() - start)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def loaded_models():
+    """
+    List the models Ollama currently has in memory.
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per loaded model, with its name, memory size, and when it will be unloaded
+    """
+    
+    response = requests.get(PS_URL)
+    response.raise_for_status()
+    models = response.json().get("models", [])
+    return pd.DataFrame({
+        "model": [m.get("name") for m in models],
+        "size_vram": [m.get("size_vram") for m in models],
+        "expires_at": [m.get("expires_at") for m in models]
+    })
+
+
+def unload_models(models):
+    """
+    Unload models from memory right away (keep_alive = 0), to free memory after a workflow.
+    
+    Parameters:
+    -----------
+    models : list
+        Names of the models to unload
+    """
+    
+    for model in models:
+        response = requests.post(GENERATE_URL, json={"model": model, "keep_alive": 0})
+        response.raise_for_status()
+
+
+def timing_report(records=None, by="model"):
+    """
+    Summarize the recorded model calls: how much time went to loading vs. answering,
+    and which agent or model dominates latency.
+    
+    Parameters:
+    -----------
+    records : pandas.DataFrame or list, optional
+        Recorded timings, e.g. read from a JSONL file (default: MODEL_TIMINGS)
+    by : str or list
+        Column(s) to group by, e.g. "model", "agent", or ["workflow", "agent"] (default: "model")
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per group, slowest first: number of calls, tokens, total load, prompt, eval, and overall seconds,
+        mean time to first token, tokens per second, share of total time, and estimated OpenAI cost
+    """
+    
+    timings = pd.DataFrame(list(MODEL_TIMINGS) if records is None else records)
+    if timings.empty:
+        return timings
+    report = (timings
+              .groupby(by, as_index=False, dropna=False)
+              .agg(calls=("total_seconds", "size"),
+                   prompt_tokens=("prompt_tokens", "sum"),
+                   output_tokens=("output_tokens", "sum"),
+                   load_seconds=("load_seconds", "sum"),
+                   prompt_seconds=("prompt_seconds", "sum"),
+                   eval_seconds=("eval_seconds", "sum"),
+                   total_seconds=("total_seconds", "sum"),
+                   ttft_seconds=("ttft_seconds", "mean"),
+                   openai_cost_usd=("openai_cost_usd", "sum")))
+    report["tokens_per_second"] = report["output_tokens"] / report["eval_seconds"].where(report["eval_seconds"] > 0)
+    report["share_of_time"] = report["total_seconds"] / report["total_seconds"].sum()
+    # Costs are fractions of a cent, so they keep more decimal places
+    report = report.round({column: 3 for column in report.columns if column != "openai_cost_usd"})
+    return report.sort_values("total_seconds", ascending=False).reset_index(drop=True)
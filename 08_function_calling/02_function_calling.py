@@ -107,7 +107,10 @@ if "tool_calls" in result.get("message", {}):
     # Execute each tool call
     for tool_call in tool_calls:
         func_name = tool_call["function"]["name"]
-        func_args = json.loads(tool_call["function"]["arguments"])
+        func_args = tool_call["function"]["arguments"]
+        # Ollama returns arguments as a dictionary; some APIs return a JSON string
+        if isinstance(func_args, str):
+            func_args = json.loads(func_args)
         
         # Get the function from globals and execute it
         func = globals().get(func_name)
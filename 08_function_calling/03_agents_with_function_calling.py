@@ -20,7 +20,7 @@ import pandas as pd  # for data manipulation
 ## 0.2 Load Functions #################################
 
 # Load helper functions for agent orchestration
-from functions import agent
+from functions import agent, register_tool
 
 ## 0.3 Configuration #################################
 
@@ -95,6 +95,10 @@ tool_get_table = {
     }
 }
 
+# Register each function with its metadata, so agent() can find and run it by name
+register_tool(add_two_numbers, metadata=tool_add_two_numbers)
+register_tool(get_table, metadata=tool_get_table)
+
 # 3. EXAMPLE 1: STANDARD CHAT (NO TOOLS) ###################################
 
 # Trying to call a standard chat without tools
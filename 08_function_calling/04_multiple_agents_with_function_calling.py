@@ -13,15 +13,14 @@
 import requests  # for HTTP requests
 import json      # for working with JSON
 import pandas as pd  # for data manipulation
-from datetime import datetime  # for date parsing
 
 # If you haven't already, install these packages...
 # pip install requests pandas
 
 ## 0.2 Load Functions #################################
 
-# Load helper functions for agent orchestration
-from functions import agent_run, df_as_text
+# Load helper functions for agent orchestration and the FDA Drug Shortages API
+from functions import agent_run, agent_map_reduce, get_shortages, register_tool
 
 ## 0.3 Configuration #################################
 
@@ -33,62 +32,10 @@ MODEL = "smollm2:1.7b"
 
 # 1. DEFINE API FUNCTION AS A TOOL ###################################
 
-def get_shortages(category="Psychiatry", limit=500):
-    """
-    Get data on drug shortages from the FDA Drug Shortages API.
-    
-    Parameters:
-    -----------
-    category : str
-        The therapeutic category of the drug (default: "Psychiatry")
-    limit : int
-        The maximum number of results to return (default: 500)
-    
-    Returns:
-    --------
-    pandas.DataFrame
-        A DataFrame of drug shortages
-    """
-    
-    # FDA Drug Shortages API endpoint
-    url = "https://api.fda.gov/drug/shortages.json"
-    
-    # Build query parameters
-    params = {
-        "sort": "initial_posting_date:desc",
-        "search": f'dosage_form:"Capsule"+status:"Current"+therapeutic_category:"{category}"',
-        "limit": limit
-    }
-    
-    # Perform the request
-    response = requests.get(url, params=params, headers={"Accept": "application/json"})
-    response.raise_for_status()
-    
-    # Parse the response as JSON
-    data = response.json()
-    
-    # Process the data into a pandas DataFrame
-    results = data.get("results", [])
-    
-    # Extract relevant fields
-    processed_data = []
-    for item in results:
-        processed_data.append({
-            "generic_name": item.get("generic_name", ""),
-            "update_type": item.get("update_type", ""),
-            "update_date": item.get("update_date", ""),
-            "availability": item.get("availability", ""),
-            "related_info": item.get("related_info", "")
-        })
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(processed_data)
-    
-    # Parse dates (FDA API uses M/D/YYYY format)
-    if not df.empty and "update_date" in df.columns:
-        df["update_date"] = pd.to_datetime(df["update_date"], format="%m/%d/%Y", errors="coerce")
-    
-    return df
+# get_shortages() is defined in functions.py and registered as a tool there, so the agent can find and run it.
+# It pages through the API (fetching pages at the same time), reuses a connection,
+# and caches responses for an hour, so repeated runs don't re-download the same data.
+# Run help(get_shortages) to see its parameters.
 
 # 2. DEFINE TOOL METADATA ###################################
 
@@ -103,6 +50,8 @@ categories = [
 ]
 
 # Define the tool metadata as a dictionary
+# (register_tool() can also build metadata from a function's signature and docstring,
+# but here we list the category options so the model picks a valid one)
 tool_get_shortages = {
     "type": "function",
     "function": {
@@ -125,6 +74,9 @@ tool_get_shortages = {
     }
 }
 
+# Register get_shortages() with this metadata, so arguments are checked against it
+register_tool(get_shortages, metadata=tool_get_shortages)
+
 # 3. MULTI-AGENT WORKFLOW ###################################
 
 # Let's create an agentic workflow with function calling.
@@ -133,16 +85,23 @@ tool_get_shortages = {
 # This agent uses the get_shortages tool to fetch data from the API
 task = "Get data on drug shortages for the category Psychiatry"
 role1 = "I fetch information from the FDA Drug Shortages API"
-result1 = agent_run(role=role1, task=task, model=MODEL, output="tools", tools=[tool_get_shortages])
+tool_calls = agent_run(role=role1, task=task, model=MODEL, output="tools", tools=[tool_get_shortages])
 
-# result1 will be a DataFrame (the output from get_shortages)
-# Convert it to text for the next agent
-result1_text = df_as_text(result1)
+# With output="tools", the agent returns the tool calls it made, each with its output.
+# The last output is a DataFrame (from get_shortages), with up to 500 rows.
+# If the model answered in text instead of calling the tool, fetch the data directly.
+if isinstance(tool_calls, list) and tool_calls and isinstance(tool_calls[-1].get("output"), pd.DataFrame):
+    result1 = tool_calls[-1]["output"]
+else:
+    print("⚠️ Agent 1 did not call get_shortages; fetching the data directly.")
+    result1 = get_shortages(category="Psychiatry", limit=500)
 
 # Agent 2: Data Analyst (no tools)
 # This agent analyzes the data and returns a markdown table
+# Hundreds of rows would overflow a small model's context, so agent_map_reduce() converts the rows
+# to compact CSV text in chunks, analyzes the chunks at the same time, and combines the partial tables.
 role2 = "I analyze data in a table format and return a markdown table of currently ongoing shortages."
-result2 = agent_run(role=role2, task=result1_text, model=MODEL, output="text", tools=None)
+result2 = agent_map_reduce(result1, role=role2, model=MODEL, label="analyst")
 
 # Agent 3: Press Release Writer (no tools)
 # This agent writes a press release based on the analysis
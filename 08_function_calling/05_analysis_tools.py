@@ -0,0 +1,83 @@
+# 05_analysis_tools.py
+# Agents with Analysis Tools
+# Pairs with 04_multiple_agents_with_function_calling.py
+# Tim Fraser
+
+# This script gives the analyst agent a set of analysis tools instead of a raw table.
+# Counting, sorting and comparing rows is slow and error-prone for a small model,
+# so the tools do that work in pandas and return short tables; the model only picks
+# the tools it needs and spends its tokens writing about the results.
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import pandas as pd  # for data manipulation
+
+# If you haven't already, install these packages...
+# pip install requests pandas
+
+## 0.2 Load Functions #################################
+
+# Load helper functions for agent orchestration, and the registered analysis tools:
+# shortage_counts(), latest_shortage_status(), shortage_trend() and top_shortages()
+from functions import agent_run, agent_loop, df_as_text, latest_shortage_status, timing_report, ANALYSIS_TOOLS
+
+## 0.3 Configuration #################################
+
+# Select model of interest
+MODEL = "smollm2:1.7b"
+
+# Category to analyze
+CATEGORY = "Psychiatry"
+
+# At most this many model calls for the analyst (on the last one, it has to answer in text)
+MAX_STEPS = 3
+
+# 1. ANALYST AGENT (WITH ANALYSIS TOOLS) ###################################
+
+# The tool results come back to the analyst as compact CSV, in the same conversation,
+# and it writes its analysis from those results
+role1 = ("I analyze FDA drug shortage data. I use the analysis tools to get counts, the latest status, "
+         "trends and the most-updated drugs, then summarize what they show. I report numbers exactly as the tools return them.")
+task1 = f"Analyze the current drug shortages for the category {CATEGORY}: how many drugs are unavailable, which ones, and how updates have trended."
+
+run = agent_loop(
+    messages=[
+        {"role": "system", "content": role1},
+        {"role": "user", "content": task1}
+    ],
+    tools=ANALYSIS_TOOLS,
+    model=MODEL,
+    max_steps=MAX_STEPS,
+    label="analyst"
+)
+result1 = run["content"]
+
+# If the model didn't call any tool, give the writer the latest-status table directly
+if not any(step["tool_calls"] for step in run["steps"]):
+    result1 = df_as_text(latest_shortage_status(category=CATEGORY))
+
+# 2. PRESS RELEASE AGENT (NO TOOLS) ###################################
+
+role2 = "I write a 1-page press release on the currently ongoing shortages, using the analysis provided by the user."
+result2 = agent_run(role=role2, task=result1, model=MODEL, output="text", label="writer")
+
+# 3. VIEW RESULTS ###################################
+
+print("🔧 Analyst Tool Calls:")
+for step in run["steps"]:
+    print(f"Step {step['step']}: tools={step['tool_calls']} model={step['model_seconds']}s tools={step['tool_seconds']}s")
+print()
+
+print("📈 Analysis:")
+print(result1)
+print()
+
+print("📰 Press Release:")
+print(result2)
+print()
+
+# View how long each agent took, with its token counts
+print("⏱️ Model Timings by Agent:")
+print(timing_report(by="agent"))
@@ -11,7 +11,16 @@
 
 import requests  # for HTTP requests
 import json      # for working with JSON
+import math      # for rounding up token estimates
+import re        # for reading parameter descriptions from docstrings
+import inspect   # for building tool metadata from function signatures
+from functools import lru_cache  # for caching tool metadata
 import pandas as pd  # for data manipulation
+import time      # for cache timestamps
+from concurrent.futures import ThreadPoolExecutor  # for fetching pages in parallel
+from collections import deque  # for keeping recent model timings
+from datetime import datetime  # for timestamps of recorded timings
+import threading  # for writing timings safely from several threads
 
 # If you haven't already, install these packages...
 # pip install requests pandas
@@ -24,9 +33,13 @@ PORT = 11434
 OLLAMA_HOST = f"http://localhost:{PORT}"
 CHAT_URL = f"{OLLAMA_HOST}/api/chat"
 
+# How long Ollama keeps a model loaded after each call (Ollama's default is 5 minutes).
+# Keeping it loaded means later calls don't wait for the model to load again.
+KEEP_ALIVE = "30m"
+
 # 1. AGENT FUNCTION ###################################
 
-def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
+def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False, keep_alive=KEEP_ALIVE, label=None, options=None):
     """
     Agent wrapper function that runs a single agent, with or without tools.
     
@@ -40,14 +53,25 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
     output : str
         The output format (default: "text")
     tools : list, optional
-        List of tool metadata dictionaries for function calling
+        Tools for function calling: functions, or metadata dictionaries of registered tools
     all : bool
         If True, return all responses. If False, return only the last response.
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after this call (default: KEEP_ALIVE)
+    label : str, optional
+        Name for this agent in the recorded timings (see timing_report())
+    options : dict, optional
+        Ollama model options, e.g. {"num_predict": 400} to cap the reply length
     
     Returns:
     --------
     str or list
         The agent's response(s)
+    
+    Raises:
+    -------
+    RuntimeError
+        If a tool call fails (unless all=True; each failed call then has an "error" entry)
     """
     
     # If the agent has NO tools, perform a standard chat
@@ -55,41 +79,47 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
         body = {
             "model": model,
             "messages": messages,
-            "stream": False
+            "stream": False,
+            "keep_alive": keep_alive
         }
+        if options:
+            body["options"] = options
         
+        start = time.perf_counter()
         response = requests.post(CHAT_URL, json=body)
         response.raise_for_status()
         result = response.json()
+        record_timings(result, model, agent=label, wall_seconds=time.perf_counter() - start)
         
         return result["message"]["content"]
     else:
         # If the agent has tools, perform a tool call
+        # Tools can be functions or metadata dictionaries; either way the model gets metadata
         body = {
             "model": model,
             "messages": messages,
-            "tools": tools,
-            "stream": False
+            "tools": tool_list(tools),
+            "stream": False,
+            "keep_alive": keep_alive
         }
+        if options:
+            body["options"] = options
         
+        start = time.perf_counter()
         response = requests.post(CHAT_URL, json=body)
         response.raise_for_status()
         result = response.json()
+        record_timings(result, model, agent=label, wall_seconds=time.perf_counter() - start)
         
-        # For any given tool call, execute the tool call
+        # Execute every tool call (at the same time, if there are several)
+        # Tools are found by name in TOOL_REGISTRY, so tools registered in any script can run
         if "tool_calls" in result.get("message", {}):
-            tool_calls = result["message"]["tool_calls"]
-            for tool_call in tool_calls:
-                # Execute the tool function
-                # Note: Tool functions must be defined in the global scope
-                func_name = tool_call["function"]["name"]
-                func_args = json.loads(tool_call["function"]["arguments"])
-                
-                # Get the function from globals and execute it
-                func = globals().get(func_name)
-                if func:
-                    output = func(**func_args)
-                    tool_call["output"] = output
+            tool_calls = run_tool_calls(result["message"]["tool_calls"])
+            # Callers expect the tool's real output (e.g. a DataFrame), so a failed tool stops here
+            # (agent_loop() instead passes tool errors back to the model)
+            errors = [f"{call['function']['name']}: {call['error']}" for call in tool_calls if "error" in call]
+            if errors and not all:
+                raise RuntimeError("Tool call failed:\n" + "\n".join(errors))
         
         if all:
             return result
@@ -104,7 +134,7 @@ def agent(messages, model=DEFAULT_MODEL, output="text", tools=None, all=False):
             return result["message"]["content"]
 
 
-def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
+def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL, keep_alive=KEEP_ALIVE, label=None, options=None):
     """
     Run an agent with a specific role and task.
     
@@ -115,11 +145,17 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
     task : str
         The user message/task for the agent
     tools : list, optional
-        List of tool metadata for function calling
+        Tools for function calling: functions, or metadata dictionaries of registered tools
     output : str
         Output format (default: "text")
     model : str
         Model to use (default: DEFAULT_MODEL)
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after this call (default: KEEP_ALIVE)
+    label : str, optional
+        Name for this agent in the recorded timings (default: the start of its role)
+    options : dict, optional
+        Ollama model options, e.g. {"num_predict": 400} to cap the reply length
     
     Returns:
     --------
@@ -134,28 +170,1180 @@ def agent_run(role, task, tools=None, output="text", model=DEFAULT_MODEL):
     ]
     
     # Run the agent
-    resp = agent(messages=messages, model=model, output=output, tools=tools)
+    resp = agent(messages=messages, model=model, output=output, tools=tools, keep_alive=keep_alive,
+                 label=label or role[:40], options=options)
     return resp
 
 
+def tool_output_text(output):
+    """
+    Turn a tool's output into text for a role "tool" message.
+    
+    Parameters:
+    -----------
+    output : any
+        What the tool returned
+    
+    Returns:
+    --------
+    str
+        Compact text (CSV for DataFrames, JSON for dictionaries and lists)
+    """
+    
+    if isinstance(output, pd.DataFrame):
+        return df_as_text(output)
+    if isinstance(output, (dict, list)):
+        return json.dumps(output, default=str)
+    return str(output)
+
+
+def agent_loop(messages, tools, model=DEFAULT_MODEL, max_steps=5, keep_alive=KEEP_ALIVE, label="agent_loop"):
+    """
+    Run an agent that can call tools over several steps in one conversation.
+    
+    After each tool call, the results are added to the conversation as role "tool"
+    messages and the model is asked again, until it answers without calling a tool.
+    Because the conversation only grows at the end, Ollama can reuse the model it keeps
+    loaded (keep_alive) and the already-processed start of the prompt, instead of
+    re-reading the system prompt in a brand-new conversation each time.
+    
+    Parameters:
+    -----------
+    messages : list
+        Starting messages, e.g. [{"role": "system", ...}, {"role": "user", ...}]
+    tools : list
+        Tools for function calling: functions, or metadata dictionaries of registered tools
+    model : str
+        Model to use (default: DEFAULT_MODEL)
+    max_steps : int
+        Maximum number of model calls (default: 5). On the last step no tools are offered,
+        so the model has to answer in text.
+    keep_alive : str or int
+        How long Ollama keeps the model loaded between calls (default: KEEP_ALIVE)
+    label : str
+        Name for this agent in the recorded timings (default: "agent_loop")
+    
+    Returns:
+    --------
+    dict
+        "content": the final answer, "messages": the full conversation,
+        "steps": per-step timing and token counts
+    """
+    
+    messages = list(messages)
+    metadata = tool_list(tools)
+    steps = []
+    
+    for step in range(1, max_steps + 1):
+        body = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": keep_alive
+        }
+        if step < max_steps:
+            body["tools"] = metadata
+        
+        start = time.perf_counter()
+        response = requests.post(CHAT_URL, json=body)
+        response.raise_for_status()
+        result = response.json()
+        model_seconds = time.perf_counter() - start
+        record_timings(result, model, agent=label, wall_seconds=model_seconds)
+        
+        message = result.get("message", {})
+        tool_calls = message.get("tool_calls") or []
+        
+        # Keep the model's turn as it was sent (without our outputs) in the conversation
+        messages.append({
+            "role": "assistant",
+            "content": message.get("content", ""),
+            **({"tool_calls": tool_calls} if tool_calls else {})
+        })
+        
+        # Run the tools on copies, then feed each result back as a role "tool" message
+        start = time.perf_counter()
+        calls = run_tool_calls([{"function": dict(call["function"])} for call in tool_calls])
+        tool_seconds = time.perf_counter() - start
+        for call in calls:
+            messages.append({
+                "role": "tool",
+                "tool_name": call["function"]["name"],
+                # A failed tool's error goes back to the model, so it can fix its arguments
+                "content": f"Error: {call['error']}" if "error" in call else tool_output_text(call["output"])
+            })
+        
+        steps.append({
+            "step": step,
+            "tool_calls": [call["function"]["name"] for call in calls],
+            "model_seconds": round(model_seconds, 3),
+            "tool_seconds": round(tool_seconds, 3),
+            "prompt_tokens": result.get("prompt_eval_count"),
+            "output_tokens": result.get("eval_count")
+        })
+        
+        if not tool_calls:
+            break
+    
+    return {"content": message.get("content", ""), "messages": messages, "steps": steps}
+
+
 # 2. DATA CONVERSION FUNCTION ###################################
 
-def df_as_text(df):
+def estimate_tokens(text):
     """
-    Convert a pandas DataFrame to a markdown table string.
+    Roughly estimate how many tokens a model will count in a text (about 4 characters per token).
+    
+    Parameters:
+    -----------
+    text : str
+        The text to measure
+    
+    Returns:
+    --------
+    int
+        Estimated token count
+    """
+    
+    return math.ceil(len(text) / 4)
+
+
+def df_as_text(df, format="csv", columns=None, max_rows=None, sample="head", count_by=None, prune=True):
+    """
+    Convert a pandas DataFrame to a compact text table for an LLM prompt.
+    
+    Every character we send costs tokens, so the default is plain CSV, which has no
+    padding spaces or border characters (unlike a markdown table, which pads every cell
+    to its column width). Options let you drop columns, cap rows, or summarize rows.
     
     Parameters:
     -----------
     df : pandas.DataFrame
         The DataFrame to convert to text
+    format : str
+        "csv" (default), "tsv", "json" (one compact record per row), or "markdown"
+    columns : list, optional
+        Keep only these columns
+    max_rows : int, optional
+        Keep at most this many rows; a note says how many rows were left out
+    sample : str
+        Which rows to keep when max_rows applies: "head" (first rows, default) or "random"
+    count_by : str or list, optional
+        Instead of raw rows, send the number of rows in each group of these column(s)
+    prune : bool
+        If True (default), drop empty columns, and state columns with a single value
+        once in a note instead of repeating the value on every row
     
     Returns:
     --------
     str
-        A markdown-formatted table string
+        The table as text
     """
     
-    # Convert DataFrame to markdown table
-    # pandas to_markdown() method creates markdown tables
-    tab = df.to_markdown(index=False)
+    notes = []
+    
+    # Keep only the columns we need
+    if columns is not None:
+        df = df[columns]
+    
+    # Summarize: one row per group, with a count
+    if count_by is not None:
+        df = (df
+              .groupby(count_by, dropna=False)
+              .size()
+              .reset_index(name="n")
+              .sort_values("n", ascending=False))
+    
+    # Drop empty columns, and move single-value columns into a note
+    if prune and len(df) > 1:
+        values = df.replace("", pd.NA)
+        empty = [c for c in df.columns if values[c].isna().all()]
+        constant = [c for c in df.columns if c not in empty and values[c].nunique(dropna=False) == 1]
+        notes += [f"{c}={df[c].iloc[0]}" for c in constant]
+        df = df.drop(columns=empty + constant)
+    
+    # Cap the number of rows
+    if max_rows is not None and len(df) > max_rows:
+        notes.append(f"showing {max_rows} of {len(df)} rows")
+        df = df.sample(n=max_rows, random_state=1) if sample == "random" else df.head(max_rows)
+    
+    # Write the table in the chosen format
+    if format == "csv":
+        tab = df.to_csv(index=False).strip()
+    elif format == "tsv":
+        tab = df.to_csv(index=False, sep="\t").strip()
+    elif format == "json":
+        tab = df.to_json(orient="records", lines=True, date_format="iso").strip()
+    elif format == "markdown":
+        # pandas to_markdown() method creates markdown tables (requires: pip install tabulate)
+        tab = df.to_markdown(index=False)
+    else:
+        raise ValueError("Invalid format. Use 'csv', 'tsv', 'json', or 'markdown'.")
+    
+    # Put any notes first, as comment lines
+    if notes:
+        tab = "\n".join(f"# {note}" for note in notes) + "\n" + tab
     return tab
+
+
+def df_token_report(df, **options):
+    """
+    Compare how many tokens each text format would use for the same DataFrame.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame to measure
+    **options
+        Any other df_as_text() options (e.g. columns, max_rows)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Characters and estimated tokens per format, smallest first
+    """
+    
+    rows = []
+    for format in ["csv", "tsv", "json", "markdown"]:
+        try:
+            text = df_as_text(df, format=format, **options)
+        except ImportError:
+            continue  # markdown needs the tabulate package
+        rows.append({"format": format, "characters": len(text), "tokens": estimate_tokens(text)})
+    return pd.DataFrame(rows).sort_values("tokens").reset_index(drop=True)
+
+
+# 3. API FUNCTION ###################################
+
+# FDA Drug Shortages API endpoint
+# https://open.fda.gov/apis/drug/drugshortages/
+FDA_SHORTAGES_URL = "https://api.fda.gov/drug/shortages.json"
+
+# openFDA returns at most 1000 records per request, so larger requests are split into pages
+FDA_PAGE_SIZE = 1000
+
+# How long (in seconds) to reuse a cached API response before asking the API again
+FDA_CACHE_TTL = 3600
+
+# Fields we keep from each shortage record
+SHORTAGE_FIELDS = ["generic_name", "update_type", "update_date", "availability", "related_info"]
+
+# All therapeutic categories in the FDA Drug Shortages data
+SHORTAGE_CATEGORIES = [
+    "Analgesia/Addiction", "Anesthesia", "Anti-Infective", "Antiviral",
+    "Cardiovascular", "Dental", "Dermatology", "Endocrinology/Metabolism",
+    "Gastroenterology", "Hematology", "Inborn Errors", "Medical Imaging",
+    "Musculoskeletal", "Neurology", "Oncology", "Ophthalmology", "Other",
+    "Pediatric", "Psychiatry", "Pulmonary/Allergy", "Renal", "Reproductive",
+    "Rheumatology", "Total Parenteral Nutrition", "Transplant", "Urology"
+]
+
+# One shared session reuses open connections to the API, instead of opening a new one per request
+fda_session = requests.Session()
+fda_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# Cached API responses: (search, sort, skip, limit) -> (time fetched, response JSON)
+fda_cache = {}
+
+
+def get_fda_page(search, sort, skip, limit, ttl=FDA_CACHE_TTL):
+    """
+    Get one page of results from the FDA Drug Shortages API, reusing a cached copy if it is fresh.
+    
+    Parameters:
+    -----------
+    search : str
+        openFDA search expression
+    sort : str
+        openFDA sort expression
+    skip : int
+        Number of records to skip (where this page starts)
+    limit : int
+        Number of records on this page (at most FDA_PAGE_SIZE)
+    ttl : int
+        Seconds a cached response stays fresh (default: FDA_CACHE_TTL)
+    
+    Returns:
+    --------
+    dict
+        The API response as JSON (with an empty results list if nothing matched)
+    """
+    
+    key = (search, sort, skip, limit)
+    cached = fda_cache.get(key)
+    if cached is not None and time.time() - cached[0] < ttl:
+        return cached[1]
+    
+    params = {"search": search, "sort": sort, "skip": skip, "limit": limit}
+    response = fda_session.get(FDA_SHORTAGES_URL, params=params, headers={"Accept": "application/json"}, timeout=30)
+    
+    # openFDA answers 404 when no records match the search
+    if response.status_code == 404:
+        data = {"meta": {"results": {"total": 0}}, "results": []}
+    else:
+        response.raise_for_status()
+        data = response.json()
+    
+    fda_cache[key] = (time.time(), data)
+    return data
+
+
+def get_shortages(category="Psychiatry", limit=500, max_workers=8, ttl=FDA_CACHE_TTL):
+    """
+    Get data on drug shortages from the FDA Drug Shortages API.
+    
+    Parameters:
+    -----------
+    category : str
+        The therapeutic category of the drug (default: "Psychiatry")
+    limit : int
+        The maximum number of results to return (default: 500); None returns every match.
+        Requests over 1000 results are fetched as several pages at the same time.
+    max_workers : int
+        Maximum number of pages fetched at the same time (default: 8)
+    ttl : int
+        Seconds a cached response stays fresh (default: FDA_CACHE_TTL)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        A DataFrame of drug shortages
+    """
+    
+    # Build query parameters
+    search = f'dosage_form:"Capsule"+status:"Current"+therapeutic_category:"{category}"'
+    sort = "initial_posting_date:desc"
+    
+    # Fetch the first page; it also tells us how many records match in total
+    first_size = FDA_PAGE_SIZE if limit is None else min(limit, FDA_PAGE_SIZE)
+    first = get_fda_page(search, sort, 0, first_size, ttl=ttl)
+    total = first.get("meta", {}).get("results", {}).get("total", len(first.get("results", [])))
+    wanted = total if limit is None else min(limit, total)
+    
+    # Fetch any remaining pages at the same time, using skip to step through the results
+    # (executor.map returns pages in order, so the records stay sorted)
+    skips = range(first_size, wanted, FDA_PAGE_SIZE)
+    pages = [first]
+    if len(skips) > 0:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pages += list(executor.map(
+                lambda skip: get_fda_page(search, sort, skip, min(FDA_PAGE_SIZE, wanted - skip), ttl=ttl),
+                skips
+            ))
+    results = [item for page in pages for item in page.get("results", [])][:wanted]
+    
+    # Build the DataFrame column by column, rather than from one dictionary per record
+    df = pd.DataFrame({
+        field: [item.get(field, "") for item in results]
+        for field in SHORTAGE_FIELDS
+    })
+    
+    # Parse dates (FDA API uses M/D/YYYY format)
+    if not df.empty and "update_date" in df.columns:
+        df["update_date"] = pd.to_datetime(df["update_date"], format="%m/%d/%Y", errors="coerce")
+    
+    return df
+
+
+def get_all_shortages(categories=SHORTAGE_CATEGORIES, limit=None, max_workers=8, ttl=FDA_CACHE_TTL):
+    """
+    Get drug shortages for many therapeutic categories at once, fetching categories in parallel.
+    
+    Parameters:
+    -----------
+    categories : list
+        Therapeutic categories to fetch (default: all of SHORTAGE_CATEGORIES)
+    limit : int, optional
+        Maximum results per category (default: None, meaning all)
+    max_workers : int
+        Maximum number of categories fetched at the same time (default: 8)
+    ttl : int
+        Seconds a cached response stays fresh (default: FDA_CACHE_TTL)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        A DataFrame of drug shortages, with a category column
+    """
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = list(executor.map(
+            lambda category: get_shortages(category, limit=limit, max_workers=2, ttl=ttl).assign(category=category),
+            categories
+        ))
+    return pd.concat(frames, ignore_index=True)
+
+
+# 4. DATA SUMMARY FUNCTIONS ###################################
+
+def latest_by_group(df, group="generic_name", date="update_date"):
+    """
+    Keep only the most recent record for each group (e.g. the latest update per drug).
+    
+    This gives the same rows as
+    df.groupby(group).apply(lambda x: x.loc[x[date].idxmax()]),
+    but finds the latest row of every group in one vectorized idxmax() call
+    instead of one Python function call per group, so it stays fast on large tables
+    and keeps the group column.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The data, with one row per record
+    group : str
+        Column identifying each group (default: "generic_name")
+    date : str
+        Column used to pick the latest record (default: "update_date")
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per group, sorted by group, with a fresh index
+    """
+    
+    # Rows without a group or a date can never be the latest record; a fresh index makes row labels unique
+    df = df[df[group].notna() & df[date].notna()].reset_index(drop=True)
+    # Row label of the latest date in each group (ties go to the first row, like idxmax() per group)
+    rows = df.groupby(group)[date].idxmax()
+    return df.loc[rows.values].reset_index(drop=True)
+
+
+def count_by(df, by):
+    """
+    Count the rows in each group.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The data, with one row per record
+    by : str or list
+        Column(s) to group by
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per group with its count n, largest first
+    """
+    
+    return (df
+            .groupby(by, dropna=False)
+            .size()
+            .reset_index(name="n")
+            .sort_values("n", ascending=False, kind="stable")
+            .reset_index(drop=True))
+
+
+# Time periods for trend_by_period(), and their pandas period codes
+PERIODS = {"week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+
+def trend_by_period(df, date="update_date", period="month", by=None):
+    """
+    Count the rows in each time period, optionally with one column per group.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The data, with one row per record
+    date : str
+        Date column (default: "update_date")
+    period : str
+        "week", "month" (default), "quarter" or "year"
+    by : str, optional
+        Column whose values become count columns (e.g. "update_type")
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per period, oldest first, with a count n (or one count column per group)
+    """
+    
+    if period not in PERIODS:
+        raise ValueError(f"Invalid period. Use one of: {', '.join(PERIODS)}.")
+    df = df[df[date].notna()]
+    periods = df[date].dt.to_period(PERIODS[period]).rename("period")
+    if by is None:
+        counts = df.groupby(periods).size().reset_index(name="n")
+    else:
+        counts = df.groupby([periods, df[by]]).size().unstack(fill_value=0).reset_index()
+        counts.columns.name = None
+    # Periods sort by time; as text they read as e.g. "2025-01" or "2025Q1"
+    return counts.assign(period=counts["period"].astype(str))
+
+
+def top_n(df, group="generic_name", n=10, date="update_date"):
+    """
+    Find the groups with the most records (e.g. the drugs updated most often).
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The data, with one row per record
+    group : str
+        Column identifying each group (default: "generic_name")
+    n : int
+        How many groups to keep (default: 10)
+    date : str
+        Date column, for each group's first and last record (default: "update_date")
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Up to n rows, most records first: group, records, first_date, last_date
+    """
+    
+    return (df
+            .groupby(group, as_index=False)
+            .agg(records=(date, "size"), first_date=(date, "min"), last_date=(date, "max"))
+            .nlargest(n, "records", keep="first")
+            .reset_index(drop=True))
+
+
+# 5. TOOL REGISTRY ###################################
+
+# Tools the agent can run, by name: name -> {"function": ..., "metadata": ...}
+# agent() looks tools up here, so tools defined in any script work once they are registered.
+TOOL_REGISTRY = {}
+
+# Python types and the JSON-schema types used to describe them to the model
+JSON_TYPES = {bool: "boolean", int: "integer", float: "number", str: "string", list: "array", tuple: "array", dict: "object"}
+
+# Lines like "category : str" in the Parameters section of a docstring
+DOCSTRING_PARAM = re.compile(r"^\s*(\w+)\s*:\s*(.+)$")
+
+
+@lru_cache(maxsize=None)
+def tool_metadata(func):
+    """
+    Build tool metadata (a JSON schema) from a function's signature and docstring.
+    
+    Types come from annotations, or else from default values (anything else is a string).
+    Parameters without defaults are required. Descriptions come from the first docstring
+    paragraph and the Parameters section. The result is cached, so each function is inspected once.
+    
+    Parameters:
+    -----------
+    func : callable
+        The function to describe
+    
+    Returns:
+    --------
+    dict
+        Tool metadata in the format Ollama expects
+    """
+    
+    doc = inspect.getdoc(func) or ""
+    
+    # Parameter descriptions: the line after each "name : type" line
+    lines = doc.splitlines()
+    notes = {}
+    for i, line in enumerate(lines[:-1]):
+        match = DOCSTRING_PARAM.match(line)
+        if match and lines[i + 1].strip():
+            notes[match.group(1)] = lines[i + 1].strip()
+    
+    properties = {}
+    required = []
+    for name, param in inspect.signature(func).parameters.items():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        if param.annotation is not param.empty:
+            kind = param.annotation
+        elif param.default is not param.empty and param.default is not None:
+            kind = type(param.default)
+        else:
+            kind = str
+        properties[name] = {"type": JSON_TYPES.get(kind, "string"), "description": notes.get(name, name)}
+        if param.default is param.empty:
+            required.append(name)
+    
+    return {
+        "type": "function",
+        "function": {
+            "name": func.__name__,
+            "description": doc.split("\n\n")[0].replace("\n", " ") or func.__name__,
+            "parameters": {"type": "object", "required": required, "properties": properties}
+        }
+    }
+
+
+def register_tool(func, metadata=None):
+    """
+    Register a function so agents can call it as a tool.
+    
+    Parameters:
+    -----------
+    func : callable
+        The function to run when the model calls the tool
+    metadata : dict, optional
+        Hand-written tool metadata. If None, it is built from the function's signature.
+    
+    Returns:
+    --------
+    callable
+        The same function, so register_tool can also be used as a decorator
+    """
+    
+    metadata = metadata or tool_metadata(func)
+    TOOL_REGISTRY[metadata["function"]["name"]] = {"function": func, "metadata": metadata}
+    return func
+
+
+def tool_list(tools):
+    """
+    Turn a list of tools (functions or metadata dictionaries) into metadata for the model.
+    Functions are registered on the way, so they can be passed to agent() directly.
+    
+    Parameters:
+    -----------
+    tools : list
+        Functions and/or tool metadata dictionaries
+    
+    Returns:
+    --------
+    list
+        Tool metadata dictionaries
+    """
+    
+    metadata = []
+    for tool in tools:
+        if callable(tool):
+            name = tool.__name__
+            if TOOL_REGISTRY.get(name, {}).get("function") is not tool:
+                register_tool(tool)
+            tool = TOOL_REGISTRY[name]["metadata"]
+        metadata.append(tool)
+    return metadata
+
+
+def validate_tool_arguments(name, arguments):
+    """
+    Check a tool call's arguments against the tool's schema.
+    
+    Arguments may be a dictionary (as Ollama returns them) or a JSON string (as OpenAI does).
+    Numbers sent as strings are converted, and whole numbers (like 3.0) become integers.
+    
+    Parameters:
+    -----------
+    name : str
+        Name of a registered tool
+    arguments : dict or str
+        The arguments the model supplied
+    
+    Returns:
+    --------
+    dict
+        Arguments ready to pass to the function
+    
+    Raises:
+    -------
+    ValueError
+        If the tool is unknown, a required argument is missing, an argument is unexpected,
+        or an argument has the wrong type
+    """
+    
+    if name not in TOOL_REGISTRY:
+        raise ValueError(f"Unknown tool '{name}'. Register it with register_tool().")
+    if isinstance(arguments, str):
+        arguments = json.loads(arguments) if arguments.strip() else {}
+    arguments = dict(arguments or {})
+    
+    schema = TOOL_REGISTRY[name]["metadata"]["function"].get("parameters", {})
+    properties = schema.get("properties", {})
+    
+    missing = [key for key in schema.get("required", []) if key not in arguments]
+    if missing:
+        raise ValueError(f"Tool '{name}' is missing required argument(s): {', '.join(missing)}")
+    unexpected = [key for key in arguments if key not in properties]
+    if unexpected:
+        raise ValueError(f"Tool '{name}' got unexpected argument(s): {', '.join(unexpected)}")
+    
+    for key, value in arguments.items():
+        kind = properties[key].get("type")
+        try:
+            if kind == "integer" and not isinstance(value, bool):
+                number = float(value)
+                if not number.is_integer():
+                    raise ValueError
+                arguments[key] = int(number)
+            elif kind == "number" and not isinstance(value, bool):
+                if not isinstance(value, (int, float, str)):
+                    raise ValueError
+                number = float(value)
+                # Whole numbers become int, so they also work as counts and limits
+                arguments[key] = int(number) if number.is_integer() else number
+            elif kind == "string" and not isinstance(value, str):
+                raise ValueError
+            elif kind == "boolean" and not isinstance(value, bool):
+                raise ValueError
+            elif kind == "array" and not isinstance(value, (list, tuple)):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise ValueError(f"Tool '{name}' argument '{key}' should be {kind}, got {value!r}") from None
+    return arguments
+
+
+def run_tool_call(tool_call):
+    """
+    Run one tool call and store its result in tool_call["output"],
+    or, if it fails, its error message in tool_call["error"].
+    
+    Parameters:
+    -----------
+    tool_call : dict
+        A tool call from the model's response
+    
+    Returns:
+    --------
+    dict
+        The same tool call, with "output" or "error" added
+    """
+    
+    name = tool_call["function"]["name"]
+    try:
+        arguments = validate_tool_arguments(name, tool_call["function"].get("arguments"))
+        tool_call["output"] = TOOL_REGISTRY[name]["function"](**arguments)
+    except Exception as error:
+        # Keep the error apart from the output, so one bad call doesn't stop the others
+        # and a caller never mistakes an error message for the tool's result
+        tool_call["error"] = f"{type(error).__name__}: {error}"
+    return tool_call
+
+
+def run_tool_calls(tool_calls, max_workers=8):
+    """
+    Run every tool call from one response, at the same time when there are several,
+    so a turn with many tool calls takes about as long as its slowest tool.
+    
+    Parameters:
+    -----------
+    tool_calls : list
+        Tool calls from the model's response
+    max_workers : int
+        Maximum number of tools run at the same time (default: 8)
+    
+    Returns:
+    --------
+    list
+        The same tool calls, in order, each with "output" (or "error") added
+    """
+    
+    if len(tool_calls) <= 1:
+        return [run_tool_call(tool_call) for tool_call in tool_calls]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tool_calls))) as executor:
+        return list(executor.map(run_tool_call, tool_calls))
+
+
+# Tools provided by this module
+# get_shortages() is described by hand, so the model only sees category and limit;
+# max_workers and ttl control fetching and caching, which are not the model's to change
+register_tool(get_shortages, metadata={
+    "type": "function",
+    "function": {
+        "name": "get_shortages",
+        "description": "Get data on current drug shortages from the FDA Drug Shortages API",
+        "parameters": {
+            "type": "object",
+            "required": ["category"],
+            "properties": {
+                "category": {
+                    "type": "string",
+                    "description": f"The therapeutic category of the drug. Options are: {', '.join(SHORTAGE_CATEGORIES)}."
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "The maximum number of results to return (default: 500)"
+                }
+            }
+        }
+    }
+})
+
+
+# 6. MODEL TIMINGS ###################################
+
+# Timings of recent model calls, oldest first (see timing_report())
+MODEL_TIMINGS = deque(maxlen=1000)
+
+# Workflow name for the calls that follow, and an optional JSONL file to log them to (see start_workflow())
+TELEMETRY = {"workflow": "default", "path": None}
+TELEMETRY_LOCK = threading.Lock()
+
+# OpenAI gpt-4o-mini prices in US dollars per 1 million (input, output) tokens,
+# to estimate what each call would cost there; prices change, see https://openai.com/api/pricing/
+OPENAI_PRICE = (0.15, 0.60)
+
+
+def start_workflow(name, path=None):
+    """
+    Label the model calls that follow as one workflow, and optionally log them to a JSONL file
+    (read it back with pd.read_json(path, lines=True)).
+    
+    Parameters:
+    -----------
+    name : str
+        Workflow name, e.g. "press_release"
+    path : str, optional
+        JSONL file to append one line per model call to (default: None, no file)
+    """
+    
+    TELEMETRY.update(workflow=name, path=path)
+
+
+def call_timings(result, model=None):
+    """
+    Read the timings Ollama reports with each response (nanoseconds) as seconds.
+    
+    Without streaming, the first token arrives once the model is loaded and the prompt is read,
+    so load + prompt time is the time to first token.
+    
+    Parameters:
+    -----------
+    result : dict
+        The JSON response from Ollama
+    model : str, optional
+        Model name to use if the response doesn't include one
+    
+    Returns:
+    --------
+    dict
+        load_seconds (loading the model into memory), prompt_seconds (reading the prompt),
+        eval_seconds (writing the answer), total_seconds, token counts, time to first token,
+        tokens per second, and the estimated OpenAI cost
+    """
+    
+    seconds = lambda key: round(result.get(key, 0) / 1e9, 3)
+    row = {
+        "model": result.get("model", model),
+        "load_seconds": seconds("load_duration"),
+        "prompt_seconds": seconds("prompt_eval_duration"),
+        "eval_seconds": seconds("eval_duration"),
+        "total_seconds": seconds("total_duration"),
+        "prompt_tokens": result.get("prompt_eval_count", 0),
+        "output_tokens": result.get("eval_count", 0)
+    }
+    row["ttft_seconds"] = round(row["load_seconds"] + row["prompt_seconds"], 3)
+    row["tokens_per_second"] = round(row["output_tokens"] / row["eval_seconds"], 1) if row["eval_seconds"] else None
+    row["openai_cost_usd"] = round((row["prompt_tokens"] * OPENAI_PRICE[0] + row["output_tokens"] * OPENAI_PRICE[1]) / 1e6, 6)
+    return row
+
+
+def record_timings(result, model=None, agent=None, wall_seconds=None):
+    """
+    Save the timings of one model call to MODEL_TIMINGS, and to the JSONL file if start_workflow() set one.
+    
+    Parameters:
+    -----------
+    result : dict
+        The JSON response from Ollama
+    model : str, optional
+        Model name to use if the response doesn't include one
+    agent : str, optional
+        Which agent made the call (e.g. the start of its role)
+    wall_seconds : float, optional
+        Time the call took as measured by the caller, including network time
+    
+    Returns:
+    --------
+    dict
+        The recorded timings
+    """
+    
+    row = {"time": datetime.now().isoformat(timespec="seconds"), "workflow": TELEMETRY["workflow"],
+           "agent": agent, **call_timings(result, model),
+           "wall_seconds": None if wall_seconds is None else round(wall_seconds, 3)}
+    MODEL_TIMINGS.append(row)
+    if TELEMETRY["path"]:
+        # Several agents may finish at once, so write one whole line at a time
+        with TELEMETRY_LOCK, open(TELEMETRY["path"], "a") as f:
+            f.write(json.dumps(row) + "\n")
+    return row
+
+
+def timing_report(records=None, by="model"):
+    """
+    Summarize the recorded model calls: how much time went to loading vs. answering,
+    and which agent or model dominates latency.
+    
+    Parameters:
+    -----------
+    records : pandas.DataFrame or list, optional
+        Recorded timings, e.g. read from a JSONL file (default: MODEL_TIMINGS)
+    by : str or list
+        Column(s) to group by, e.g. "model", "agent", or ["workflow", "agent"] (default: "model")
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per group, slowest first: number of calls, tokens, total load, prompt, eval, and overall seconds,
+        mean time to first token, tokens per second, share of total time, and estimated OpenAI cost
+    """
+    
+    timings = pd.DataFrame(list(MODEL_TIMINGS) if records is None else records)
+    if timings.empty:
+        return timings
+    report = (timings
+              .groupby(by, as_index=False, dropna=False)
+              .agg(calls=("total_seconds", "size"),
+                   prompt_tokens=("prompt_tokens", "sum"),
+                   output_tokens=("output_tokens", "sum"),
+                   load_seconds=("load_seconds", "sum"),
+                   prompt_seconds=("prompt_seconds", "sum"),
+                   eval_seconds=("eval_seconds", "sum"),
+                   total_seconds=("total_seconds", "sum"),
+                   ttft_seconds=("ttft_seconds", "mean"),
+                   openai_cost_usd=("openai_cost_usd", "sum")))
+    report["tokens_per_second"] = report["output_tokens"] / report["eval_seconds"].where(report["eval_seconds"] > 0)
+    report["share_of_time"] = report["total_seconds"] / report["total_seconds"].sum()
+    # Costs are fractions of a cent, so they keep more decimal places
+    report = report.round({column: 3 for column in report.columns if column != "openai_cost_usd"})
+    return report.sort_values("total_seconds", ascending=False).reset_index(drop=True)
+
+
+# 7. MAP-REDUCE SUMMARIES ###################################
+
+# A large table can be longer than a small model's context window, and one long prompt
+# takes longer the more rows it has. agent_map_reduce() instead splits the table into
+# row chunks, has the agent summarize each chunk at the same time (map), then combines
+# those partial answers into one (reduce). Ollama answers several requests at once
+# (see the OLLAMA_NUM_PARALLEL setting), so wall time grows with the number of rounds,
+# not the number of rows.
+
+# Token budgets: the most tokens of table text per chunk, and the most tokens per answer
+CHUNK_TOKENS = 1500
+ANSWER_TOKENS = 400
+
+MAP_INSTRUCTIONS = ("You are given one part of a larger table. Answer using only the rows in this part, "
+                    "keeping names, dates and counts exact, in at most {words} words.")
+REDUCE_INSTRUCTIONS = ("You are given partial answers, each written from one part of a larger table. "
+                       "Combine them into one answer, without repeating items, in at most {words} words.")
+
+def df_chunks(df, chunk_tokens=CHUNK_TOKENS, **options):
+    """
+    Split a DataFrame into row chunks whose text stays within a token budget.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame to split
+    chunk_tokens : int
+        Most estimated tokens of text per chunk (default: CHUNK_TOKENS)
+    **options
+        Any other df_as_text() options (e.g. columns, format)
+    
+    Returns:
+    --------
+    list
+        DataFrames, one per chunk, in row order
+    """
+    
+    # Estimate tokens per row from the whole table, then size the chunks to fit the budget
+    tokens_per_row = max(estimate_tokens(df_as_text(df, **options)) / max(len(df), 1), 1)
+    rows_per_chunk = max(int(chunk_tokens // tokens_per_row), 1)
+    return [df.iloc[start:start + rows_per_chunk] for start in range(0, len(df), rows_per_chunk)]
+
+
+def agent_map_reduce(df, role, task="", model=DEFAULT_MODEL, chunk_tokens=CHUNK_TOKENS,
+                     answer_tokens=ANSWER_TOKENS, max_workers=4, keep_alive=KEEP_ALIVE,
+                     label="map_reduce", **options):
+    """
+    Run an agent over a large DataFrame by summarizing row chunks at the same time, then combining them.
+    
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The data for the agent
+    role : str
+        The system prompt defining the agent's role
+    task : str
+        Extra instructions sent with every chunk (default: "")
+    model : str
+        Model to use (default: DEFAULT_MODEL)
+    chunk_tokens : int
+        Most estimated tokens of table text (or partial answers) per call (default: CHUNK_TOKENS)
+    answer_tokens : int
+        Most tokens in each partial answer and in the final answer (default: ANSWER_TOKENS)
+    max_workers : int
+        Most calls sent to Ollama at the same time (default: 4)
+    keep_alive : str or int
+        How long Ollama keeps the model loaded after each call (default: KEEP_ALIVE)
+    label : str
+        Name for these calls in the recorded timings; map and reduce calls get ":map" and ":reduce" (default: "map_reduce")
+    **options
+        Any other df_as_text() options (e.g. columns, format)
+    
+    Returns:
+    --------
+    str
+        The agent's combined answer
+    """
+    
+    limits = {"num_predict": answer_tokens}
+    words = answer_tokens * 3 // 4  # about 0.75 words per token
+    
+    # A table that fits in one chunk needs only one call
+    chunks = df_chunks(df, chunk_tokens=chunk_tokens, **options)
+    if len(chunks) <= 1:
+        text = df_as_text(df, **options)
+        return agent_run(role=role, task=f"{task}\n\n{text}".strip(), model=model,
+                         keep_alive=keep_alive, label=label, options=limits)
+    
+    # The role and instructions stay the same for every chunk, so Ollama can reuse that prompt prefix
+    map_role = f"{role}\n\n{MAP_INSTRUCTIONS.format(words=words)}"
+    reduce_role = f"{role}\n\n{REDUCE_INSTRUCTIONS.format(words=words)}"
+    
+    def map_chunk(numbered):
+        number, chunk = numbered
+        text = f"{task}\n\nPart {number} of {len(chunks)}:\n{df_as_text(chunk, **options)}".strip()
+        return agent_run(role=map_role, task=text, model=model, keep_alive=keep_alive,
+                         label=f"{label}:map", options=limits)
+    
+    def reduce_group(group):
+        text = "\n\n".join(f"Partial answer {number}:\n{answer}" for number, answer in enumerate(group, start=1))
+        return agent_run(role=reduce_role, task=f"{task}\n\n{text}".strip(), model=model,
+                         keep_alive=keep_alive, label=f"{label}:reduce", options=limits)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Map: one partial answer per chunk, all at the same time
+        answers = list(pool.map(map_chunk, enumerate(chunks, start=1)))
+        
+        # Reduce: combine as many partial answers per call as fit the budget, and repeat until one is left
+        per_call = max(chunk_tokens // answer_tokens, 2)
+        while len(answers) > 1:
+            groups = [answers[start:start + per_call] for start in range(0, len(answers), per_call)]
+            answers = list(pool.map(reduce_group, groups))
+    
+    return answers[0]
+
+
+# 8. ANALYSIS TOOLS ###################################
+
+# Small models are slow and often wrong when asked to count, sort or compare rows of a raw table.
+# These tools do that arithmetic in pandas and return short tables, so the model only has to
+# choose a tool and then write about the result. Each tool fetches its category with get_shortages(),
+# whose responses are cached, so several tools on the same category download the data once.
+
+# Columns the analysis tools report on
+ANALYSIS_FIELDS = ["generic_name", "update_type", "update_date", "availability"]
+
+def shortage_data(category):
+    """
+    Get every current shortage record for a category, for the analysis tools.
+    
+    Parameters:
+    -----------
+    category : str
+        The therapeutic category of the drug (one of SHORTAGE_CATEGORIES)
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Shortage records, with the ANALYSIS_FIELDS columns
+    """
+    
+    if category not in SHORTAGE_CATEGORIES:
+        raise ValueError(f"Invalid category '{category}'. Options are: {', '.join(SHORTAGE_CATEGORIES)}.")
+    return get_shortages(category=category, limit=None)[ANALYSIS_FIELDS]
+
+
+def shortage_counts(category="Psychiatry", by="availability"):
+    """
+    Count the drugs in shortage for a category, grouped by their latest availability or update type.
+    
+    Parameters:
+    -----------
+    category : str
+        The therapeutic category of the drug, e.g. "Psychiatry"
+    by : str
+        What to count by: "availability" or "update_type"
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per value, with the number of drugs, largest first
+    """
+    
+    if by not in ("availability", "update_type"):
+        raise ValueError("Invalid by. Use 'availability' or 'update_type'.")
+    latest = latest_by_group(shortage_data(category))
+    return count_by(latest, by).rename(columns={"n": "drugs"})
+
+
+def latest_shortage_status(category="Psychiatry", availability="Unavailable", n=50):
+    """
+    List each drug's latest shortage update for a category, newest first.
+    
+    Parameters:
+    -----------
+    category : str
+        The therapeutic category of the drug, e.g. "Psychiatry"
+    availability : str
+        Keep drugs whose latest availability is this, e.g. "Unavailable" or "Limited Availability"; "all" keeps every drug
+    n : int
+        The most drugs to list
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per drug: generic_name, update_type, update_date, availability
+    """
+    
+    latest = latest_by_group(shortage_data(category))
+    if availability != "all":
+        latest = latest[latest["availability"] == availability]
+    return (latest
+            .sort_values("update_date", ascending=False, kind="stable")
+            .head(n)
+            .reset_index(drop=True))
+
+
+def shortage_trend(category="Psychiatry", period="month", periods=12):
+    """
+    Count shortage updates per time period for a category, with one column per update type.
+    
+    Parameters:
+    -----------
+    category : str
+        The therapeutic category of the drug, e.g. "Psychiatry"
+    period : str
+        Length of each period: "week", "month", "quarter" or "year"
+    periods : int
+        How many of the most recent periods to show
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per period, oldest first, with the number of updates of each type
+    """
+    
+    return (trend_by_period(shortage_data(category), period=period, by="update_type")
+            .tail(periods)
+            .reset_index(drop=True))
+
+
+def top_shortages(category="Psychiatry", n=10):
+    """
+    Find the drugs with the most shortage updates for a category, with their latest availability.
+    
+    Parameters:
+    -----------
+    category : str
+        The therapeutic category of the drug, e.g. "Psychiatry"
+    n : int
+        How many drugs to list
+    
+    Returns:
+    --------
+    pandas.DataFrame
+        Up to n drugs, most updates first: generic_name, updates, first_update, last_update, availability
+    """
+    
+    data = shortage_data(category)
+    latest = latest_by_group(data)[["generic_name", "availability"]]
+    return (top_n(data, group="generic_name", n=n)
+            .rename(columns={"records": "updates", "first_date": "first_update", "last_date": "last_update"})
+            .merge(latest, on="generic_name", how="left"))
+
+
+# Register the analysis tools; pass ANALYSIS_TOOLS as an agent's tools to offer all of them
+ANALYSIS_TOOLS = [register_tool(tool) for tool in
+                  (shortage_counts, latest_shortage_status, shortage_trend, top_shortages)]
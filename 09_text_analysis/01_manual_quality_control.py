@@ -16,19 +16,22 @@
 import pandas as pd  # for data wrangling
 import re  # for string pattern matching and text analysis
 
+# Load helper functions for quality control (see functions.py)
+from functions import read_reports, check_report, check_reports_parallel, REQUIRED_CONCEPTS
+
 ## 0.2 Load Sample Text #################################
 
-# Load sample AI-generated report text
+# Path to sample AI-generated report text
 # This text should be checked for quality and accuracy
-with open("09_text_analysis/data/sample_reports.txt", "r", encoding="utf-8") as f:
-    sample_text = f.read()
+REPORTS_PATH = "09_text_analysis/data/sample_reports.txt"
 
-# Split text into individual reports (reports are separated by blank lines)
-# Remove empty strings and trim whitespace
-reports = [r.strip() for r in sample_text.split("\n\n") if r.strip()]
+# Stream individual reports from the file (reports are separated by blank lines).
+# read_reports() is a generator: it reads one report at a time instead of the whole file,
+# so memory use stays small even for gigabyte-sized (or .gz compressed) report archives.
+reports = read_reports(REPORTS_PATH)
 
 # Select the first report for quality control
-report = reports[0]
+report = next(reports)
 
 print("📝 Sample Report for Quality Control:")
 print("---")
@@ -39,9 +42,11 @@ print("---\n")
 
 ## 1.1 Count Concepts and Keywords #################################
 
-# Define concepts/keywords to search for in the text
-# These might be required terms, important topics, or quality control criteria
-required_concepts = ["emissions", "county", "year", "pollutant", "recommendations", "data"]
+# Concepts/keywords to search for in the text
+# These might be required terms, important topics, or quality control criteria.
+# REQUIRED_CONCEPTS is defined in functions.py, so check_report() (section 1.5) uses the same list;
+# edit it there to change which concepts are counted.
+required_concepts = REQUIRED_CONCEPTS
 
 # Count occurrences of each concept (case-insensitive)
 concept_counts = []
@@ -166,55 +171,39 @@ print()
 
 ## 1.5 Quality Control Multiple Reports #################################
 
-# If you have multiple reports, you can check them all at once
-if len(reports) > 1:
-    print("🔄 Performing Quality Control on Multiple Reports...\n")
-    
-    # Create a function to check a single report
-    def check_report(text, report_id):
-        # Count concepts
-        concept_present = [
-            len(re.findall(re.escape(term), text, re.IGNORECASE)) > 0
-            for term in required_concepts
-        ]
-        
-        # Calculate metrics
-        words = text.split()
-        word_count = len(words)
-        sentence_count = len(re.findall(r"[.!?]+", text))
-        avg_words = word_count / max(sentence_count, 1)
-        
-        # Check patterns
-        has_numbers = bool(re.search(r"\d+", text))
-        has_percentages = bool(re.search(r"\d+%", text))
-        has_recommendations = bool(re.search(r"recommend|suggest|should|must", text, re.IGNORECASE))
-        has_contractions = bool(re.search(r"'t|'s|'d|'ll|'ve|'re|'m", text, re.IGNORECASE))
-        has_hyperbole = bool(re.search(r"crucial|critical|extremely|absolutely", text, re.IGNORECASE))
-        has_belittling = bool(re.search(r"it is clear that|obviously|as you can see", text, re.IGNORECASE))
-        
-        # Return as a DataFrame row
-        return pd.DataFrame({
-            "report_id": [report_id],
-            "word_count": [word_count],
-            "sentence_count": [sentence_count],
-            "avg_words_per_sentence": [round(avg_words, 2)],
-            "has_numbers": [has_numbers],
-            "has_percentages": [has_percentages],
-            "has_recommendations": [has_recommendations],
-            "has_contractions": [has_contractions],
-            "has_hyperbole": [has_hyperbole],
-            "has_belittling": [has_belittling],
-            "concept_coverage": [sum(concept_present) / len(concept_present)]
-        })
-    
-    # Check all reports
-    all_results = pd.concat([
-        check_report(reports[i], i + 1)
-        for i in range(len(reports))
-    ], ignore_index=True)
+# If you have multiple reports, you can check them all at once.
+# check_report() lives in functions.py, so that it can also be used by worker processes (see 1.6).
+print("🔄 Performing Quality Control on Multiple Reports...\n")
+
+# Check all reports, streaming them from the file one at a time
+# check_report() returns one dictionary per report, and we build a single DataFrame from all of them
+all_results = pd.DataFrame([
+    check_report(text, i)
+    for i, text in enumerate(read_reports(REPORTS_PATH), start=1)
+])
+
+print("📊 Quality Control Results for All Reports:")
+print(all_results)
+print()
+
+## 1.6 Parallel Quality Control for Large Corpora #################################
+
+# Regex checks are CPU-bound, so one Python process only uses one core.
+# For very large corpora (e.g. millions of generated paragraphs), check_reports_parallel()
+# streams reports from disk in chunks, scores each chunk in a separate worker process,
+# and merges the results back together in file order.
+# It accepts a .txt file (reports separated by blank lines) or a .csv file with a report_text column.
+
+# Worker processes re-import this script on Windows and macOS,
+# so parallel code must sit inside an `if __name__ == "__main__":` block.
+if __name__ == "__main__":
+    parallel_results = check_reports_parallel(
+        "09_text_analysis/data/prompt_comparison_reports.csv",
+        chunk_size=25  # use larger chunks (e.g. 1000+) for large files
+    )
     
-    print("📊 Quality Control Results for All Reports:")
-    print(all_results)
+    print(f"⚡ Parallel Quality Control Results ({len(parallel_results)} reports):")
+    print(parallel_results.head())
     print()
 
 print("✅ Manual quality control complete!")
@@ -12,15 +12,23 @@
 ## 0.1 Load Packages #################################
 
 # If you haven't already, install required packages:
-# pip install pandas requests python-dotenv
+# pip install pandas requests numpy python-dotenv
 
 import pandas as pd  # for data wrangling
-import re  # for text processing
-import requests  # for HTTP requests
-import json  # for JSON operations
 import os  # for environment variables
+import sys  # for finding the shared LLM client
+from pathlib import Path  # for file paths
+from itertools import islice  # for taking a few reports at a time
 from dotenv import load_dotenv  # for loading .env file
 
+# Load helper functions for reading reports and parsing AI output (see functions.py)
+from functions import (read_reports, decode_json_object, validate_quality_control,
+                       new_quality_control_buffers, append_quality_control, quality_control_frame)
+
+# Load the provider-agnostic LLM client (see 03_query_ai/llm_client.py)
+sys.path.append(str(Path(__file__).resolve().parents[1] / "03_query_ai"))
+from llm_client import LLMClient, ollama_provider, openai_provider
+
 ## 0.2 Configuration #################################
 
 # Choose your AI provider: "ollama" or "openai"
@@ -36,15 +44,19 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = "gpt-4o-mini"  # Low-cost model
 
+# Let a failed or slow request go to the other provider as well (default: False).
+# With AI_PROVIDER = "ollama", leaving this off means report text never leaves your machine
+# and no paid OpenAI calls are made, even if OPENAI_API_KEY is set.
+ALLOW_FALLBACK = False
+
 ## 0.3 Load Sample Data #################################
 
-# Load sample report text for quality control
-with open("09_text_analysis/data/sample_reports.txt", "r", encoding="utf-8") as f:
-    sample_text = f.read()
+# Path to sample report text for quality control
+REPORTS_PATH = "09_text_analysis/data/sample_reports.txt"
 
-# Split text into individual reports
-reports = [r.strip() for r in sample_text.split("\n\n") if r.strip()]
-report = reports[0]
+# Stream individual reports from the file, one at a time
+# read_reports() is a generator, so the whole file never sits in memory at once
+report = next(read_reports(REPORTS_PATH))
 
 # Load source data (if available) for accuracy checking
 # In this example, we'll use a simple data structure
@@ -66,21 +78,9 @@ print("---\n")
 
 ## 1.1 Create Quality Control Prompt #################################
 
-# Create a comprehensive quality control prompt based on samplevalidation.tex
-# This prompt asks the AI to evaluate text on multiple criteria
-def create_quality_control_prompt(report_text, source_data=None):
-    # Base instructions for quality control
-    instructions = "You are a quality control validator for AI-generated reports. Evaluate the following report text on multiple criteria and return your assessment as valid JSON."
-    
-    # Add source data if provided for accuracy checking
-    data_context = ""
-    if source_data is not None:
-        data_context = f"\n\nSource Data:\n{source_data}\n"
-    
-    # Quality control criteria (from samplevalidation.tex)
-    criteria = """
-  
-Quality Control Criteria:
+# Quality control criteria (from samplevalidation.tex)
+# These are shared by the single-report prompt (1.1) and the batched prompt (4.1)
+QUALITY_CONTROL_CRITERIA = """Quality Control Criteria:
 
 1. **accurate** (boolean): Verify that no part of the paragraph misinterprets the data supplied. Return TRUE if no misinterpretation. FALSE if any problems.
 
@@ -95,9 +95,25 @@ Quality Control Criteria:
 6. **succinctness** (1-5 Likert scale): Rank the paragraph on a 5-point Likert scale, where 1 = unnecessarily wordy vs. 5 = succinct.
 
 7. **relevance** (1-5 Likert scale): Rank the paragraph on a 5-point Likert scale, where 1 = irrelevant commentary vs. 5 = relevant commentary about the data.
+"""
 
+# Create a comprehensive quality control prompt based on samplevalidation.tex
+# This prompt asks the AI to evaluate text on multiple criteria
+def create_quality_control_prompt(report_text, source_data=None):
+    # Base instructions for quality control
+    instructions = "You are a quality control validator for AI-generated reports. Evaluate the following report text on multiple criteria and return your assessment as valid JSON."
+    
+    # Add source data if provided for accuracy checking
+    data_context = ""
+    if source_data is not None:
+        data_context = f"\n\nSource Data:\n{source_data}\n"
+    
+    # Quality control criteria, plus the JSON format we expect back
+    criteria = f"""
+  
+{QUALITY_CONTROL_CRITERIA}
 Return your response as valid JSON in this exact format:
-{
+{{
   "accurate": true/false,
   "accuracy": 1-5,
   "formality": 1-5,
@@ -106,7 +122,7 @@ Return your response as valid JSON in this exact format:
   "succinctness": 1-5,
   "relevance": 1-5,
   "details": "0-50 word explanation of your assessment"
-}
+}}
 """
     
     # Combine into full prompt
@@ -117,92 +133,52 @@ Return your response as valid JSON in this exact format:
 ## 1.2 Query AI Function #################################
 
 # Function to query AI and get quality control results
+# Both providers go through one client (03_query_ai/llm_client.py): the chosen provider is asked first.
+# The other provider is the fallback only if ALLOW_FALLBACK is True; the client then also
+# sends a second (hedge) request to it when the first one is slower than usual.
+QC_PROVIDERS = {
+    "ollama": ollama_provider(OLLAMA_MODEL, host=OLLAMA_HOST),
+    "openai": openai_provider(OPENAI_MODEL, api_key=OPENAI_API_KEY)
+}
+QC_CLIENTS = {
+    "ollama": LLMClient([QC_PROVIDERS["ollama"], QC_PROVIDERS["openai"]],
+                        allow_fallback_to=[QC_PROVIDERS["openai"]] if ALLOW_FALLBACK else None),
+    "openai": LLMClient([QC_PROVIDERS["openai"], QC_PROVIDERS["ollama"]],
+                        allow_fallback_to=[QC_PROVIDERS["ollama"]] if ALLOW_FALLBACK else None)
+}
+
 def query_ai_quality_control(prompt, provider=AI_PROVIDER):
-    if provider == "ollama":
-        # Query Ollama
-        url = f"{OLLAMA_HOST}/api/chat"
-        
-        body = {
-            "model": OLLAMA_MODEL,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "format": "json",  # Request JSON output
-            "stream": False
-        }
-        
-        response = requests.post(url, json=body)
-        response.raise_for_status()
-        response_data = response.json()
-        output = response_data["message"]["content"]
-        
-    elif provider == "openai":
-        # Query OpenAI
-        if not OPENAI_API_KEY:
-            raise ValueError("OPENAI_API_KEY not found in .env file. Please set it up first.")
-        
-        url = "https://api.openai.com/v1/chat/completions"
-        
-        body = {
-            "model": OPENAI_MODEL,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are a quality control validator. Always return your responses as valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "response_format": {"type": "json_object"},  # Request JSON output
-            "temperature": 0.3  # Lower temperature for more consistent validation
-        }
-        
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.post(url, headers=headers, json=body)
-        response.raise_for_status()
-        response_data = response.json()
-        output = response_data["choices"][0]["message"]["content"]
-        
-    else:
+    if provider not in QC_CLIENTS:
         raise ValueError("Invalid provider. Use 'ollama' or 'openai'.")
     
+    messages = [
+        {
+            "role": "system",
+            "content": "You are a quality control validator. Always return your responses as valid JSON."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+    
+    # Request JSON output, with a lower temperature for more consistent validation
+    output = QC_CLIENTS[provider].chat(messages, json_output=True, temperature=0.3)
+    
     return output
 
 ## 1.3 Parse Quality Control Results #################################
 
+# Parse JSON response and check it against the expected schema
+# decode_json_object() uses a fast JSON decoder and copes with extra text around the JSON;
+# validate_quality_control() checks every field's type and range (see QC_SCHEMA in functions.py)
+# and raises a QualityControlError naming the bad field if something is wrong.
+def parse_quality_control_row(json_response):
+    return validate_quality_control(decode_json_object(json_response))
+
 # Parse JSON response and convert to DataFrame
 def parse_quality_control_results(json_response):
-    # Try to parse JSON
-    # Sometimes AI returns text with JSON, so we extract JSON if needed
-    json_match = re.search(r"\{.*\}", json_response, re.DOTALL)
-    if json_match:
-        json_response = json_match.group(0)
-    
-    # Parse JSON
-    quality_data = json.loads(json_response)
-    
-    # Convert to DataFrame
-    results = pd.DataFrame({
-        "accurate": [quality_data["accurate"]],
-        "accuracy": [quality_data["accuracy"]],
-        "formality": [quality_data["formality"]],
-        "faithfulness": [quality_data["faithfulness"]],
-        "clarity": [quality_data["clarity"]],
-        "succinctness": [quality_data["succinctness"]],
-        "relevance": [quality_data["relevance"]],
-        "details": [quality_data["details"]]
-    })
-    
-    return results
+    return pd.DataFrame([parse_quality_control_row(json_response)])
 
 # 2. Run Quality Control #################################
 
@@ -244,13 +220,15 @@ print(f"📊 Accuracy Check: {'✅ PASS' if quality_results['accurate'].values[0
 ## 3.1 Batch Quality Control Function #################################
 
 # Function to check multiple reports
+# reports can be a list or a stream of reports (e.g. read_reports(REPORTS_PATH))
 def check_multiple_reports(reports, source_data=None):
-    print(f"🔄 Performing quality control on {len(reports)} reports...\n")
+    print("🔄 Performing quality control on multiple reports...\n")
     
-    all_results = []
+    # Collect results into column buffers, and build one DataFrame at the end
+    buffers = new_quality_control_buffers(extra_columns=["report_id"])
     
     for i, report_text in enumerate(reports, 1):
-        print(f"Checking report {i} of {len(reports)}...")
+        print(f"Checking report {i}...")
         
         # Create prompt
         prompt = create_quality_control_prompt(report_text, source_data)
@@ -258,9 +236,8 @@ def check_multiple_reports(reports, source_data=None):
         # Query AI
         try:
             response = query_ai_quality_control(prompt, provider=AI_PROVIDER)
-            results = parse_quality_control_results(response)
-            results["report_id"] = i
-            all_results.append(results)
+            row = parse_quality_control_row(response)
+            append_quality_control(buffers, row, report_id=i)
         except Exception as e:
             print(f"❌ Error checking report {i}: {e}")
         
@@ -269,19 +246,138 @@ def check_multiple_reports(reports, source_data=None):
         time.sleep(1)
     
     # Combine all results
-    if all_results:
-        combined_results = pd.concat(all_results, ignore_index=True)
-        return combined_results
-    else:
-        return pd.DataFrame()
+    return quality_control_frame(buffers)
 
 ## 3.2 Run Batch Quality Control (Optional) #################################
 
 # Uncomment to check all reports
-# if len(reports) > 1:
-#     batch_results = check_multiple_reports(reports, source_data)
-#     print("\n📊 Batch Quality Control Results:")
-#     print(batch_results)
+# batch_results = check_multiple_reports(read_reports(REPORTS_PATH), source_data)
+# print("\n📊 Batch Quality Control Results:")
+# print(batch_results)
+
+# 4. Batched Quality Control #################################
+
+# Each single-report prompt repeats the same instructions, criteria, and source data.
+# When checking many reports against the same source data, we can pack several reports
+# into one request instead. The AI returns an array of scores, one per report.
+# This sends far fewer prompt tokens and far fewer requests.
+
+## 4.1 Create Batched Quality Control Prompt #################################
+
+# Create one prompt that asks the AI to score several reports at once
+# report_texts is a list of report strings; reports are numbered 1, 2, 3, ... in the prompt
+def create_batch_quality_control_prompt(report_texts, source_data=None):
+    # Base instructions, written once for the whole batch
+    instructions = f"You are a quality control validator for AI-generated reports. Evaluate each of the {len(report_texts)} reports below separately on multiple criteria and return your assessment as valid JSON."
+    
+    # Add source data once, if provided for accuracy checking
+    data_context = ""
+    if source_data is not None:
+        data_context = f"\n\nSource Data:\n{source_data}\n"
+    
+    # Number each report so the AI can tell us which score belongs to which report
+    numbered_reports = "\n\n".join(
+        f"[Report {i}]\n{text}" for i, text in enumerate(report_texts, 1)
+    )
+    
+    # Criteria (written once), plus the JSON format we expect back
+    criteria = f"""
+  
+{QUALITY_CONTROL_CRITERIA}
+Return your response as valid JSON in this exact format, with exactly one entry per report, in report order:
+{{
+  "results": [
+    {{
+      "report_id": 1,
+      "accurate": true/false,
+      "accuracy": 1-5,
+      "formality": 1-5,
+      "faithfulness": 1-5,
+      "clarity": 1-5,
+      "succinctness": 1-5,
+      "relevance": 1-5,
+      "details": "0-50 word explanation of your assessment"
+    }}
+  ]
+}}
+"""
+    
+    # Combine into full prompt
+    full_prompt = f"{instructions}{data_context}\n\nReports to Validate:\n{numbered_reports}{criteria}"
+    
+    return full_prompt
+
+## 4.2 Parse and Validate Batched Results #################################
+
+# Parse a batched JSON response into a list of validated results, one per report
+# Raises a QualityControlError (a kind of ValueError) if the batch is malformed
+# (wrong number of results, missing fields, out-of-range scores, etc.)
+def parse_batch_quality_control_results(json_response, n_reports):
+    # Decode the JSON object
+    batch_data = decode_json_object(json_response)
+    
+    # The response must hold a "results" list with one entry per report
+    results = batch_data.get("results") if isinstance(batch_data, dict) else None
+    if not isinstance(results, list) or len(results) != n_reports:
+        raise ValueError(f"Expected a 'results' list of {n_reports} score objects.")
+    
+    # Each entry must match the schema, and report ids must be 1, 2, ..., n_reports
+    rows = []
+    for i, item in enumerate(results, 1):
+        row = validate_quality_control(item)
+        if item.get("report_id", i) != i:
+            raise ValueError(f"Result {i} has report_id {item.get('report_id')}; results are out of order.")
+        rows.append(row)
+    
+    return rows
+
+## 4.3 Batched Quality Control Function #################################
+
+# Function to check many reports, batch_size reports per request
+# If a batch comes back malformed, we fall back to checking those reports one at a time.
+# reports can be a list or a stream of reports (e.g. read_reports(REPORTS_PATH))
+def check_reports_batched(reports, source_data=None, batch_size=5):
+    # Collect results into column buffers, and build one DataFrame at the end
+    buffers = new_quality_control_buffers(extra_columns=["report_id"])
+    reports = iter(reports)
+    first_id = 1
+    
+    while True:
+        batch = list(islice(reports, batch_size))
+        if not batch:
+            break
+        report_ids = list(range(first_id, first_id + len(batch)))
+        first_id += len(batch)
+        print(f"Checking reports {report_ids[0]}-{report_ids[-1]} in one batch...")
+        
+        try:
+            # One request for the whole batch
+            prompt = create_batch_quality_control_prompt(batch, source_data)
+            response = query_ai_quality_control(prompt, provider=AI_PROVIDER)
+            rows = parse_batch_quality_control_results(response, len(batch))
+            for report_id, row in zip(report_ids, rows):
+                append_quality_control(buffers, row, report_id=report_id)
+        except (ValueError, KeyError, RuntimeError) as e:
+            # Malformed batch (or every provider failed): fall back to one request per report
+            print(f"⚠️ Batch failed ({e}); checking these reports one at a time...")
+            for report_id, report_text in zip(report_ids, batch):
+                try:
+                    prompt = create_quality_control_prompt(report_text, source_data)
+                    response = query_ai_quality_control(prompt, provider=AI_PROVIDER)
+                    row = parse_quality_control_row(response)
+                    append_quality_control(buffers, row, report_id=report_id)
+                except Exception as e:
+                    print(f"❌ Error checking report {report_id}: {e}")
+    
+    # Combine all results
+    return quality_control_frame(buffers)
+
+## 4.4 Run Batched Quality Control (Optional) #################################
+
+# Uncomment to check all reports, 5 reports per request
+# batched_results = check_reports_batched(read_reports(REPORTS_PATH), source_data, batch_size=5)
+# print("\n📊 Batched Quality Control Results:")
+# print(batched_results)
 
 print("✅ AI quality control complete!")
 print("💡 Compare these results with manual quality control (01_manual_quality_control.py) to see how AI performs.")
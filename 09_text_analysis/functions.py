@@ -0,0 +1,406 @@
+# functions.py
+# Text Quality Control Helper Functions
+# Pairs with 01_manual_quality_control.py
+# Tim Fraser
+
+# This script contains functions used for manual (regex-based) quality control in Python.
+# They live in their own module so that worker processes can import them,
+# which lets us spread quality control for large report corpora across every CPU core.
+
+# 0. SETUP ###################################
+
+## 0.1 Load Packages #################################
+
+import re  # for string pattern matching
+import os  # for counting CPU cores
+import json  # for parsing JSON (fallback decoder)
+import gzip  # for reading .gz files
+import bz2  # for reading .bz2 files
+import lzma  # for reading .xz files
+from itertools import islice  # for taking a few reports at a time from a stream
+from pathlib import Path  # for file extensions
+from collections import deque  # for a bounded queue of pending chunks
+from concurrent.futures import ProcessPoolExecutor  # for running chunks in parallel
+import pandas as pd  # for data wrangling
+
+# Use the fast orjson decoder when it is installed; otherwise fall back to the built-in json module.
+try:
+    import orjson  # for fast JSON parsing
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# If you haven't already, install these packages...
+# pip install pandas orjson
+
+## 0.2 Configuration #################################
+
+# Concepts/keywords every report should mention
+REQUIRED_CONCEPTS = ["emissions", "county", "year", "pollutant", "recommendations", "data"]
+
+# Compile each pattern once, instead of once per report.
+# On millions of reports, re-compiling (or re-looking up) patterns adds up.
+CONCEPT_PATTERNS = [re.compile(re.escape(c), re.IGNORECASE) for c in REQUIRED_CONCEPTS]
+NUMBER_PATTERN = re.compile(r"\d+")
+PERCENT_PATTERN = re.compile(r"\d+%")
+SENTENCE_PATTERN = re.compile(r"[.!?]+")
+RECOMMEND_PATTERN = re.compile(r"recommend|suggest|should|must", re.IGNORECASE)
+CONTRACTION_PATTERN = re.compile(r"'t|'s|'d|'ll|'ve|'re|'m", re.IGNORECASE)
+HYPERBOLE_PATTERN = re.compile(r"crucial|critical|extremely|absolutely", re.IGNORECASE)
+BELITTLING_PATTERN = re.compile(r"it is clear that|obviously|as you can see", re.IGNORECASE)
+
+# Column order for quality control results
+QC_COLUMNS = [
+    "report_id", "word_count", "sentence_count", "avg_words_per_sentence",
+    "has_numbers", "has_percentages", "has_recommendations",
+    "has_contractions", "has_hyperbole", "has_belittling", "concept_coverage"
+]
+
+# 1. SINGLE REPORT QUALITY CONTROL ###################################
+
+def check_report(text, report_id):
+    """
+    Run regex-based quality control checks on a single report.
+
+    Parameters:
+    -----------
+    text : str
+        The report text to check
+    report_id : int
+        An identifier for the report
+
+    Returns:
+    --------
+    dict
+        One row of quality control results (see QC_COLUMNS)
+    """
+
+    # Count concepts
+    concept_present = [bool(p.search(text)) for p in CONCEPT_PATTERNS]
+
+    # Calculate metrics
+    word_count = len(text.split())
+    sentence_count = len(SENTENCE_PATTERN.findall(text))
+    avg_words = word_count / max(sentence_count, 1)
+
+    # Return as a dictionary, so many rows can be combined into one DataFrame later
+    return {
+        "report_id": report_id,
+        "word_count": word_count,
+        "sentence_count": sentence_count,
+        "avg_words_per_sentence": round(avg_words, 2),
+        "has_numbers": bool(NUMBER_PATTERN.search(text)),
+        "has_percentages": bool(PERCENT_PATTERN.search(text)),
+        "has_recommendations": bool(RECOMMEND_PATTERN.search(text)),
+        "has_contractions": bool(CONTRACTION_PATTERN.search(text)),
+        "has_hyperbole": bool(HYPERBOLE_PATTERN.search(text)),
+        "has_belittling": bool(BELITTLING_PATTERN.search(text)),
+        "concept_coverage": sum(concept_present) / len(concept_present)
+    }
+
+
+def check_report_chunk(chunk):
+    """
+    Run quality control on a chunk of reports. This is the unit of work sent to each worker process.
+
+    Parameters:
+    -----------
+    chunk : list
+        List of (report_id, text) tuples
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Quality control results, one row per report, in the same order as the chunk
+    """
+
+    rows = [check_report(text, report_id) for report_id, text in chunk]
+    return pd.DataFrame(rows, columns=QC_COLUMNS)
+
+# 2. STREAM REPORTS FROM DISK ###################################
+
+# Openers for compressed files, by file extension
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+def read_reports(path):
+    """
+    Read reports one at a time from a text file, where reports are separated by blank lines.
+
+    This is a generator: it yields each report as soon as it has been read,
+    so only one report is held in memory at a time, no matter how large the file is.
+    Compressed files (.gz, .bz2, .xz) are decompressed on the fly.
+
+    Parameters:
+    -----------
+    path : str
+        Path to the report file (e.g. "09_text_analysis/data/sample_reports.txt")
+
+    Yields:
+    -------
+    str
+        One report, with surrounding whitespace trimmed
+    """
+
+    # Pick the right opener based on the file extension
+    opener = OPENERS.get(os.path.splitext(path)[1], open)
+
+    # Collect lines until we hit a blank line, then hand back the finished report
+    lines = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                lines.append(line)
+            elif lines:
+                yield "".join(lines).strip()
+                lines = []
+
+    # Don't forget the last report (files may not end with a blank line)
+    if lines:
+        yield "".join(lines).strip()
+
+
+def iter_report_chunks(path, chunk_size=1000, text_column="report_text"):
+    """
+    Read reports from disk a chunk at a time, without loading the whole file.
+
+    Parameters:
+    -----------
+    path : str
+        Path to a .txt file (reports separated by blank lines; may be compressed, see read_reports)
+        or a .csv file (one report per row, e.g. prompt_comparison_reports.csv)
+    chunk_size : int
+        Number of reports per chunk (default: 1000)
+    text_column : str
+        Column holding the report text, for CSV files (default: "report_text")
+
+    Yields:
+    -------
+    list
+        List of (report_id, text) tuples; report ids count up from 1 across the whole file
+    """
+
+    report_id = 0
+
+    # CSV files: let pandas read the file in pieces of chunk_size rows
+    # (pandas also decompresses .csv.gz and similar files automatically)
+    suffixes = Path(path).suffixes
+    if suffixes and suffixes[-1] in OPENERS:
+        suffixes = suffixes[:-1]
+    if suffixes and suffixes[-1].lower() == ".csv":
+        for frame in pd.read_csv(path, usecols=[text_column], chunksize=chunk_size):
+            texts = frame[text_column].fillna("").astype(str).tolist()
+            chunk = [(report_id + i + 1, t.strip()) for i, t in enumerate(texts)]
+            report_id += len(chunk)
+            yield chunk
+        return
+
+    # Text files: take chunk_size reports at a time from the read_reports() stream
+    reports = enumerate(read_reports(path), start=1)
+    while True:
+        chunk = list(islice(reports, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+# 3. PARALLEL QUALITY CONTROL ###################################
+
+def check_reports_parallel(path, chunk_size=1000, max_workers=None, text_column="report_text"):
+    """
+    Run quality control on a large report corpus using every CPU core.
+
+    Reports are streamed from disk in chunks, each chunk is scored in a worker process,
+    and results are merged back together in their original order.
+
+    Parameters:
+    -----------
+    path : str
+        Path to a .txt or .csv file of reports (see iter_report_chunks)
+    chunk_size : int
+        Number of reports per chunk (default: 1000)
+    max_workers : int, optional
+        Number of worker processes (default: number of CPU cores)
+    text_column : str
+        Column holding the report text, for CSV files (default: "report_text")
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Quality control results for every report, in file order
+    """
+
+    max_workers = max_workers or os.cpu_count() or 1
+    chunks = iter_report_chunks(path, chunk_size=chunk_size, text_column=text_column)
+    results = []
+
+    # executor.map() would read every chunk into memory up front,
+    # so we keep at most 2 chunks per worker in flight at any time.
+    # Collecting futures in a queue (first in, first out) keeps results in order.
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(check_report_chunk, chunk))
+            if len(pending) >= max_workers * 2:
+                results.append(pending.popleft().result())
+        while pending:
+            results.append(pending.popleft().result())
+
+    if not results:
+        return pd.DataFrame(columns=QC_COLUMNS)
+    return pd.concat(results, ignore_index=True)
+
+# 4. PARSE AI QUALITY CONTROL OUTPUT ###################################
+
+## 4.1 Schema #################################
+
+# Expected type of every field in an AI quality control response (see 02_ai_quality_control.py)
+QC_SCHEMA = {
+    "accurate": bool,
+    "accuracy": int,
+    "formality": int,
+    "faithfulness": int,
+    "clarity": int,
+    "succinctness": int,
+    "relevance": int,
+    "details": str
+}
+
+# Likert scale fields must be whole numbers from 1 to 5
+LIKERT_FIELDS = ["accuracy", "formality", "faithfulness", "clarity", "succinctness", "relevance"]
+
+
+class QualityControlError(ValueError):
+    """
+    Raised when an AI quality control response is not valid JSON or does not match QC_SCHEMA.
+
+    The field attribute names the offending field (or None if the whole response is unusable),
+    so callers can tell which part of the response was wrong.
+    """
+
+    def __init__(self, message, field=None):
+        super().__init__(message)
+        self.field = field
+
+## 4.2 Decode and Validate #################################
+
+def decode_json_object(text):
+    """
+    Decode the JSON object in an AI response.
+
+    Most responses requested in JSON mode are pure JSON, so we try to decode the whole text first.
+    If the AI wrapped the JSON in extra text, we decode the span from the first "{" to the last "}"
+    (the same span the greedy regex r"\{.*\}" would find, but without running a regex).
+
+    Parameters:
+    -----------
+    text : str
+        The raw AI response
+
+    Returns:
+    --------
+    dict or list
+        The decoded JSON value
+    """
+
+    try:
+        return json_loads(text)
+    except ValueError:
+        pass
+
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
+        raise QualityControlError("Response does not contain a JSON object.")
+    try:
+        return json_loads(text[start:end + 1])
+    except ValueError as e:
+        raise QualityControlError(f"Response is not valid JSON: {e}") from e
+
+
+def validate_quality_control(data):
+    """
+    Check one decoded quality control result against QC_SCHEMA.
+
+    Parameters:
+    -----------
+    data : dict
+        A decoded quality control result
+
+    Returns:
+    --------
+    dict
+        The validated result, with exactly the QC_SCHEMA fields, in QC_SCHEMA order
+    """
+
+    if not isinstance(data, dict):
+        raise QualityControlError("Expected a JSON object of quality control scores.")
+
+    row = {}
+    for field, field_type in QC_SCHEMA.items():
+        if field not in data:
+            raise QualityControlError(f"Missing field '{field}'.", field=field)
+        value = data[field]
+
+        # Booleans: some models answer "true"/"false" as strings
+        if field_type is bool:
+            if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+                value = value.strip().lower() == "true"
+            if not isinstance(value, bool):
+                raise QualityControlError(f"Field '{field}' must be true or false, not {value!r}.", field=field)
+
+        # Likert scores: whole numbers from 1 to 5 (4.0 or "4" are accepted as 4)
+        elif field in LIKERT_FIELDS:
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                number = None
+            if isinstance(value, bool) or number is None or not 1 <= number <= 5 or number != int(number):
+                raise QualityControlError(f"Field '{field}' must be a whole number from 1 to 5, not {value!r}.", field=field)
+            value = int(number)
+
+        # Text fields
+        elif not isinstance(value, field_type):
+            raise QualityControlError(f"Field '{field}' must be text, not {value!r}.", field=field)
+
+        row[field] = value
+
+    return row
+
+## 4.3 Collect Rows into One DataFrame #################################
+
+def new_quality_control_buffers(extra_columns=()):
+    """
+    Create empty column buffers for quality control results.
+
+    Building one DataFrame from a few lists at the end is much cheaper than
+    building a one-row DataFrame per report and concatenating them.
+
+    Parameters:
+    -----------
+    extra_columns : sequence
+        Extra columns to track alongside QC_SCHEMA (e.g. ["report_id"])
+
+    Returns:
+    --------
+    dict
+        Dictionary of column name -> empty list
+    """
+
+    return {column: [] for column in [*extra_columns, *QC_SCHEMA]}
+
+
+def append_quality_control(buffers, row, **extra):
+    """
+    Append one validated result (plus extra column values, e.g. report_id=3) to the column buffers.
+    """
+
+    for column, values in buffers.items():
+        values.append(extra[column] if column in extra else row[column])
+
+
+def quality_control_frame(buffers):
+    """
+    Build one DataFrame from the column buffers.
+    """
+
+    return pd.DataFrame(buffers)
+
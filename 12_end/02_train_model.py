@@ -3,6 +3,16 @@
 # Pairs with 02_train_model.R
 # Tim Fraser
 
+# Training runs in one of two modes:
+#   full:        train from scratch on every row for METRO_ID (the original behavior).
+#   incremental: read only rows newer than the last trained timestamp (the watermark in
+#                STATE_PATH), and add INCREMENTAL_ROUNDS trees to the saved modelpy.json.
+#                Validation metrics come from running sums of residuals kept in STATE_PATH,
+#                so the run time depends on the new rows, not on the whole history.
+# TRAIN_MODE="auto" (default) trains incrementally, but rebuilds from scratch when there is no
+# saved state or the last full rebuild is older than FULL_REBUILD_HOURS.
+# Set TRAIN_MODE to "full" or "incremental" to force a mode.
+
 # 0. SETUP ###################################
 
 ## 0.1 Load Packages #################################
@@ -12,6 +22,7 @@ import pandas as pd
 import sqlite3
 import xgboost as xgb
 import json
+import os
 from pathlib import Path
 
 # 1. CONFIG ###################################
@@ -21,32 +32,72 @@ DATA_DIR = SCRIPT_DIR / "data"
 DB_PATH = SCRIPT_DIR / "data" / "traffic.db"
 MODEL_PATH = DATA_DIR / "modelpy.json"
 VALIDATION_PATH = DATA_DIR / "validationpy.json"
+STATE_PATH = DATA_DIR / "trainstatepy.json"
 METRO_ID = 948
 
+TRAIN_MODE = os.getenv("TRAIN_MODE", "auto")  # "auto", "full", or "incremental"
+FULL_ROUNDS = 50           # boosting rounds for a full rebuild
+INCREMENTAL_ROUNDS = 10    # boosting rounds added per incremental run
+FULL_REBUILD_HOURS = 24    # in auto mode, rebuild from scratch at least this often
+MIN_NEW_ROWS = 5           # fewer new rows than this: leave the model unchanged
+
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-# 2. LOAD DATA ###################################
+if TRAIN_MODE not in {"auto", "full", "incremental"}:
+    raise SystemExit("TRAIN_MODE must be 'auto', 'full', or 'incremental'.")
+
+# 2. CHOOSE MODE ###################################
+
+now = pd.Timestamp.now(tz="UTC")
+state = json.loads(STATE_PATH.read_text(encoding="utf-8")) if STATE_PATH.exists() else None
+can_continue = state is not None and MODEL_PATH.exists() and state.get("metro_id") == METRO_ID
+
+if TRAIN_MODE == "full" or not can_continue:
+    mode = "full"
+elif TRAIN_MODE == "auto" and now - pd.Timestamp(state["last_full_rebuild"]) >= pd.Timedelta(hours=FULL_REBUILD_HOURS):
+    mode = "full"
+else:
+    mode = "incremental"
+
+if TRAIN_MODE == "incremental" and mode == "full":
+    print("   note: no saved model state for this METRO_ID; running a full rebuild instead.")
 
+# 3. LOAD DATA ###################################
+
+# observed_at is stored as "YYYY-MM-DD HH:MM:SS" text, so text comparison follows time order
 conn = sqlite3.connect(str(DB_PATH))
-df = pd.read_sql(
-    "SELECT observed_at, vehicles FROM traffic WHERE metro_id = ? ORDER BY observed_at",
-    conn,
-    params=(METRO_ID,),
-)
+if mode == "full":
+    df = pd.read_sql(
+        "SELECT observed_at, vehicles FROM traffic WHERE metro_id = ? ORDER BY observed_at",
+        conn,
+        params=(METRO_ID,),
+    )
+else:
+    df = pd.read_sql(
+        "SELECT observed_at, vehicles FROM traffic WHERE metro_id = ? AND observed_at > ? ORDER BY observed_at",
+        conn,
+        params=(METRO_ID, state["trained_through"]),
+    )
 conn.close()
 
-# 3. FEATURE ENGINEERING ###################################
+# 4. FEATURE ENGINEERING ###################################
 
-if df.empty:
+if df.empty and mode == "full":
     raise SystemExit("No rows found for configured METRO_ID.")
 
+if mode == "incremental" and len(df) < MIN_NEW_ROWS:
+    # Leave the files untouched; the new rows are picked up by a later run
+    print(f"Only {len(df)} new rows since {state['trained_through']}; model unchanged.")
+    raise SystemExit(0)
+
+trained_through = df["observed_at"].max()
 df["observed_at"] = pd.to_datetime(df["observed_at"], utc=True)
 df["day_of_week"] = df["observed_at"].dt.dayofweek + 1
 df["hour_of_day"] = df["observed_at"].dt.hour
 
 features = ["day_of_week", "hour_of_day"]
 
-# 4. TRAIN/TEST SPLIT ###################################
+# 5. TRAIN/TEST SPLIT ###################################
 
 df = df.reset_index(drop=True)
 df["row_id"] = np.arange(1, len(df) + 1)
@@ -65,7 +116,7 @@ y_train = train_df["vehicles"].to_numpy()
 X_test = test_df[features].to_numpy()
 y_test = test_df["vehicles"].to_numpy()
 
-# 5. TRAIN MODEL ###################################
+# 6. TRAIN MODEL ###################################
 
 dtrain = xgb.DMatrix(X_train, label=y_train, feature_names=features)
 
@@ -76,25 +127,66 @@ params = {
     "verbosity": 0,
 }
 
-model = xgb.train(params, dtrain, num_boost_round=50)
+if mode == "full":
+    model = xgb.train(params, dtrain, num_boost_round=FULL_ROUNDS)
+else:
+    # Continue boosting: the saved trees are kept, and the new trees fit what they miss on the new rows
+    model = xgb.train(params, dtrain, num_boost_round=INCREMENTAL_ROUNDS, xgb_model=str(MODEL_PATH))
 
-# 6. EVALUATE ###################################
+# 7. EVALUATE ###################################
+
+# Metrics are kept as running sums (sufficient statistics), so an incremental run adds its
+# new rows to the totals since the last full rebuild instead of re-scoring the whole history.
+def error_sums(y, pred):
+    return {
+        "n": int(len(y)),
+        "sum_y": float(np.sum(y)),
+        "sum_y2": float(np.sum(y ** 2)),
+        "sse": float(np.sum((y - pred) ** 2)),
+    }
 
-pred_train = model.predict(dtrain)
-train_rmse = np.sqrt(np.mean((pred_train - y_train) ** 2))
-train_r_squared = 1 - np.sum((y_train - pred_train) ** 2) / np.sum((y_train - np.mean(y_train)) ** 2)
 
+def add_sums(old, new):
+    return {key: old[key] + new[key] for key in new}
+
+
+def rmse_r_squared(sums):
+    rmse = np.sqrt(sums["sse"] / sums["n"])
+    r_squared = 1 - sums["sse"] / (sums["sum_y2"] - sums["sum_y"] ** 2 / sums["n"])
+    return rmse, r_squared
+
+
+pred_train = model.predict(dtrain)
 dtest = xgb.DMatrix(X_test, label=y_test, feature_names=features)
 pred_test = model.predict(dtest)
-test_rmse = np.sqrt(np.mean((pred_test - y_test) ** 2))
-test_r_squared = 1 - np.sum((y_test - pred_test) ** 2) / np.sum((y_test - np.mean(y_test)) ** 2)
 
+train_sums = error_sums(y_train, pred_train)
+test_sums = error_sums(y_test, pred_test)
+if mode == "incremental":
+    train_sums = add_sums(state["train_sums"], train_sums)
+    test_sums = add_sums(state["test_sums"], test_sums)
+
+train_rmse, train_r_squared = rmse_r_squared(train_sums)
+test_rmse, test_r_squared = rmse_r_squared(test_sums)
+
+# Residual count, sum, and sum of squares by day/hour; the standard error is their standard deviation
 test_eval = test_df[["day_of_week", "hour_of_day"]].copy()
 test_eval["residual"] = y_test - pred_test
-uncertainty_df = (
+test_eval["residual2"] = test_eval["residual"] ** 2
+residual_sums = (
     test_eval.groupby(["day_of_week", "hour_of_day"], as_index=False)
-    .agg(standard_error=("residual", "std"), n=("residual", "size"))
+    .agg(n=("residual", "size"), sum=("residual", "sum"), sum2=("residual2", "sum"))
 )
+if mode == "incremental":
+    residual_sums = (
+        pd.concat([pd.DataFrame(state["residual_sums"]), residual_sums])
+        .groupby(["day_of_week", "hour_of_day"], as_index=False)
+        .sum()
+    )
+
+uncertainty_df = residual_sums.copy()
+variance = (uncertainty_df["sum2"] - uncertainty_df["sum"] ** 2 / uncertainty_df["n"]) / (uncertainty_df["n"] - 1)
+uncertainty_df["standard_error"] = np.sqrt(variance.clip(lower=0).where(uncertainty_df["n"] > 1))
 uncertainty_df["standard_error"] = uncertainty_df["standard_error"].fillna(float(test_rmse))
 uncertainty_rows = [
     {
@@ -111,7 +203,7 @@ print(f"Training R-squared: {train_r_squared:.3f}")
 print(f"Testing RMSE: {test_rmse:.2f}")
 print(f"Testing R-squared: {test_r_squared:.3f}")
 
-# 7. SAVE MODEL ###################################
+# 8. SAVE MODEL ###################################
 
 model.save_model(str(MODEL_PATH))
 
@@ -122,17 +214,47 @@ validation = {
     "train_rmse": float(train_rmse),
     "train_r_squared": float(train_r_squared),
     "residual_standard_error_default": float(test_rmse),
-    "standard_error_method": "Residual SD on held-out test split by day_of_week/hour_of_day; fallback to test RMSE.",
+    "standard_error_method": (
+        "Residual SD on held-out test split by day_of_week/hour_of_day, accumulated since the last "
+        "full rebuild; fallback to test RMSE."
+    ),
     "standard_error_by_hour_day": uncertainty_rows,
+    "training_mode": mode,
+    "trained_through": trained_through,
 }
 VALIDATION_PATH.write_text(json.dumps(validation, indent=2), encoding="utf-8")
 
+# Watermark and running sums for the next incremental run
+train_state = {
+    "metro_id": int(METRO_ID),
+    "trained_through": trained_through,
+    "last_full_rebuild": now.isoformat() if mode == "full" else state["last_full_rebuild"],
+    "boost_rounds": int(model.num_boosted_rounds()),
+    "rows_trained": len(df) if mode == "full" else state["rows_trained"] + len(df),
+    "train_sums": train_sums,
+    "test_sums": test_sums,
+    "residual_sums": [
+        {
+            "day_of_week": int(row.day_of_week),
+            "hour_of_day": int(row.hour_of_day),
+            "n": int(row.n),
+            "sum": float(row.sum),
+            "sum2": float(row.sum2),
+        }
+        for row in residual_sums.itertuples(index=False)
+    ],
+}
+STATE_PATH.write_text(json.dumps(train_state, indent=2), encoding="utf-8")
+
 print("\n====================================================")
 print("02_train_model.py | Brussels realtime model")
 print("====================================================")
 print(f"   metro_id: {METRO_ID}")
+print(f"   mode: {mode} (trained through {trained_through}, last full rebuild {train_state['last_full_rebuild']})")
 print(f"   train rows (80%): {len(train_df)}")
 print(f"   test rows (20%): {len(test_df)}")
+print(f"   boosting rounds: {train_state['boost_rounds']}")
 print("   features: day_of_week, hour_of_day")
 print(f"   model saved to {MODEL_PATH}")
 print(f"   validation saved to {VALIDATION_PATH}")
+print(f"   training state saved to {STATE_PATH}")
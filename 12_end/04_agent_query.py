@@ -11,7 +11,7 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 sys.path.append(str(ROOT_DIR / "08_function_calling"))
 
 from dotenv import load_dotenv
-from functions import agent
+from functions import agent_loop, register_tool
 
 import requests
 
@@ -99,14 +99,28 @@ messages = [
 ]
 tools = [tool_predict_vehicle_count]
 
-result = agent(
+# Register the tool so agent() can find and run predict_vehicle_count by name
+register_tool(predict_vehicle_count, metadata=tool_predict_vehicle_count)
+
+# agent_loop() runs the tool, sends its predictions back to the model as a role "tool" message,
+# and lets the model answer in the same conversation (at most MAX_STEPS model calls)
+MAX_STEPS = 3
+
+run = agent_loop(
     messages=messages,
+    tools=tools,
     model=MODEL,
-    output="text",
-    tools=tools
+    max_steps=MAX_STEPS
 )
+result = run["content"]
 
 print("Agent result:", result)
+for step in run["steps"]:
+    print(
+        f"Step {step['step']}: tools={step['tool_calls']} "
+        f"model={step['model_seconds']}s tools={step['tool_seconds']}s "
+        f"prompt_tokens={step['prompt_tokens']} output_tokens={step['output_tokens']}"
+    )
 
 # 5. VERIFY ###################################
 